@@ -1,16 +1,20 @@
 """Streamlit Dashboard for Weather Data Pipeline.
 
-This app fetches data from multiple sources (SIATA, Meteoblue, Meteosource),
-canonicalizes it, and displays it.
+This app fetches data from multiple sources (SIATA, Meteoblue, Meteosource and,
+optionally, rainfall estimated from the IDEAM radars), canonicalizes it, and
+displays it.
 """
 import streamlit as st
 import pandas as pd
 import os
 from dotenv import load_dotenv
 
-# Import local modules (flat structure)
-from data_sources import siata, meteoblue, meteosource
-from processing import transform, cleaning, storage
+# Import local modules (flat structure).
+# Data sources, radar and MLflow are imported where they are used so the first
+# render does not pay for dependencies of tabs the user has not opened.
+from processing import transform, cleaning, storage, chart_series, map_layers
+from processing.range_cache import RangeCache
+from ml_models import batch_inference
 
 # Load environment variables
 load_dotenv()
@@ -23,15 +27,71 @@ st.write("Este dashboard obtiene datos en tiempo real de SIATA, Meteosource y Me
 st.sidebar.header("Configuration")
 start_date = st.sidebar.date_input("Start Date")
 end_date = st.sidebar.date_input("End Date")
+# Decodes every radar scan of the range covering a station: off by default
+include_radar_rain = st.sidebar.checkbox("Incluir lluvia estimada por radar (IDEAM)", value=False)
+
+# Parquet copies of the canonical record (one per data version) kept for the
+# Datos tab, which queries them page by page
+CANONICAL_STORES_KEPT = 8
+
+
+@st.cache_resource
+def get_range_cache():
+    """Range cache shared by every session of this server process."""
+    return RangeCache()
+
+
+@st.cache_resource
+def get_model_cache():
+    """Models served to every session, loaded once per MLflow run."""
+    from ml_models.serving import ModelCache
+    return ModelCache()
+
+
+@st.cache_resource
+def get_predictor_cache():
+    """Exported transformer predictors, loaded once per MLflow run."""
+    from ml_models.serving import ModelCache
+    from ml_models import predictor
+    return ModelCache(loader=predictor.load_run)
+
 
 # Add clear cache button
 if st.sidebar.button("🔄 Limpiar Caché y Actualizar"):
     st.cache_data.clear()
+    get_range_cache().clear()
+    st.session_state.pop("df_final", None)
     st.rerun()
 
-# Caching data fetching (reduced TTL to 5 minutes)
-@st.cache_data(ttl=300)
-def get_all_data(start_date, end_date):
+
+def range_fetcher(fetch_fn, **kwargs):
+    """Adapt a data source to the ``fetch(start, end)`` of the range cache."""
+    def fetch(start, end):
+        # Sources take inclusive dates, cached ranges are half-open
+        df = fetch_fn(start=str(start.date()), end=str((end - pd.Timedelta(days=1)).date()), **kwargs)
+        return transform.to_canonical(df) if not df.empty else df
+    return fetch
+
+
+def snapshot_fetcher(fetch_fn, **kwargs):
+    """Adapt a source that ignores the requested dates to ``RangeCache.snapshot``."""
+    def fetch():
+        df = fetch_fn(**kwargs)
+        return transform.to_canonical(df) if not df.empty else df
+    return fetch
+
+
+# Data is cached per source and location, shared by all sessions. Radar rain
+# honours the requested dates and is cached as time ranges: sub-ranges are
+# sliced and overlapping ranges only fetch the edges. SIATA (latest
+# observations) and the forecast APIs (current horizon) return the same rows
+# whatever the dates, so they are cached whole and shown unclipped.
+def get_all_data(start_date, end_date, include_radar_rain=False):
+    from data_sources import siata, meteoblue, meteosource
+
+    cache = get_range_cache()
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date) + pd.Timedelta(days=1)
     dfs = []
     
     # Locations configuration
@@ -45,9 +105,9 @@ def get_all_data(start_date, end_date):
 
     # SIATA (Regional, fetches all available stations)
     try:
-        df_siata = siata.fetch_siata(start=str(start_date), end=str(end_date))
+        df_siata = cache.snapshot(("siata", None), snapshot_fetcher(siata.fetch_siata))
         if not df_siata.empty:
-            dfs.append(transform.to_canonical(df_siata))
+            dfs.append(df_siata)
     except Exception as e:
         st.error(f"SIATA Error: {e}")
 
@@ -59,20 +119,37 @@ def get_all_data(start_date, end_date):
         
         # Meteoblue
         try:
-            df_meteoblue = meteoblue.fetch_meteoblue(lat=lat, lon=lon, location_name=name, start=str(start_date), end=str(end_date))
+            df_meteoblue = cache.snapshot(("meteoblue", name),
+                                          snapshot_fetcher(meteoblue.fetch_meteoblue, lat=lat, lon=lon, location_name=name))
             if not df_meteoblue.empty:
-                dfs.append(transform.to_canonical(df_meteoblue))
+                dfs.append(df_meteoblue)
         except Exception as e:
             st.error(f"Meteoblue Error ({name}): {e}")
             
         # Meteosource
         try:
-            df_meteosource = meteosource.fetch_meteosource(lat=lat, lon=lon, location_name=name, start=str(start_date), end=str(end_date))
+            df_meteosource = cache.snapshot(("meteosource", name),
+                                            snapshot_fetcher(meteosource.fetch_meteosource, lat=lat, lon=lon, location_name=name))
             if not df_meteosource.empty:
-                dfs.append(transform.to_canonical(df_meteosource))
+                dfs.append(df_meteosource)
         except Exception as e:
             st.error(f"Meteosource Error ({name}): {e}")
 
+    # Radar rain rate at every station and location a radar covers
+    if include_radar_rain:
+        from data_sources import radar_rain
+
+        points = [df[['station_id', 'lat', 'lon']] for df in dfs if df['source'].eq('siata').any()]
+        points.append(pd.DataFrame(LOCATIONS).rename(columns={'name': 'station_id'}))
+        points = pd.concat(points, ignore_index=True).dropna(subset=['lat', 'lon']).drop_duplicates('station_id')
+        try:
+            df_radar = cache.get(("ideam_radar", transform.data_version(points)), start, end,
+                                 range_fetcher(radar_rain.fetch_radar_rain, points=points))
+            if not df_radar.empty:
+                dfs.append(df_radar)
+        except Exception as e:
+            st.error(f"IDEAM Radar Error: {e}")
+
     if dfs:
         df_final = pd.concat(dfs, ignore_index=True)
         df_final = cleaning.drop_duplicate_observations(df_final)
@@ -82,207 +159,324 @@ def get_all_data(start_date, end_date):
         return df_final
     return pd.DataFrame()
 
-if st.sidebar.button("Actualizar Datos"):
-    with st.spinner("Obteniendo y procesando datos..."):
-        df_final = get_all_data(start_date, end_date)
+
+def load_data(start_date, end_date, include_radar_rain=False):
+    """Fetch, persist and keep the canonical dataset in the session state.
+
+    Every widget interaction reruns the script; the loaded data lives in
+    ``st.session_state`` so filters and tabs reuse it instead of fetching again.
+    """
+    df_final = get_all_data(start_date, end_date, include_radar_rain)
+
+    if not df_final.empty:
+        # Save full canonical dataset BEFORE filtering
+        os.makedirs("data/out", exist_ok=True)
+        output_path = "data/out/canonical.csv"
+        storage.save_csv(df_final, output_path)
+        st.info(f"Datos completos ({len(df_final)} registros) almacenados en {output_path}")
+
+        # Normalize municipality names (title case, strip)
+        if 'municipality' in df_final.columns:
+            df_final['municipality'] = df_final['municipality'].astype(str).str.title().str.strip()
+
+    st.session_state.df_final = df_final
+    st.session_state.data_version = transform.data_version(df_final)
+
+    if not df_final.empty:
+        # Queryable copy of the canonical record for the Datos tab, one per
+        # data version so concurrent sessions keep their own
+        storage.save_parquet(df_final, storage.canonical_store_path(st.session_state.data_version))
+        storage.prune_canonical_stores(keep=CANONICAL_STORES_KEPT)
+
+        # Batch inference: precompute forecasts for every station and horizon
+        try:
+            forecasts = batch_inference.run(df_final, get_model_cache(), predictor_cache=get_predictor_cache())
+            if not forecasts.empty:
+                st.info(f"Pronósticos actualizados: {forecasts['station_id'].nunique()} estaciones, {forecasts['model'].nunique()} modelos.")
+        except Exception as e:
+            st.error(f"Error generando pronósticos: {e}")
+
+
+@st.fragment
+def render_metrics(df_final, series_key):
+    st.subheader("Métricas")
+
+    # Pivots are cached per data version and filter; only the visible
+    # window is downsampled, so zooming in shows finer detail.
+    view_start, view_end = df_final['timestamp'].min(), df_final['timestamp'].max()
+    if pd.notna(view_start) and view_start < view_end:
+        view_start, view_end = st.slider(
+            "Rango a visualizar",
+            min_value=view_start.to_pydatetime(),
+            max_value=view_end.to_pydatetime(),
+            value=(view_start.to_pydatetime(), view_end.to_pydatetime()),
+            format="YYYY-MM-DD HH:mm",
+        )
+
+    metric_charts = [
+        ('temp_c', "### Temperatura (°C)", st.line_chart, "No hay datos de temperatura."),
+        ('precip_mm', "### Precipitación (mm)", st.bar_chart, "No hay datos de precipitación."),
+        ('wind_m_s', "### Viento (m/s)", st.line_chart, "No hay datos de viento."),
+    ]
+    for value_col, title, chart, empty_msg in metric_charts:
+        if value_col not in df_final.columns:
+            continue
+        st.write(title)
+        df_series = chart_series.chart_series(df_final, value_col, key=series_key, start=view_start, end=view_end)
+        if not df_series.empty:
+            chart(df_series, x='timestamp', y='value', color='source', y_label=value_col)
+        else:
+            st.info(empty_msg)
+
+@st.fragment
+def render_map(df_final):
+    st.subheader("Mapa de Estaciones")
+
+    # One record per station with its latest values; layers per source
+    # (color) sized by the selected variable, or hexbins when very dense.
+    df_stations = map_layers.station_snapshot(df_final)
+    
+    if not df_stations.empty:
+        value_col = st.selectbox("Variable", ['temp_c', 'precip_mm', 'wind_m_s'],
+                                 format_func={'temp_c': "Temperatura (°C)", 'precip_mm': "Precipitación (mm)", 'wind_m_s': "Viento (m/s)"}.get)
+        st.pydeck_chart(map_layers.build_deck(df_stations, value_col))
+        st.caption(f"Mostrando {len(df_stations)} estaciones con coordenadas válidas. Colores: SIATA rojo, Meteoblue azul, Meteosource verde.")
+    else:
+        st.warning("No hay datos con coordenadas válidas para mostrar en el mapa.")
+    
+    if df_final['lat'].isna().any():
+        st.warning("Nota: Algunas estaciones (ej. SIATA) no tienen coordenadas en el sistema y no aparecen en el mapa. Se han mapeado algunas manualmente.")
+
+
+@st.fragment
+def render_radar():
+    """Radar tab. Its widgets only rerun this fragment, never the data load."""
+    st.subheader("Red de Radares IDEAM")
+    
+    try:
+        from data_sources import ideam_radar
+        
+        # Controls
+        col1, col2 = st.columns(2)
+        with col1:
+            radar_name = st.selectbox("Seleccionar Radar", ["Carimagua", "Guaviare", "Barrancabermeja", "Munchique"])
+        with col2:
+            # Date selection for radar
+            radar_date = st.date_input("Fecha Radar", value=pd.to_datetime("2022-08-09"))
+        
+        date_str = radar_date.strftime("%Y/%m/%d")
+        
+        # List files from the local manifest (S3 is listed only for new days)
+        files = ideam_radar.list_available_radar_files(date_str, radar_name, limit=None)
         
-        if not df_final.empty:
-            # Save full canonical dataset BEFORE filtering
-            os.makedirs("data/out", exist_ok=True)
-            output_path = "data/out/canonical.csv"
-            storage.save_csv(df_final, output_path)
-            st.info(f"Datos completos ({len(df_final)} registros) almacenados en {output_path}")
-
-            # Municipality Filter
-            if 'municipality' in df_final.columns:
-                # Normalize municipality names (title case, strip)
-                df_final['municipality'] = df_final['municipality'].astype(str).str.title().str.strip()
-                
-                available_munis = sorted(df_final['municipality'].unique().tolist())
-                selected_munis = st.sidebar.multiselect("Filtrar por Municipio", available_munis, default=available_munis)
-                
-                if selected_munis:
-                    df_final = df_final[df_final['municipality'].isin(selected_munis)]
+        if files:
+            st.success(f"Se encontraron {len(files)} archivos para {radar_name} en {date_str}")
             
-            st.success(f"Datos mostrados: {len(df_final)} registros.")
+            # File selector
+            selected_file = st.selectbox("Seleccionar Archivo (Hora UTC)", files, format_func=lambda x: x.split('/')[-1])
             
-            # Debug: Show source distribution (Restored)
-            st.sidebar.write("### Distribución por Fuente")
-            st.sidebar.write(df_final['source'].value_counts())
-
-            # Tabs for layout
-            tab_metrics, tab_map, tab_radares, tab_data, tab_pred = st.tabs(["Métricas", "Mapa", "Radares", "Datos", "Predicciones"])
-
-            with tab_metrics:
-                st.subheader("Métricas")
-                
-                # Temperature
-                if 'temp_c' in df_final.columns:
-                    st.write("### Temperatura (°C)")
-                    df_temp = df_final.dropna(subset=['temp_c'])
-                    if not df_temp.empty:
-                        # Pivot to have sources as columns
-                        chart_data_temp = df_temp.pivot_table(index='timestamp', columns='source', values='temp_c', aggfunc='mean')
-                        st.line_chart(chart_data_temp)
-                    else:
-                        st.info("No hay datos de temperatura.")
-
-                # Precipitation
-                if 'precip_mm' in df_final.columns:
-                    st.write("### Precipitación (mm)")
-                    df_precip = df_final.dropna(subset=['precip_mm'])
-                    if not df_precip.empty:
-                        chart_data_precip = df_precip.pivot_table(index='timestamp', columns='source', values='precip_mm', aggfunc='mean')
-                        st.bar_chart(chart_data_precip)
-                    else:
-                        st.info("No hay datos de precipitación.")
-
-                # Wind
-                if 'wind_m_s' in df_final.columns:
-                    st.write("### Viento (m/s)")
-                    df_wind = df_final.dropna(subset=['wind_m_s'])
-                    if not df_wind.empty:
-                        chart_data_wind = df_wind.pivot_table(index='timestamp', columns='source', values='wind_m_s', aggfunc='mean')
-                        st.line_chart(chart_data_wind)
-                    else:
-                        st.info("No hay datos de viento.")
-
-            with tab_map:
-                st.subheader("Mapa de Estaciones")
-                df_map = df_final.dropna(subset=['lat', 'lon']).copy()
-                
-                # Assign colors based on source
-                color_map = {
-                    'siata': '#FF0000',      # Red
-                    'meteoblue': '#0000FF',  # Blue
-                    'meteosource': '#00FF00' # Green
-                }
-                # st.map doesn't support color column directly in all versions, but let's try or use size
-                # For simple st.map, we can't easily color. 
-                # But we can separate them or just show them.
-                # Let's just show them for now, but maybe add a legend in text.
-                
-                if not df_map.empty:
-                    st.map(df_map, size=20)
-                    st.caption(f"Mostrando {len(df_map)} estaciones con coordenadas válidas.")
+            # A coarse quick-look shows at once; the full-resolution frame is
+            # rendered on demand, so flipping through files never waits for it.
+            # Both are cached on disk.
+            frame = st.empty()
+            image = ideam_radar.cached_radar_image(selected_file)
+            if image is None:
+                preview = ideam_radar.render_radar_image(selected_file, quicklook=True)
+                if preview is None:
+                    frame.error("No se pudo leer el archivo de radar. Revisa si el archivo es válido.")
                 else:
-                    st.warning("No hay datos con coordenadas válidas para mostrar en el mapa.")
-                
-                if df_final['lat'].isna().any():
-                    st.warning("Nota: Algunas estaciones (ej. SIATA) no tienen coordenadas en el sistema y no aparecen en el mapa. Se han mapeado algunas manualmente.")
-
-            with tab_radares:
-                st.subheader("Red de Radares IDEAM")
-                
-                try:
-                    from data_sources import ideam_radar
-                    
-                    # Controls
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        radar_name = st.selectbox("Seleccionar Radar", ["Carimagua", "Guaviare", "Barrancabermeja", "Munchique"])
-                    with col2:
-                        # Date selection for radar
-                        radar_date = st.date_input("Fecha Radar", value=pd.to_datetime("2022-08-09"))
-                    
-                    date_str = radar_date.strftime("%Y/%m/%d")
-                    
-                    # List files
-                    files = ideam_radar.list_available_radar_files(date_str, radar_name, limit=20)
-                    
-                    if files:
-                        st.success(f"Se encontraron {len(files)} archivos para {radar_name} en {date_str}")
-                        
-                        # File selector
-                        selected_file = st.selectbox("Seleccionar Archivo (Hora UTC)", files, format_func=lambda x: x.split('/')[-1])
-                        
-                        if st.button("Visualizar Radar"):
-                            st.info(f"Iniciando visualización para: {selected_file}")
-                            with st.spinner("Generando visualización..."):
-                                try:
-                                    fig = ideam_radar.create_radar_plot(selected_file)
-                                    
-                                    if fig:
-                                        st.pyplot(fig)
-                                        st.success("Gráfico generado.")
-                                    else:
-                                        st.error("La función retornó None. Revisa si el archivo es válido.")
-                                except Exception as e:
-                                    st.error(f"Excepción en la app: {e}")
-                    else:
-                        st.warning(f"No se encontraron archivos para {radar_name} en la fecha {date_str}. Intenta con otra fecha (ej. 2022/08/09).")
-                        
-                    st.divider()
-                    st.write("### Ubicación de Radares")
-                    df_radares = ideam_radar.get_radar_locations()
-                    st.map(df_radares[['lat', 'lon']])
-                        
-                except Exception as e:
-                    st.error(f"Error cargando módulo de radares: {e}")
-
-
-            with tab_data:
-                st.subheader("Datos Combinados (Canonical Record)")
-                st.dataframe(df_final)
-
-            # --- Predictions Tab ---
-            with tab_pred:
-                st.subheader("Predicción de Temperatura (Próxima Hora)")
-                
-                import mlflow
-                from mlflow.tracking import MlflowClient
-                
-                # 1. Load Model
-                # Find the latest run for "Hourly_Weather_Forecast"
-                try:
-                    experiment = mlflow.get_experiment_by_name("Hourly_Weather_Forecast")
-                    if experiment:
-                        runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id], order_by=["start_time DESC"], max_results=1)
-                        if not runs.empty:
-                            run_id = runs.iloc[0].run_id
-                            logged_model = f"runs:/{run_id}/model"
-                            
-                            st.write(f"Cargando modelo desde Run ID: `{run_id}`")
-                            model = mlflow.sklearn.load_model(logged_model)
-                            
-                            # 2. Prepare Data for Prediction
-                            # We need the latest data point for each station
-                            # Features: ['temp_c', 'wind_m_s', 'precip_mm', 'hour']
-                            
-                            if 'temp_c' in df_final.columns:
-                                # Get latest available data per station
-                                latest_data = df_final.sort_values('timestamp').groupby('station_id').tail(1).copy()
-                                
-                                # Feature Engineering
-                                latest_data['timestamp'] = pd.to_datetime(latest_data['timestamp'])
-                                latest_data['hour'] = latest_data['timestamp'].dt.hour
-                                
-                                # Fill NaNs if any (simple fill for demo)
-                                latest_data = latest_data.fillna(0)
-                                
-                                features = ['temp_c', 'wind_m_s', 'precip_mm', 'hour']
-                                
-                                # Check if we have all features
-                                if all(f in latest_data.columns for f in features):
-                                    X_pred = latest_data[features]
-                                    
-                                    # Predict
-                                    predictions = model.predict(X_pred)
-                                    latest_data['predicted_temp_next_hour'] = predictions
-                                    
-                                    st.write("### Pronóstico para la próxima hora")
-                                    st.dataframe(latest_data[['station_id', 'timestamp', 'temp_c', 'predicted_temp_next_hour']])
-                                    
-                                    # Visualization
-                                    st.bar_chart(latest_data.set_index('station_id')[['temp_c', 'predicted_temp_next_hour']])
-                                else:
-                                    st.warning(f"Faltan columnas para predecir. Se requieren: {features}")
-                        else:
-                            st.warning("No se encontraron runs en el experimento 'Hourly_Weather_Forecast'.")
-                    else:
-                        st.warning("No existe el experimento 'Hourly_Weather_Forecast'. Ejecuta el entrenamiento primero.")
-                except Exception as e:
-                    st.error(f"Error generando predicciones: {e}")
-                
+                    frame.image(preview, width="stretch", caption="Vista previa")
+                    if st.button("Ver en resolución completa"):
+                        with st.spinner("Generando visualización..."):
+                            image = ideam_radar.render_radar_image(selected_file)
+                        if image is None:
+                            st.error("No se pudo generar la imagen completa.")
+            if image is not None:
+                frame.image(image, width="stretch")
+
+            with st.expander("Animación del día"):
+                st.caption("Procesa todos los escaneos del día en paralelo; los ya renderizados se reutilizan.")
+                if st.button("Generar animación"):
+                    from data_sources import radar_animation
+                    bar = st.progress(0.0, text="Preparando escaneos...")
+
+                    def report(done, total, path):
+                        bar.progress(done / max(total, 1), text=f"{done}/{total} escaneos")
+
+                    animation = radar_animation.animate_day(radar_name, radar_date, progress=report)
+                    if animation.path:
+                        st.image(animation.path, width="stretch")
+                        with open(animation.path, 'rb') as f:
+                            st.download_button("Descargar GIF", f.read(), file_name=os.path.basename(animation.path),
+                                               mime="image/gif")
+                    if animation.failed:
+                        st.warning(f"{animation.failed} escaneos no se pudieron procesar.")
+                    st.dataframe(animation.index[['frame', 'scan_time', 'status', 'path']], hide_index=True)
         else:
-            st.warning("No se pudieron obtener datos de ninguna fuente.")
+            st.warning(f"No se encontraron archivos para {radar_name} en la fecha {date_str}. Intenta con otra fecha (ej. 2022/08/09).")
+            
+        with st.expander("Mosaico nacional"):
+            st.caption("Combina el escaneo más cercano de cada radar en una sola capa nacional.")
+            col_time, col_rule = st.columns(2)
+            with col_time:
+                mosaic_time = st.time_input("Hora (UTC)", value=pd.Timestamp("12:00").time(), step=600)
+            with col_rule:
+                rule = st.selectbox("Combinación", ["max", "distance"],
+                                    format_func=lambda r: {"max": "Máxima reflectividad", "distance": "Ponderada por distancia"}[r])
+            if st.button("Generar mosaico"):
+                from data_sources import radar_mosaic
+                with st.spinner("Combinando radares..."):
+                    image = radar_mosaic.render_mosaic(pd.Timestamp.combine(radar_date, mosaic_time), rule)
+                if image:
+                    st.image(image, width="stretch")
+                else:
+                    st.warning("Ningún radar tiene un escaneo cercano a esa hora.")
+
+        st.divider()
+        st.write("### Ubicación de Radares")
+        df_radares = ideam_radar.get_radar_locations()
+        st.map(df_radares[['lat', 'lon']])
+            
+    except Exception as e:
+        st.error(f"Error cargando módulo de radares: {e}")
+
+
+@st.fragment
+def render_data(df_final, base_filters):
+    """Paginated explorer over this session's canonical store.
+
+    Filters, sorting and column projection run on the Parquet store; only the
+    visible page is sent to the browser.
+    """
+    st.subheader("Datos Combinados (Canonical Record)")
+
+    all_columns = list(df_final.columns)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sources = st.multiselect("Fuente", sorted(df_final['source'].dropna().unique().tolist()))
+    with col2:
+        stations = st.multiselect("Estación", sorted(df_final['station_id'].dropna().astype(str).unique().tolist()))
+    with col3:
+        columns = st.multiselect("Columnas", all_columns, default=all_columns)
+
+    col4, col5, col6, col7 = st.columns(4)
+    with col4:
+        sort_by = st.selectbox("Ordenar por", all_columns, index=all_columns.index('timestamp') if 'timestamp' in all_columns else 0)
+    with col5:
+        ascending = st.toggle("Ascendente", value=True)
+    with col6:
+        page_size = st.selectbox("Filas por página", [50, 100, 500, 1000], index=1)
+    with col7:
+        page = st.number_input("Página", min_value=1, value=1, step=1)
+
+    filters = {**base_filters, 'source': sources, 'station_id': stations}
+    columns = columns or all_columns
+    store = storage.canonical_store_path(st.session_state.data_version)
+    try:
+        if not os.path.exists(store):
+            # Pruned while newer data was loaded by other sessions
+            storage.save_parquet(st.session_state.df_final, store)
+        df_page, total = storage.query_page(store, columns=columns, filters=filters, sort_by=sort_by,
+                                            ascending=ascending, page=page - 1, page_size=page_size)
+    except Exception as e:
+        st.error(f"Error consultando el almacenamiento canónico: {e}")
+        return
+
+    n_pages = max(1, -(-total // page_size))
+    st.dataframe(df_page, hide_index=True)
+    st.caption(f"Página {page} de {n_pages} ({total} registros)")
+
+    # Export is built only when the user clicks, streamed batch by batch
+    # through a temporary file instead of converting a DataFrame in memory.
+    fmt = st.radio("Formato de exportación", ["csv", "parquet"], horizontal=True)
+
+    def export():
+        return storage.export_bytes(store, fmt=fmt, columns=columns, filters=filters)
+
+    st.download_button("Descargar datos filtrados", data=export, file_name=f"canonical.{fmt}",
+                       mime="text/csv" if fmt == "csv" else "application/octet-stream")
+
+
+@st.fragment
+def render_predictions(df_final):
+    st.subheader("Predicción de Temperatura")
+    
+    # Forecasts are precomputed by the batch inference stage after each
+    # ingestion (see ml_models/batch_inference.py); this tab only reads them.
+    try:
+        forecasts = batch_inference.read_latest_forecasts(station_ids=df_final['station_id'].dropna().unique().tolist())
+    except Exception as e:
+        st.error(f"Error leyendo pronósticos: {e}")
+        return
+
+    if forecasts.empty:
+        st.warning("No hay pronósticos para estas estaciones. Ejecuta el entrenamiento (experimento 'Hourly_Weather_Forecast') y presiona 'Actualizar Datos'.")
+        return
+
+    model_name = st.selectbox("Modelo", sorted(forecasts['model'].unique()))
+    df_model = forecasts[forecasts['model'] == model_name]
+
+    # Latest observed temperature per station, to compare with the forecast
+    latest_data = df_final.sort_values('timestamp').groupby('station_id').tail(1)[['station_id', 'temp_c']]
+    next_hour = (
+        df_model.sort_values('valid_time').groupby('station_id').head(1)
+        .rename(columns={'issue_time': 'timestamp', 'value': 'predicted_temp_next_hour'})
+        .merge(latest_data, on='station_id', how='left')
+    )
+    
+    st.write("### Pronóstico para la próxima hora")
+    st.dataframe(next_hour[['station_id', 'timestamp', 'temp_c', 'predicted_temp_next_hour']])
+    
+    # Visualization
+    st.bar_chart(next_hour.set_index('station_id')[['temp_c', 'predicted_temp_next_hour']])
+
+    st.write("### Pronóstico por horizonte")
+    station = st.selectbox("Estación", sorted(df_model['station_id'].unique()))
+    st.line_chart(df_model[df_model['station_id'] == station].set_index('valid_time')['value'])
+
+
+if st.sidebar.button("Actualizar Datos"):
+    with st.spinner("Obteniendo y procesando datos..."):
+        load_data(start_date, end_date, include_radar_rain)
+
+df_final = st.session_state.get("df_final")
+
+if df_final is None:
+    st.info("Selecciona el rango de fechas y presiona 'Actualizar Datos'.")
+elif df_final.empty:
+    st.warning("No se pudieron obtener datos de ninguna fuente.")
+else:
+    # Municipality Filter (filters the loaded data, never refetches)
+    selected_munis = []
+    if 'municipality' in df_final.columns:
+        available_munis = sorted(df_final['municipality'].unique().tolist())
+        selected_munis = st.sidebar.multiselect("Filtrar por Municipio", available_munis, default=available_munis)
+        
+        if selected_munis:
+            df_final = df_final[df_final['municipality'].isin(selected_munis)]
+    
+    st.success(f"Datos mostrados: {len(df_final)} registros.")
+    
+    # Debug: Show source distribution (Restored)
+    st.sidebar.write("### Distribución por Fuente")
+    st.sidebar.write(df_final['source'].value_counts())
+
+    # Tabs for layout. Each tab is a fragment: its own widgets only rerun
+    # that tab, and sidebar filters re-render tabs from the loaded data.
+    tab_metrics, tab_map, tab_radares, tab_data, tab_pred = st.tabs(["Métricas", "Mapa", "Radares", "Datos", "Predicciones"])
+
+    with tab_metrics:
+        render_metrics(df_final, (st.session_state.data_version, tuple(selected_munis)))
+
+    with tab_map:
+        render_map(df_final)
+
+    with tab_radares:
+        render_radar()
+
+    with tab_data:
+        render_data(df_final, {'municipality': selected_munis})
+
+    # --- Predictions Tab ---
+    with tab_pred:
+        render_predictions(df_final)
@@ -0,0 +1,76 @@
+"""Import-time benchmark for the pipeline packages.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter for
+each module and reports the cumulative import time plus the slowest
+dependencies, so regressions in cold start are easy to spot.
+
+Usage:
+    python benchmarks/import_time.py [module ...]
+"""
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+# Modules whose cold start we care about (headless jobs, tests, dashboard)
+DEFAULT_MODULES = [
+    "processing.transform",
+    "processing.cleaning",
+    "processing.storage",
+    "data_sources.siata",
+    "data_sources.meteoblue",
+    "data_sources.meteosource",
+    "data_sources.ideam_radar",
+]
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def measure_import(module: str, python: Optional[str] = None) -> Dict:
+    """Import ``module`` (or a comma-separated list) in a fresh interpreter.
+
+    Parses the ``-X importtime`` report and returns a dict with the cumulative
+    time of ``module`` in seconds, the per-module cumulative times in seconds
+    and the set of loaded top-level packages.
+    """
+    code = f"import sys, {module}; print(','.join(sorted({{m.split('.')[0] for m in sys.modules}})))"
+    result = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|", 1).split("|")]
+        cumulative[name] = int(cumulative_us) / 1e6
+
+    return {
+        "module": module,
+        "seconds": cumulative.get(module, 0.0),
+        "cumulative": cumulative,
+        "loaded": set(result.stdout.strip().split(",")),
+    }
+
+
+def slowest(cumulative: Dict[str, float], n: int = 10) -> List[tuple]:
+    """Return the ``n`` slowest top-level imports as ``(name, seconds)``."""
+    top_level = {name: t for name, t in cumulative.items() if "." not in name}
+    return sorted(top_level.items(), key=lambda kv: kv[1], reverse=True)[:n]
+
+
+def main(modules: List[str]) -> None:
+    for module in modules:
+        stats = measure_import(module)
+        print(f"{module}: {stats['seconds'] * 1000:.0f} ms")
+        for name, seconds in slowest(stats["cumulative"], n=5):
+            print(f"    {name:<30} {seconds * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or DEFAULT_MODULES)
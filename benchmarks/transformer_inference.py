@@ -0,0 +1,99 @@
+"""CPU inference benchmark of the exported transformer models.
+
+Compares eager PyTorch with the exported variants (TorchScript fp32 and
+dynamic int8 for PatchTST; dynamic int8 for Informer's ``generate``) on
+single-series latency and batched throughput. Models are randomly
+initialised with the trainers' default sizes, which is enough for timing.
+
+Usage:
+    python benchmarks/transformer_inference.py [batch_size] [repeats]
+"""
+import os
+import sys
+import time
+import warnings
+
+import torch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_models import export
+from ml_models.predictor import INFORMER_SAMPLES
+
+
+def timed(fn, repeats: int) -> float:
+    """Median seconds per call of ``fn`` after one warm-up call."""
+    fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def report(name: str, latency: float, batch_time: float, batch_size: int) -> None:
+    print(f"{name:28s} latency {latency * 1e3:8.2f} ms   throughput {batch_size / batch_time:10.0f} series/s")
+
+
+def bench_patchtst(batch_size: int, repeats: int) -> None:
+    from transformers import PatchTSTConfig, PatchTSTForPrediction
+    from ml_models import transformer_informer as trainer
+
+    p = trainer.DEFAULT_PARAMS
+    config = PatchTSTConfig(
+        prediction_length=p["prediction_length"], context_length=p["context_length"], num_input_channels=1,
+        d_model=p["d_model"], encoder_layers=p["encoder_layers"], encoder_attention_heads=p["encoder_attention_heads"],
+        encoder_ffn_dim=p["encoder_ffn_dim"],
+    )
+    model = PatchTSTForPrediction(config).eval()
+    one = torch.randn(1, p["context_length"], 1)
+    batch = torch.randn(batch_size, p["context_length"], 1)
+
+    variants = {
+        'patchtst eager': lambda x: model(past_values=x).prediction_outputs,
+        'patchtst torchscript': export.trace_patchtst(model, p["context_length"]),
+        'patchtst torchscript int8': export.trace_patchtst(model, p["context_length"], quantize=True),
+    }
+    with torch.inference_mode():
+        for name, fn in variants.items():
+            report(name, timed(lambda: fn(one), repeats), timed(lambda: fn(batch), repeats), batch_size)
+
+
+def bench_informer(batch_size: int, repeats: int) -> None:
+    from transformers import InformerConfig, InformerForPrediction
+    from models import train_transformer as trainer
+
+    p = trainer.DEFAULT_PARAMS
+    lags = trainer.LAGS_SEQUENCE
+    config = InformerConfig(
+        prediction_length=p["prediction_length"], context_length=p["context_length"], input_size=1,
+        num_time_features=4, lags_sequence=lags, num_static_categorical_features=1, cardinality=[8],
+        embedding_dimension=[p["embedding_dim"]], encoder_layers=p["encoder_layers"],
+        decoder_layers=p["decoder_layers"], d_model=p["d_model"], num_parallel_samples=INFORMER_SAMPLES,
+    )
+    model = InformerForPrediction(config).eval()
+    past = p["context_length"] + max(lags)
+
+    def inputs(n):
+        return dict(
+            past_values=torch.randn(n, past), past_observed_mask=torch.ones(n, past),
+            past_time_features=torch.randn(n, past, 4), future_time_features=torch.randn(n, p["prediction_length"], 4),
+            static_categorical_features=torch.zeros(n, 1, dtype=torch.long),
+        )
+
+    one, batch = inputs(1), inputs(batch_size)
+    quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    with torch.inference_mode():
+        for name, m in (('informer eager', model), ('informer int8', quantized)):
+            report(name, timed(lambda: m.generate(**one), repeats), timed(lambda: m.generate(**batch), repeats), batch_size)
+
+
+def main(batch_size: int = 256, repeats: int = 10) -> None:
+    warnings.filterwarnings('ignore')
+    print(f"torch {torch.__version__}, {torch.get_num_threads()} threads, batch size {batch_size}")
+    bench_patchtst(batch_size, repeats)
+    bench_informer(batch_size, max(1, repeats // 5))
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,76 @@
+"""Samples-per-second benchmark of the transformer window datasets.
+
+Compares the previous per-item implementation (slice + new tensors + mask
+allocation in every ``__getitem__``, default collate) with the strided
+:class:`ml_models.windows.SlidingWindowDataset` and its batch collate path.
+
+Usage:
+    python benchmarks/window_dataset.py [n_hours] [batch_size]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_models.windows import SlidingWindowDataset, collate_batch
+
+CONTEXT_LENGTH = 48
+PREDICTION_LENGTH = 24
+
+
+class LegacyWeatherDataset(Dataset):
+    """Per-item implementation previously used by the Informer trainer."""
+
+    def __init__(self, data, time_features, context_length, prediction_length):
+        self.data = data
+        self.time_features = time_features
+        self.context_length = context_length
+        self.prediction_length = prediction_length
+
+    def __len__(self):
+        return len(self.data) - self.context_length - self.prediction_length
+
+    def __getitem__(self, idx):
+        past_end = idx + self.context_length
+        future_end = past_end + self.prediction_length
+        past_values = self.data[idx:past_end]
+        return {
+            "past_values": torch.tensor(past_values).unsqueeze(-1),
+            "past_time_features": torch.tensor(self.time_features[idx:past_end]),
+            "past_observed_mask": torch.ones_like(torch.tensor(past_values)).unsqueeze(-1),
+            "future_values": torch.tensor(self.data[past_end:future_end]).unsqueeze(-1),
+            "future_time_features": torch.tensor(self.time_features[past_end:future_end]),
+        }
+
+
+def samples_per_second(loader, epochs: int = 3) -> float:
+    samples = 0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for batch in loader:
+            samples += batch["past_values"].shape[0]
+    return samples / (time.perf_counter() - start)
+
+
+def main(n_hours: int = 24 * 365, batch_size: int = 32) -> None:
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=n_hours).astype(np.float32)
+    time_features = rng.normal(size=(n_hours, 4)).astype(np.float32)
+
+    legacy = LegacyWeatherDataset(data, time_features, CONTEXT_LENGTH, PREDICTION_LENGTH)
+    strided = SlidingWindowDataset(data, CONTEXT_LENGTH, PREDICTION_LENGTH, time_features=time_features, with_mask=True)
+
+    legacy_sps = samples_per_second(DataLoader(legacy, batch_size=batch_size, shuffle=True))
+    strided_sps = samples_per_second(DataLoader(strided, batch_size=batch_size, shuffle=True, collate_fn=collate_batch))
+
+    print(f"{n_hours} hours, batch size {batch_size}")
+    print(f"legacy : {legacy_sps:12.0f} samples/s")
+    print(f"strided: {strided_sps:12.0f} samples/s ({strided_sps / legacy_sps:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -1,21 +1,27 @@
 """IDEAM Radar data source.
 
 Fetches and processes radar data from IDEAM's S3 bucket using xradar and cartopy.
+
+xradar, cartopy and matplotlib take seconds to import, so they are loaded
+inside the functions that use them. Importing this module only costs pandas
+and fsspec; the S3 backend (s3fs) is resolved by fsspec on first use.
+
+Radar volumes are immutable once published, so they are fetched once into a
+local content-addressed LRU cache (:class:`processing.disk_cache.DiskCache`)
+and opened from disk by path, which xradar memory-maps. Listings come from a
+persistent manifest (:mod:`data_sources.radar_manifest`). :func:`read_radar`
+opens only the sweeps and moments a caller needs, and plots are drawn from
+sweeps regridded onto a lat/lon grid (:mod:`processing.radar_grid`). The
+radar tab shows PNG frames rendered once per scan and colormap and cached on
+disk (:mod:`processing.radar_render`), preceded by a coarse quick-look.
 """
-import warnings
-import fsspec
-import numpy as np
+import threading
 import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-import xradar as xd
-from typing import Optional, List
-import io
-import s3fs
-import cmweather
+from typing import Optional, List, Sequence
+
+from data_sources.radar_manifest import RadarManifest
+from processing import radar_grid, radar_render
+from processing.disk_cache import DiskCache
 
 # Radar locations in Colombia
 RADAR_LOCATIONS = {
@@ -25,6 +31,49 @@ RADAR_LOCATIONS = {
     "Munchique": {"lat": 2.533, "lon": -76.967, "range_km": 200},
 }
 
+# Local copies of radar volumes
+VOLUME_CACHE_DIR = "data/cache/radar"
+VOLUME_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Quick-look frames: decimated sweep on a coarse grid, shown at the full frame's size
+QUICKLOOK_RAY_STEP = 4
+QUICKLOOK_GATE_STEP = 4
+QUICKLOOK_RESOLUTION = 0.04
+QUICKLOOK_SCALE = int(round(radar_render.SCALE * QUICKLOOK_RESOLUTION / radar_grid.GRID_RESOLUTION))
+
+_volume_cache: Optional[DiskCache] = None
+_manifest: Optional[RadarManifest] = None
+_singleton_lock = threading.Lock()
+
+
+def get_volume_cache() -> DiskCache:
+    """Process-wide cache of downloaded radar volumes."""
+    global _volume_cache
+    with _singleton_lock:
+        if _volume_cache is None:
+            _volume_cache = DiskCache(VOLUME_CACHE_DIR, VOLUME_CACHE_MAX_BYTES, anon=True)
+        return _volume_cache
+
+
+def get_manifest() -> RadarManifest:
+    """Process-wide manifest of the radar scans on S3."""
+    global _manifest
+    with _singleton_lock:
+        if _manifest is None:
+            _manifest = RadarManifest()
+        return _manifest
+
+
+def s3_url(path: str) -> str:
+    """``path`` with the ``s3://`` prefix listings leave out."""
+    return path if path.startswith("s3://") else f"s3://{path}"
+
+
+def fetch_volume(s3_path: str) -> str:
+    """Local path of a radar volume, downloaded on first use."""
+    return get_volume_cache().get(s3_url(s3_path))
+
+
 def get_radar_locations() -> pd.DataFrame:
     """Return DataFrame with radar locations."""
     data = []
@@ -38,19 +87,74 @@ def get_radar_locations() -> pd.DataFrame:
         })
     return pd.DataFrame(data)
 
-def list_available_radar_files(date_str: str, radar_name: str, limit: int = 10) -> List[str]:
-    """List available radar files from IDEAM S3 bucket for a specific date and radar."""
+def list_available_radar_files(date_str: str, radar_name: str, limit: Optional[int] = 10) -> List[str]:
+    """List radar files of a radar on a date (``YYYY/MM/DD``), oldest first.
+
+    Served from the local manifest; S3 is only listed for days not seen yet
+    and, at most every few minutes, for days that may still get new scans.
+    """
     try:
-        fs = fsspec.filesystem("s3", anon=True)
-        # Pattern: s3-radaresideam/l2_data/YYYY/MM/DD/RadarName/*
-        # date_str expected as YYYY/MM/DD
-        pattern = f"s3-radaresideam/l2_data/{date_str}/{radar_name}/*"
-        files = sorted(fs.glob(pattern))
-        return files[:limit]
+        files = get_manifest().day(radar_name, pd.to_datetime(date_str, format="%Y/%m/%d"))['path'].tolist()
+        return files[:limit] if limit else files
     except Exception as e:
         print(f"Error listing radar files: {e}")
         return []
 
+def list_radar_scans(radar_name: str, start, end) -> pd.DataFrame:
+    """Scans (``path``, ``scan_time``, ``size``) of a radar in ``[start, end)`` UTC."""
+    return get_manifest().scans(radar_name, start, end)
+
+def select_moments(tree, moments: Optional[Sequence[str]]):
+    """Drop every moment (gate field) of ``tree`` not in ``moments``; None keeps all."""
+    if moments is None:
+        return tree
+    keep = set(moments)
+
+    def select(ds):
+        return ds.drop_vars([v for v in ds.data_vars if 'range' in ds[v].dims and v not in keep])
+
+    return tree.map_over_datasets(select)
+
+
+def number_sweeps(tree, sweeps: Sequence[int]):
+    """Rename the ``sweep_0..k-1`` groups xradar makes of a selection to ``sweep_<n>`` of ``sweeps``."""
+    import xarray as xr
+
+    names = {f"/sweep_{i}": f"/sweep_{n}" for i, n in enumerate(sweeps)}
+    groups = {names.get(node.path, node.path): node.to_dataset(inherit=False) for node in tree.subtree}
+    root = groups["/"]
+    if "sweep_group_name" in root:
+        groups["/"] = root.assign(sweep_group_name=(root["sweep_group_name"].dims, [f"sweep_{n}" for n in sweeps]))
+    return xr.DataTree.from_dict(groups)
+
+
+def read_radar(path: str, sweeps: Optional[Sequence[int]] = (0,), moments: Optional[Sequence[str]] = ("DBZH",),
+               georeference: bool = True):
+    """Open selected sweeps and moments of a local IRIS volume as a DataTree.
+
+    Only the ``sweep_<n>`` groups in ``sweeps`` are read (None reads all),
+    under their volume numbers (xradar renumbers a selection from 0), and
+    only ``moments`` are kept (None keeps all). IRIS moments are decoded
+    lazily, on first access, so unselected ones are never decoded; only the
+    selected sweeps are georeferenced.
+    """
+    import xradar as xd
+
+    kwargs = {} if sweeps is None else {'sweep': [f"sweep_{n}" for n in sweeps]}
+    tree = xd.io.open_iris_datatree(path, **kwargs)
+    if sweeps is not None and list(sweeps) != list(range(len(sweeps))):
+        tree = number_sweeps(tree, sweeps)
+    tree = select_moments(tree, moments)
+    if georeference:
+        tree = tree.xradar.georeference()
+    return tree
+
+
+def sweep_dataset(tree, sweep: int = 0):
+    """Sweep ``sweep`` of a radar DataTree with the site coordinates of the root."""
+    return tree[f"sweep_{sweep}"].to_dataset(inherit="all_coords")
+
+
 def create_radar_plot(s3_path: str):
     """
     Reads a radar file from S3 and creates a matplotlib figure with reflectivity (DBZH).
@@ -61,69 +165,56 @@ def create_radar_plot(s3_path: str):
     Returns:
         matplotlib.figure.Figure or None if error
     """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+
     fig = None
     try:
-        # Ensure s3:// prefix
-        if not s3_path.startswith("s3://"):
-            full_path = f"s3://{s3_path}"
-        else:
-            full_path = s3_path
+        print(f"DEBUG: Opening {s3_path}...")
+
+        # Opened by path from the local cache (memory-mapped, no copies);
+        # only the first sweep's reflectivity is decoded
+        radar = read_radar(fetch_volume(s3_path), sweeps=[0], moments=["DBZH"], georeference=False)
+        sweep = sweep_dataset(radar, 0)
 
-        print(f"DEBUG: Opening {full_path}...")
+        # Onto the radar's lat/lon grid with the cached regridding matrix
+        field = radar_grid.regrid_sweep(sweep, "DBZH")
+
+        # Create Plot
+        # Use subplots for better memory management
+        fig, ax = plt.subplots(figsize=(10, 8), subplot_kw={'projection': ccrs.PlateCarree()})
+        
+        # Plot DBZH (Reflectivity)
+        cmap = "jet"
+        try:
+            import cmweather
+            cmap = "ChaseSpectral"
+        except ImportError:
+            pass
+
+        field.plot.imshow(
+            x="lon",
+            y="lat",
+            cmap=cmap,
+            transform=ccrs.PlateCarree(),
+            cbar_kwargs={'label': 'Reflectividad [dBZ]', 'shrink': 0.8},
+            vmin=-10,
+            vmax=60,
+            ax=ax
+        )
         
-        # Using fsspec to open a file-like object
-        with fsspec.open(full_path, mode="rb", anon=True) as f:
-            content = f.read()
-            with io.BytesIO(content) as buffer:
-                radar = xd.io.open_iris_datatree(buffer)
-                
-                # Georeference
-                radar = radar.xradar.georeference()
-                
-                # Get first sweep
-                sweep = radar["sweep_0"]
-                
-                # Get CRS
-                proj_crs = xd.georeference.get_crs(sweep.ds)
-                cart_crs = ccrs.Projection(proj_crs)
-                
-                # Create Plot
-                # Use subplots for better memory management
-                fig, ax = plt.subplots(figsize=(10, 8), subplot_kw={'projection': ccrs.PlateCarree()})
-                
-                # Plot DBZH (Reflectivity)
-                cmap = "jet"
-                try:
-                    import cmweather
-                    cmap = "ChaseSpectral"
-                except ImportError:
-                    pass
-
-                sweep["DBZH"].plot(
-                    x="x",
-                    y="y",
-                    cmap=cmap,
-                    transform=cart_crs,
-                    cbar_kwargs={'label': 'Reflectividad [dBZ]', 'shrink': 0.8},
-                    vmin=-10,
-                    vmax=60,
-                    ax=ax
-                )
-                
-                # Add geographic features
-                ax.coastlines()
-                ax.add_feature(cfeature.BORDERS, linestyle=':')
-                ax.gridlines(draw_labels=True, linestyle='--', alpha=0.5)
-                
-                # Title
-                try:
-                    time_str = str(sweep["time"].values[0])[:19]
-                except:
-                    time_str = "Unknown Time"
-                ax.set_title(f"Reflectividad - {time_str} UTC")
-                
-                return fig
+        # Add geographic features
+        ax.coastlines()
+        ax.add_feature(cfeature.BORDERS, linestyle=':')
+        ax.gridlines(draw_labels=True, linestyle='--', alpha=0.5)
         
+        # Title
+        ax.set_title(scan_title(sweep))
+        
+        return fig
     except Exception as e:
         print(f"Error creating radar plot for {s3_path}: {e}")
         import traceback
@@ -131,3 +222,54 @@ def create_radar_plot(s3_path: str):
         if fig:
             plt.close(fig)
         return None
+
+
+def scan_title(sweep) -> str:
+    try:
+        time_str = str(sweep["time"].values[0])[:19]
+    except Exception:
+        time_str = "Unknown Time"
+    return f"Reflectividad - {time_str} UTC"
+
+
+def cached_radar_image(s3_path: str, moment: str = "DBZH", cmap: Optional[str] = None,
+                       quicklook: bool = False) -> Optional[str]:
+    """PNG path of a scan already rendered by :func:`render_radar_image`, if any."""
+    return radar_render.cached_render(_image_key(s3_path, moment, cmap, quicklook))
+
+
+def _image_key(s3_path: str, moment: str, cmap: Optional[str], quicklook: bool) -> str:
+    if quicklook:
+        return radar_render.render_key(s3_path, moment, cmap, scale=QUICKLOOK_SCALE, variant="quicklook")
+    return radar_render.render_key(s3_path, moment, cmap)
+
+
+def render_radar_image(s3_path: str, moment: str = "DBZH", cmap: Optional[str] = None,
+                       quicklook: bool = False) -> Optional[str]:
+    """PNG path of the first sweep of a scan, rendered on first request.
+
+    Frames are regridded fields composited over a basemap drawn once per
+    radar extent; later requests are served from the render cache.
+    ``quicklook`` renders every ``QUICKLOOK_RAY_STEP``-th ray and
+    ``QUICKLOOK_GATE_STEP``-th gate on a coarse grid without basemap, at
+    the same on-screen size, for a first look while the full image renders.
+    Returns None on error.
+    """
+    def frame():
+        sweep = sweep_dataset(read_radar(fetch_volume(s3_path), sweeps=[0], moments=[moment], georeference=False))
+        title = scan_title(sweep)
+        if quicklook:
+            sweep = sweep.isel(azimuth=slice(None, None, QUICKLOOK_RAY_STEP), range=slice(None, None, QUICKLOOK_GATE_STEP))
+        geometry = radar_grid.SweepGeometry.from_sweep(sweep)
+        grid = radar_grid.default_grid(geometry, QUICKLOOK_RESOLUTION if quicklook else radar_grid.GRID_RESOLUTION)
+        field = radar_grid.regrid_sweep(sweep, moment, grid)
+        if quicklook:
+            return radar_render.compose(field.values, grid, f"{title} (vista previa)", cmap,
+                                        scale=QUICKLOOK_SCALE, with_basemap=False)
+        return radar_render.compose(field.values, grid, title, cmap)
+
+    try:
+        return radar_render.render(_image_key(s3_path, moment, cmap, quicklook), frame)
+    except Exception as e:
+        print(f"Error rendering radar image for {s3_path}: {e}")
+        return None
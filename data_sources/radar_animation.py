@@ -0,0 +1,175 @@
+"""Animation of a whole day of scans of one radar.
+
+Every scan of the day (from the manifest) is decoded, regridded and
+rendered to a frame by :func:`data_sources.ideam_radar.render_radar_image`
+in ``spawn`` worker processes, so decoding runs on every core instead of
+behind the GIL. Frames go to the shared render cache, so scans already seen
+in the radar tab or in an earlier animation are not rendered again. The
+frames are then assembled, in scan order, into a GIF next to a JSON frame
+index (one record per scan: time, path, frame image and status):
+
+    data/cache/radar_animation/<radar>/<YYYY-MM-DD>.gif
+    data/cache/radar_animation/<radar>/<YYYY-MM-DD>.json
+
+An animation whose index already lists every scan of the day, all rendered,
+is returned as is.
+
+Usage:
+    python data_sources/radar_animation.py Carimagua 2022-08-09 [--workers 4]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import pandas as pd
+
+# Allow running as a script (python data_sources/radar_animation.py) from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from data_sources import ideam_radar
+
+ANIMATION_DIR = "data/cache/radar_animation"
+FRAME_MS = 200
+# Frames are downscaled by this factor in the animation (not in the cache)
+ANIMATION_SCALE = 0.5
+
+# progress(done, total, scan path)
+Progress = Callable[[int, int, str], None]
+
+
+@dataclass(frozen=True)
+class DayAnimation:
+    path: Optional[str]
+    index: pd.DataFrame
+
+    @property
+    def failed(self) -> int:
+        return int((self.index['status'] == 'failed').sum()) if len(self.index) else 0
+
+
+def animation_paths(radar: str, day, root: str = ANIMATION_DIR):
+    """``(gif, index)`` paths of the animation of ``radar`` on ``day``."""
+    base = os.path.join(root, radar, f"{pd.Timestamp(day):%Y-%m-%d}")
+    return f"{base}.gif", f"{base}.json"
+
+
+def load_index(path: str) -> Optional[pd.DataFrame]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        index = pd.DataFrame(json.load(f))
+    return index.assign(scan_time=pd.to_datetime(index['scan_time'])) if len(index) else index
+
+
+def _render(path: str, cmap: Optional[str]) -> Optional[str]:
+    return ideam_radar.render_radar_image(path, cmap=cmap)
+
+
+def render_frames(paths, cmap: Optional[str] = None, max_workers: Optional[int] = None,
+                  progress: Optional[Progress] = None) -> dict:
+    """Frame image (or None on failure) of every scan in ``paths``.
+
+    Cached frames are looked up first; the rest are rendered in a process
+    pool (``max_workers=0`` renders in-process).
+    """
+    frames = {p: ideam_radar.cached_radar_image(p, cmap=cmap) for p in paths}
+    todo = [p for p in paths if frames[p] is None]
+    total, done = len(paths), len(paths) - len(todo)
+    if progress:
+        progress(done, total, "")
+
+    if todo and max_workers == 0:
+        for p in todo:
+            frames[p] = _render(p, cmap)
+            done += 1
+            if progress:
+                progress(done, total, p)
+    elif todo:
+        workers = min(max_workers or os.cpu_count() or 1, len(todo))
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=ctx) as pool:
+            futures = {pool.submit(_render, p, cmap): p for p in todo}
+            for future in as_completed(futures):
+                p = futures[future]
+                try:
+                    frames[p] = future.result()
+                except Exception as e:
+                    print(f"Error rendering {p}: {e}")
+                done += 1
+                if progress:
+                    progress(done, total, p)
+    return frames
+
+
+def write_gif(images, path: str, frame_ms: int = FRAME_MS, scale: float = ANIMATION_SCALE) -> None:
+    """Write frame images (paths) as a looping GIF, resized to the first frame."""
+    from PIL import Image
+
+    frames, size = [], None
+    for image in images:
+        with Image.open(image) as im:
+            if size is None:
+                size = (max(1, round(im.width * scale)), max(1, round(im.height * scale)))
+            frames.append(im.convert('RGB').resize(size, Image.BILINEAR).quantize(256))
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    os.close(fd)
+    try:
+        frames[0].save(tmp, format='GIF', save_all=True, append_images=frames[1:], duration=frame_ms,
+                       loop=0, optimize=True)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def animate_day(radar: str, day, cmap: Optional[str] = None, max_workers: Optional[int] = None,
+                progress: Optional[Progress] = None, root: str = ANIMATION_DIR) -> DayAnimation:
+    """Animation of every scan of ``radar`` on ``day`` (UTC)."""
+    day = pd.Timestamp(day).normalize()
+    scans = ideam_radar.list_radar_scans(radar, day, day + pd.Timedelta(days=1))
+    gif, index_path = animation_paths(radar, day, root)
+
+    previous = load_index(index_path)
+    if (previous is not None and os.path.exists(gif) and list(previous['path']) == list(scans['path'])
+            and (previous['status'] != 'failed').all()):
+        if progress:
+            progress(len(scans), len(scans), "")
+        return DayAnimation(gif, previous)
+
+    frames = render_frames(scans['path'].tolist(), cmap, max_workers, progress)
+    index = scans[['path', 'scan_time']].assign(
+        image=scans['path'].map(frames),
+        status=lambda d: d['image'].notna().map({True: 'ok', False: 'failed'}),
+    )
+    rendered = index[index['status'] == 'ok']
+    index['frame'] = pd.Series(range(len(rendered)), index=rendered.index).reindex(index.index).astype('Int64')
+
+    os.makedirs(os.path.dirname(gif), exist_ok=True)
+    if len(rendered):
+        write_gif(rendered['image'], gif)
+    with open(index_path, 'w') as f:
+        f.write(index.to_json(orient='records', date_format='iso'))
+    return DayAnimation(gif if len(rendered) else None, index)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('radar', choices=sorted(ideam_radar.RADAR_LOCATIONS))
+    parser.add_argument('day', help='YYYY-MM-DD (UTC)')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    def report(done, total, path):
+        print(f"{done}/{total} {path.rsplit('/', 1)[-1]}")
+
+    result = animate_day(args.radar, args.day, max_workers=args.workers, progress=report)
+    print(f"{result.path} ({len(result.index)} scans, {result.failed} failed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Persistent manifest of the IDEAM radar scans on S3.
+
+Listing ``s3-radaresideam/l2_data/{YYYY/MM/DD}/{radar}/`` is slow, so each
+radar/day listing is kept locally as a small Parquet file with the path,
+size and scan time of every scan (parsed from names like
+``CAR220809000004.RAW7ABC``: a three-letter radar code and
+``YYMMDDHHMMSS``). A day whose listing was taken well after it ended is
+final and never listed again; a day that may still receive scans (today)
+is re-listed at most every ``refresh_s`` seconds, and only its new entries
+are added. Pickers and time-range queries are then answered from disk.
+"""
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Dict, Tuple
+
+import fsspec
+import pandas as pd
+
+BUCKET_PREFIX = "s3-radaresideam/l2_data"
+MANIFEST_DIR = "data/cache/radar_manifest"
+REFRESH_S = 120
+# Uploads lag the scans, so a listing is final only this long after the day ended
+SETTLE = pd.Timedelta(hours=2)
+
+SCAN_NAME = re.compile(r'^[A-Z]{3}(\d{12})\.RAW')
+COLUMNS = ['path', 'scan_time', 'size']
+
+
+def parse_scan_time(path: str) -> pd.Timestamp:
+    """Scan time (UTC) encoded in a radar file name, NaT if it has none."""
+    match = SCAN_NAME.match(path.rsplit('/', 1)[-1])
+    if not match:
+        return pd.NaT
+    return pd.to_datetime(match.group(1), format='%y%m%d%H%M%S', errors='coerce')
+
+
+def _empty() -> pd.DataFrame:
+    return pd.DataFrame({'path': pd.Series(dtype=object), 'scan_time': pd.Series(dtype='datetime64[ns]'),
+                         'size': pd.Series(dtype='int64')})
+
+
+class RadarManifest:
+    """Local index of radar scans by radar and day.
+
+    Args:
+        root: Directory of the per-day Parquet listings.
+        fs: fsspec filesystem to list; defaults to anonymous S3.
+        prefix: Bucket prefix holding the ``YYYY/MM/DD/<radar>`` folders.
+        refresh_s: Minimum age of a non-final listing before it is refreshed.
+    """
+
+    def __init__(self, root: str = MANIFEST_DIR, fs=None, prefix: str = BUCKET_PREFIX,
+                 refresh_s: float = REFRESH_S):
+        self.root = root
+        self.prefix = prefix
+        self.refresh_s = refresh_s
+        self._fs = fs
+        self._lock = threading.Lock()
+        self._day_locks: Dict[Tuple[str, pd.Timestamp], threading.Lock] = {}
+        # (radar, day) -> (file mtime, listing)
+        self._frames: Dict[Tuple[str, pd.Timestamp], Tuple[float, pd.DataFrame]] = {}
+        self.listings = 0
+
+    @property
+    def fs(self):
+        if self._fs is None:
+            self._fs = fsspec.filesystem("s3", anon=True)
+        return self._fs
+
+    def _path(self, radar: str, day: pd.Timestamp) -> str:
+        return os.path.join(self.root, radar, f"{day:%Y-%m-%d}.parquet")
+
+    def _day_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._day_locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def is_final(day: pd.Timestamp, listed_at: float) -> bool:
+        """Whether a listing taken at ``listed_at`` (epoch s) covers the whole day."""
+        return pd.Timestamp(listed_at, unit='s') >= day + pd.Timedelta(days=1) + SETTLE
+
+    def day(self, radar: str, day, refresh: bool = False) -> pd.DataFrame:
+        """Scans of ``radar`` on ``day`` (UTC), sorted by scan time.
+
+        Lists S3 only when the day was never listed, or when its listing is
+        not final and older than ``refresh_s`` (or ``refresh`` is set).
+        """
+        day = pd.Timestamp(day).normalize()
+        key = (radar, day)
+        path = self._path(radar, day)
+        with self._day_lock(key):
+            mtime = os.path.getmtime(path) if os.path.exists(path) else None
+            if mtime is not None and (self.is_final(day, mtime)
+                                      or (not refresh and time.time() - mtime < self.refresh_s)):
+                return self._load(key, path, mtime)
+            known = self._load(key, path, mtime) if mtime is not None else _empty()
+            return self._refresh(key, path, known)
+
+    def scans(self, radar: str, start, end) -> pd.DataFrame:
+        """Scans of ``radar`` with ``start <= scan_time < end``."""
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        days = pd.date_range(start.normalize(), (end - pd.Timedelta(microseconds=1)).normalize(), freq='D')
+        frames = [self.day(radar, d) for d in days]
+        df = pd.concat(frames, ignore_index=True) if frames else _empty()
+        return df[(df['scan_time'] >= start) & (df['scan_time'] < end)].reset_index(drop=True)
+
+    def _load(self, key, path: str, mtime: float) -> pd.DataFrame:
+        cached = self._frames.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        df = pd.read_parquet(path)
+        self._frames[key] = (mtime, df)
+        return df
+
+    def _refresh(self, key, path: str, known: pd.DataFrame) -> pd.DataFrame:
+        radar, day = key
+        folder = f"{self.prefix}/{day:%Y/%m/%d}/{radar}"
+        try:
+            entries = self.fs.ls(folder, detail=True, refresh=True)
+        except FileNotFoundError:
+            entries = []
+        self.listings += 1
+
+        seen = set(known['path'])
+        new = [e for e in entries if e.get('type', 'file') == 'file' and e['name'] not in seen]
+        df = known
+        if new:
+            rows = pd.DataFrame({
+                'path': [e['name'] for e in new],
+                'scan_time': pd.to_datetime([parse_scan_time(e['name']) for e in new]),
+                'size': [int(e.get('size') or 0) for e in new],
+            })
+            df = pd.concat([known, rows], ignore_index=True) if len(known) else rows
+            df = df.sort_values(['scan_time', 'path'], na_position='last').reset_index(drop=True)
+
+        # Rewritten even when unchanged: the file time records when it was listed
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        os.close(fd)
+        df[COLUMNS].to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        self._frames[key] = (os.path.getmtime(path), df)
+        return df
@@ -0,0 +1,194 @@
+"""National reflectivity mosaic of the IDEAM radars.
+
+Time is divided into slots of ``SLOT``; for each slot the scan of every radar
+in ``RADAR_LOCATIONS`` closest to it (within ``TOLERANCE``) is regridded onto
+the radar's own aligned grid with its cached matrix
+(:mod:`processing.radar_grid`), in ``spawn`` worker processes, and placed
+into one national grid covering every radar. Radar grids share the national
+grid's resolution and alignment, so placing one is a slice assignment.
+Overlaps are merged with either rule:
+
+* ``max``: the highest reflectivity of any radar (keeps every storm core);
+* ``distance``: the mean weighted by inverse squared distance to each radar
+  (favours the radar that sees the cell lowest and with the narrowest beam).
+
+Merged slots are stored in a :class:`processing.disk_cache.DiskCache` keyed
+by slot, rule, grid and the scans used, so a slot is recomputed only when a
+closer scan shows up.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_sources import ideam_radar
+from processing import radar_grid, radar_render
+from processing.disk_cache import DiskCache
+from processing.radar_grid import GridSpec
+
+MOSAIC_CACHE_DIR = "data/cache/radar_mosaic"
+MOSAIC_CACHE_MAX_BYTES = 1024 ** 3
+# Part of every cache key: bump when merging changes
+MOSAIC_VERSION = 1
+
+SLOT = pd.Timedelta(minutes=10)
+TOLERANCE = pd.Timedelta(minutes=5)
+RULES = ('max', 'distance')
+# The national layer is large: one pixel per cell
+MOSAIC_SCALE = 1
+
+_mosaic_cache: Optional[DiskCache] = None
+_lock = threading.Lock()
+_weights: Dict[Tuple, np.ndarray] = {}
+
+
+@dataclass
+class Mosaic:
+    slot: pd.Timestamp
+    grid: GridSpec
+    values: np.ndarray
+    # radar -> scan path
+    scans: Dict[str, str]
+
+
+def get_mosaic_cache() -> DiskCache:
+    """Process-wide cache of merged mosaics."""
+    global _mosaic_cache
+    with _lock:
+        if _mosaic_cache is None:
+            _mosaic_cache = DiskCache(MOSAIC_CACHE_DIR, MOSAIC_CACHE_MAX_BYTES)
+        return _mosaic_cache
+
+
+def national_grid(resolution: float = radar_grid.GRID_RESOLUTION) -> GridSpec:
+    """Aligned grid covering the range of every radar."""
+    return GridSpec.covering(GridSpec.around(info['lat'], info['lon'], info['range_km'], resolution)
+                             for info in ideam_radar.RADAR_LOCATIONS.values())
+
+
+def match_scans(slot: pd.Timestamp, tolerance: pd.Timedelta = TOLERANCE) -> Dict[str, str]:
+    """Scan of each radar closest to ``slot``, for radars with one within ``tolerance``."""
+    matched = {}
+    for radar in ideam_radar.RADAR_LOCATIONS:
+        try:
+            scans = ideam_radar.list_radar_scans(radar, slot - tolerance, slot + tolerance)
+        except Exception as e:
+            print(f"Error listing {radar} scans: {e}")
+            continue
+        if len(scans):
+            matched[radar] = scans['path'][(scans['scan_time'] - slot).abs().idxmin()]
+    return matched
+
+
+def _regrid_scan(path: str, resolution: float) -> Optional[Tuple[GridSpec, np.ndarray]]:
+    try:
+        sweep = ideam_radar.sweep_dataset(ideam_radar.read_radar(ideam_radar.fetch_volume(path), sweeps=[0],
+                                                                 moments=["DBZH"], georeference=False))
+        grid = radar_grid.default_grid(radar_grid.SweepGeometry.from_sweep(sweep), resolution)
+        return grid, radar_grid.regrid_sweep(sweep, "DBZH", grid).values
+    except Exception as e:
+        print(f"Error regridding radar scan {path}: {e}")
+        return None
+
+
+def regrid_scans(paths: Sequence[str], resolution: float = radar_grid.GRID_RESOLUTION,
+                 max_workers: Optional[int] = None) -> Dict[str, Optional[Tuple[GridSpec, np.ndarray]]]:
+    """Each scan regridded on its radar's aligned grid (None on failure).
+
+    ``max_workers=0`` regrids in-process.
+    """
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        return {}
+    if max_workers == 0:
+        return {p: _regrid_scan(p, resolution) for p in paths}
+    workers = min(max_workers or os.cpu_count() or 1, len(paths))
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return dict(zip(paths, pool.map(_regrid_scan, paths, [resolution] * len(paths))))
+
+
+def distance_weights(grid: GridSpec, radar: str) -> np.ndarray:
+    """Inverse squared distance (km) of each cell of ``grid`` to ``radar``, computed once."""
+    key = (grid, radar)
+    if key not in _weights:
+        info = ideam_radar.RADAR_LOCATIONS[radar]
+        lat, lon = np.meshgrid(np.radians(grid.lats), np.radians(grid.lons), indexing='ij')
+        lat0, lon0 = np.radians(info['lat']), np.radians(info['lon'])
+        h = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat) * np.cos(lat0) * np.sin((lon - lon0) / 2) ** 2
+        dist = 2 * radar_grid.EARTH_RADIUS / 1000.0 * np.arcsin(np.sqrt(h))
+        _weights[key] = (1.0 / np.maximum(dist, 1.0) ** 2).astype(np.float32)
+    return _weights[key]
+
+
+def merge(fields: Sequence[np.ndarray], weights: Optional[Sequence[np.ndarray]] = None, rule: str = 'max') -> np.ndarray:
+    """Merge fields on one grid; cells no field observes stay NaN."""
+    stack = np.stack(fields)
+    observed = np.isfinite(stack)
+    if rule == 'max':
+        return np.where(observed.any(axis=0), np.where(observed, stack, -np.inf).max(axis=0), np.nan).astype(np.float32)
+    if rule != 'distance':
+        raise ValueError(f"Unknown merge rule {rule!r}; use one of {RULES}")
+    w = np.where(observed, np.stack(weights), 0.0)
+    total = (np.where(observed, stack, 0.0) * w).sum(axis=0)
+    weight = w.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(weight > 0, total / weight, np.nan).astype(np.float32)
+
+
+def mosaic_key(slot: pd.Timestamp, rule: str, grid: GridSpec, scans: Dict[str, str]) -> str:
+    return f"v{MOSAIC_VERSION}|{slot.isoformat()}|{rule}|{grid}|{sorted(scans.items())}"
+
+
+def composite(times, rule: str = 'max', max_workers: Optional[int] = None, grid: Optional[GridSpec] = None,
+              cache: Optional[DiskCache] = None) -> List[Mosaic]:
+    """National mosaics of the slots containing ``times``.
+
+    Cached slots are read from disk; the scans of the others are regridded
+    together in one process pool.
+    """
+    if rule not in RULES:
+        raise ValueError(f"Unknown merge rule {rule!r}; use one of {RULES}")
+    grid = grid or national_grid()
+    cache = cache or get_mosaic_cache()
+    slots = list(dict.fromkeys(pd.Timestamp(t).floor(SLOT) for t in times))
+    matched = {slot: match_scans(slot) for slot in slots}
+    todo = [slot for slot in slots if matched[slot] and not cache.cached(mosaic_key(slot, rule, grid, matched[slot]))]
+    regridded = regrid_scans([p for slot in todo for p in matched[slot].values()], grid.resolution, max_workers)
+
+    mosaics = []
+    for slot in slots:
+        scans = matched[slot]
+        if slot in todo:
+            # Keyed by the scans that could be read, so failed ones are retried
+            scans = {radar: p for radar, p in scans.items() if regridded.get(p) is not None}
+        if not scans:
+            mosaics.append(Mosaic(slot, grid, np.full(grid.shape, np.nan, dtype=np.float32), {}))
+            continue
+
+        def build(path):
+            fields = [grid.embed(regridded[p][1], regridded[p][0]) for p in scans.values()]
+            weights = [distance_weights(grid, radar) for radar in scans]
+            with open(path, 'wb') as f:
+                np.save(f, merge(fields, weights, rule))
+
+        path = cache.get_or_build(mosaic_key(slot, rule, grid, scans), build)
+        mosaics.append(Mosaic(slot, grid, np.load(path), scans))
+    return mosaics
+
+
+def render_mosaic(time, rule: str = 'max', cmap: Optional[str] = None, max_workers: Optional[int] = None) -> Optional[str]:
+    """PNG path of the national mosaic of the slot containing ``time``; None if no radar has a scan."""
+    mosaic = composite([time], rule, max_workers)[0]
+    if not mosaic.scans:
+        return None
+    scan = f"mosaic|{mosaic_key(mosaic.slot, rule, mosaic.grid, mosaic.scans)}"
+    title = f"Mosaico nacional ({rule}) - {mosaic.slot:%Y-%m-%d %H:%M} UTC - {', '.join(sorted(mosaic.scans))}"
+    return radar_render.render(
+        radar_render.render_key(scan, cmap=cmap, scale=MOSAIC_SCALE),
+        lambda: radar_render.compose(mosaic.values, mosaic.grid, title, cmap, scale=MOSAIC_SCALE),
+    )
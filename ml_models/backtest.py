@@ -0,0 +1,181 @@
+"""Rolling-origin backtests scored in parallel.
+
+Fold ``k`` cuts every station at one common origin, ``step_hours`` apart
+and ending ``horizons`` hours before the last observation of any station, so
+a model fit across stations never sees hours after the origin. Each model is
+fit on everything up to the origin and forecasts the next ``horizons`` hours
+from there through :func:`ml_models.batch_inference.forecast_table`,
+so backtests score exactly what batch inference serves. (model, fold) tasks
+run in a process pool that receives the data once per worker, and errors
+are reduced to per-horizon RMSE/MAE.
+
+Models are given as ``name -> fit(train_df)`` where ``fit`` returns a
+forecaster (``forecast(history, horizons)``); ``fit`` must be a module-level
+function so it can be sent to the workers.
+"""
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Allow running as a script (python ml_models/backtest.py) from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_models import batch_inference
+from processing import tracking
+
+N_FOLDS = 4
+STEP_HOURS = 24
+HORIZON_HOURS = 24
+MIN_TRAIN_HOURS = 7 * 24
+
+# Frame shared with the worker processes, set once per worker
+_frame: Optional[pd.DataFrame] = None
+
+
+def rolling_origins(df: pd.DataFrame, n_folds: int = N_FOLDS, step_hours: int = STEP_HOURS,
+                    horizons: int = HORIZON_HOURS, min_train_hours: int = MIN_TRAIN_HOURS) -> List[pd.Series]:
+    """Origins of each fold, oldest fold first.
+
+    Each fold is a Series indexed by station holding the fold's common origin
+    timestamp. Stations with less than ``min_train_hours`` of history before
+    the origin sit that fold out.
+    """
+    ts = pd.to_datetime(df['timestamp'])
+    first, last = ts.groupby(df['station_id']).min(), ts.max()
+    folds = []
+    for k in range(n_folds):
+        origin = last - pd.Timedelta(hours=horizons + (n_folds - 1 - k) * step_hours)
+        stations = first.index[origin - first >= pd.Timedelta(hours=min_train_hours)]
+        if len(stations):
+            folds.append(pd.Series(origin, index=stations))
+    return folds
+
+
+def split_fold(df: pd.DataFrame, origins: pd.Series, horizons: int = HORIZON_HOURS):
+    """Training rows up to the origin and the hourly actuals after it."""
+    df = df[df['station_id'].isin(origins.index)]
+    ts = pd.to_datetime(df['timestamp'])
+    origin = df['station_id'].map(origins)
+    train = df[ts <= origin]
+    ahead = df[(ts > origin) & (ts <= origin + pd.Timedelta(hours=horizons))]
+    actuals = (ahead.assign(valid_time=pd.to_datetime(ahead['timestamp']).dt.floor('h'))
+               .groupby(['station_id', 'valid_time'], as_index=False)['temp_c'].mean())
+    return train, actuals
+
+
+def score(forecasts: pd.DataFrame, actuals: pd.DataFrame) -> pd.DataFrame:
+    """Error sums per model and horizon: ``n``, ``sse`` and ``sae``."""
+    f = forecasts.assign(
+        horizon=((forecasts['valid_time'] - forecasts['issue_time']) / pd.Timedelta(hours=1)).round().astype(int),
+        valid_time=pd.to_datetime(forecasts['valid_time']).dt.floor('h'),
+    )
+    joined = f.merge(actuals, on=['station_id', 'valid_time']).dropna(subset=['value', 'temp_c'])
+    err = joined['value'] - joined['temp_c']
+    sums = pd.DataFrame({
+        'model': joined['model'], 'horizon': joined['horizon'],
+        'n': 1, 'sse': err ** 2, 'sae': err.abs(),
+    })
+    return sums.groupby(['model', 'horizon'], as_index=False).sum()
+
+
+def _init_worker(df: pd.DataFrame) -> None:
+    global _frame
+    _frame = df
+
+
+def _run_fold(name: str, fit: Callable, origins: pd.Series, horizons: int) -> pd.DataFrame:
+    train, actuals = split_fold(_frame, origins, horizons)
+    forecasts = batch_inference.forecast_table(train, {name: fit(train)}, horizons=horizons)
+    return score(forecasts, actuals)
+
+
+def summarize(sums: pd.DataFrame) -> pd.DataFrame:
+    """RMSE and MAE per model and horizon from error sums."""
+    totals = sums.groupby(['model', 'horizon'])[['n', 'sse', 'sae']].sum()
+    return pd.DataFrame({
+        'rmse': np.sqrt(totals['sse'] / totals['n']),
+        'mae': totals['sae'] / totals['n'],
+        'n': totals['n'],
+    })
+
+
+def backtest(df: pd.DataFrame, models: Dict[str, Callable], n_folds: int = N_FOLDS,
+             step_hours: int = STEP_HOURS, horizons: int = HORIZON_HOURS,
+             min_train_hours: int = MIN_TRAIN_HOURS, max_workers: Optional[int] = None) -> pd.DataFrame:
+    """Backtest ``models`` over rolling-origin folds.
+
+    Returns RMSE, MAE and sample count indexed by ``(model, horizon)``.
+    ``max_workers=0`` runs in-process.
+    """
+    df = df.dropna(subset=['station_id', 'timestamp']).assign(timestamp=lambda d: pd.to_datetime(d['timestamp']))
+    folds = rolling_origins(df, n_folds, step_hours, horizons, min_train_hours)
+    tasks = [(name, fit, origins, horizons) for name, fit in models.items() for origins in folds]
+    if not tasks:
+        return pd.DataFrame(columns=['rmse', 'mae', 'n'])
+
+    if max_workers == 0:
+        _init_worker(df)
+        results = [_run_fold(*task) for task in tasks]
+    else:
+        workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(df,)) as pool:
+            results = list(pool.map(_run_fold, *zip(*tasks)))
+    return summarize(pd.concat(results, ignore_index=True))
+
+
+def log_metrics(metrics: pd.DataFrame) -> None:
+    """Log one model's per-horizon metrics to the active run in one call.
+
+    ``metrics`` is the :func:`backtest` result for a single model (indexed by
+    horizon). ``rmse`` and ``mae`` are the one-hour-ahead scores.
+    """
+    values = {}
+    for horizon, row in metrics.iterrows():
+        values[f'rmse_h{horizon}'] = row['rmse']
+        values[f'mae_h{horizon}'] = row['mae']
+    if 1 in metrics.index:
+        values['rmse'] = metrics.loc[1, 'rmse']
+        values['mae'] = metrics.loc[1, 'mae']
+    values['rmse_mean'] = metrics['rmse'].mean()
+    values['mae_mean'] = metrics['mae'].mean()
+    tracking.log_metrics({k: float(v) for k, v in values.items()})
+
+
+def persistence(train: pd.DataFrame) -> Callable:
+    """Baseline: every horizon repeats the station's last observed temperature."""
+
+    def forecast(history: pd.DataFrame, horizons: int) -> np.ndarray:
+        last = history.sort_values(['station_id', 'timestamp']).groupby('station_id')['temp_c'].last()
+        return np.repeat(last.to_numpy(dtype=np.float64)[:, None], horizons, axis=1)
+
+    return forecast
+
+
+def candidate_models() -> Dict[str, Callable]:
+    from ml_models import regression
+
+    return {
+        'persistence': persistence,
+        'linear_regression': regression.linear_regression_forecaster,
+    }
+
+
+if __name__ == "__main__":
+    import mlflow
+
+    data_path = "data/canonical.csv"
+    if not os.path.exists(data_path):
+        print(f"Error: {data_path} not found. Run the data pipeline first.")
+        sys.exit(1)
+
+    results = backtest(pd.read_csv(data_path), candidate_models())
+    print(results.groupby(level='model')[['rmse', 'mae']].mean())
+
+    mlflow.set_experiment("Backtest")
+    for name, metrics in results.groupby(level='model'):
+        with mlflow.start_run(run_name=f"backtest_{name}"):
+            mlflow.log_params({"model": name, "n_folds": N_FOLDS, "step_hours": STEP_HOURS, "horizons": HORIZON_HOURS})
+            log_metrics(metrics.droplevel('model'))
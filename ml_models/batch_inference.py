@@ -0,0 +1,214 @@
+"""Batch inference stage run after each ingestion.
+
+Keeps only the recent history each station needs for its features, runs
+every available forecaster over all horizons in vectorized batches (one
+feature build and one ``predict`` call per horizon for all stations, using
+the shared feature module so inputs match training) and writes a forecast
+table to the forecast store. The dashboard only reads that table.
+
+The store is a folder with one Parquet file per write, named
+``<write time ns>-<pid>-<newest issue>.parquet`` and renamed into place
+whole, so concurrent sessions never rewrite each other's files. Readers let
+later writes replace re-issued forecasts, and issues older than
+``FORECAST_RETENTION`` before the newest one are pruned on every write.
+
+Forecast table columns: ``station_id``, ``issue_time``, ``valid_time``,
+``model``, ``value`` (forecast temperature in °C).
+"""
+import glob
+import os
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ml_models import features
+
+FORECAST_STORE = "data/out/forecasts"
+FORECAST_COLS = ["station_id", "issue_time", "valid_time", "model", "value"]
+FORECAST_KEY = ["station_id", "issue_time", "model"]
+FORECAST_RETENTION = pd.Timedelta(days=7)
+
+# Hours ahead forecast for every station
+DEFAULT_HORIZON_HOURS = 24
+
+HISTORY_COLS = ['station_id', 'timestamp', 'temp_c', 'wind_m_s', 'precip_mm']
+
+# Experiments of the exported transformer models (see ml_models/export.py)
+TRANSFORMER_EXPERIMENTS = {
+    'patchtst': "Transformer_Weather_Forecast",
+    'informer': "Informer_Weather_Forecast",
+}
+
+
+def regression_forecaster(model, feature_names: Optional[List[str]] = None) -> Callable:
+    """Multi-horizon forecaster for a t+1 regression model.
+
+    Forecasts are recursive: each horizon appends the previous prediction to
+    the station history as a new hourly ``temp_c`` observation (other inputs
+    persist) and recomputes the features of the new latest row.
+    """
+    feature_names = feature_names or features.REGRESSION_FEATURES
+
+    def forecast(history: pd.DataFrame, horizons: int) -> np.ndarray:
+        history = history[HISTORY_COLS]
+        out = None
+        for h in range(horizons):
+            latest = features.latest_features(features.build_features(history, cache=False))
+            pred = model.predict(features.model_inputs(latest, feature_names))
+            if out is None:
+                out = np.empty((len(latest), horizons), dtype=np.float64)
+            out[:, h] = pred
+
+            step = latest[HISTORY_COLS].copy()
+            step['timestamp'] = step['timestamp'] + pd.Timedelta(hours=1)
+            step['temp_c'] = pred
+            history = features.history_window(pd.concat([history, step], ignore_index=True))
+        return out
+
+    return forecast
+
+
+def forecast_table(df: pd.DataFrame, forecasters: Dict[str, Callable], horizons: int = DEFAULT_HORIZON_HOURS) -> pd.DataFrame:
+    """Run every forecaster over all stations and horizons.
+
+    ``forecasters`` maps a model name to ``forecast(history, horizons)``, which
+    receives the recent canonical records of every station and returns a
+    ``(n_stations, horizons)`` array with stations sorted by ``station_id``.
+    Forecasters with a ``lookback_hours`` attribute get that much history.
+    """
+    df_valid = df.dropna(subset=['station_id', 'timestamp'])
+    if df_valid.empty or not forecasters:
+        return pd.DataFrame(columns=FORECAST_COLS)
+
+    # Forecasters only get the history they need to roll the features forward
+    df_valid = df_valid.assign(timestamp=pd.to_datetime(df_valid['timestamp']))
+    lookback = max([features.MAX_LOOKBACK_HOURS] + [getattr(f, 'lookback_hours', 0) for f in forecasters.values()])
+    history = features.history_window(df_valid, lookback)
+    # Stations with no temperature in the window (rain gauges, radar rain
+    # points) would be forecast from zero-filled inputs
+    history = history[history['temp_c'].notna().groupby(history['station_id']).transform('any')]
+    if history.empty:
+        return pd.DataFrame(columns=FORECAST_COLS)
+    state = features.latest_features(history.sort_values(['station_id', 'timestamp']))
+    steps = pd.to_timedelta(np.arange(1, horizons + 1), unit='h')
+    issue = state['timestamp'].to_numpy()
+
+    tables = []
+    for name, forecast in forecasters.items():
+        values = forecast(history, horizons)
+        tables.append(pd.DataFrame({
+            'station_id': np.repeat(state['station_id'].to_numpy(), horizons),
+            'issue_time': np.repeat(issue, horizons),
+            'valid_time': (issue[:, None] + steps.to_numpy()[None, :]).ravel(),
+            'model': name,
+            'value': values.ravel(),
+        }))
+    return pd.concat(tables, ignore_index=True)
+
+
+def forecast_files(path: str = FORECAST_STORE) -> List[str]:
+    """Files of the forecast store, oldest write first."""
+    return sorted(glob.glob(os.path.join(path, '*.parquet')))
+
+
+def _newest_issue(file: str) -> pd.Timestamp:
+    return pd.Timestamp(os.path.basename(file)[:-len('.parquet')].rsplit('-', 1)[1])
+
+
+def write_forecasts(forecasts: pd.DataFrame, path: str = FORECAST_STORE,
+                    retention: pd.Timedelta = FORECAST_RETENTION) -> str:
+    """Add ``forecasts`` to the store as a new file and prune expired issues.
+
+    Returns the path of the new file.
+    """
+    os.makedirs(path, exist_ok=True)
+    newest = pd.Timestamp(forecasts['issue_time'].max())
+    target = os.path.join(path, f"{time.time_ns():020d}-{os.getpid()}-{newest:%Y%m%dT%H%M%S}.parquet")
+    fd, tmp = tempfile.mkstemp(dir=path, prefix='.', suffix='.part')
+    os.close(fd)
+    try:
+        forecasts[FORECAST_COLS].to_parquet(tmp, index=False)
+        os.replace(tmp, target)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    prune_forecasts(path, retention)
+    return target
+
+
+def prune_forecasts(path: str = FORECAST_STORE, retention: pd.Timedelta = FORECAST_RETENTION) -> None:
+    """Delete files whose newest issue is more than ``retention`` older than the store's newest."""
+    issues = {f: _newest_issue(f) for f in forecast_files(path)}
+    if not issues:
+        return
+    cutoff = max(issues.values()) - retention
+    for f, issue in issues.items():
+        if issue < cutoff:
+            try:
+                os.remove(f)
+            except FileNotFoundError:
+                pass
+
+
+def read_forecasts(path: str = FORECAST_STORE, station_ids: Optional[List[str]] = None) -> pd.DataFrame:
+    """Every forecast in the store; a re-issued forecast keeps only its latest write."""
+    files = forecast_files(path)
+    if not files:
+        return pd.DataFrame(columns=FORECAST_COLS)
+    filters = [('station_id', 'in', list(station_ids))] if station_ids is not None else None
+    forecasts = pd.concat([pd.read_parquet(f, filters=filters).assign(_write=i) for i, f in enumerate(files)],
+                          ignore_index=True)
+    latest = forecasts.groupby(FORECAST_KEY)['_write'].transform('max')
+    return forecasts[forecasts['_write'] == latest].drop(columns='_write').reset_index(drop=True)
+
+
+def read_latest_forecasts(path: str = FORECAST_STORE, station_ids: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read the most recent issue of each station and model."""
+    forecasts = read_forecasts(path, station_ids)
+    if forecasts.empty:
+        return forecasts
+    latest_issue = forecasts.groupby(['station_id', 'model'])['issue_time'].transform('max')
+    return forecasts[forecasts['issue_time'] == latest_issue].reset_index(drop=True)
+
+
+def default_forecasters(model_cache=None, predictor_cache=None) -> Dict[str, Callable]:
+    """Forecasters for the models currently registered in MLflow.
+
+    ``predictor_cache`` is a :class:`~ml_models.serving.ModelCache` loading
+    :func:`ml_models.predictor.load_run`; runs without an exported inference
+    model are skipped.
+    """
+    from ml_models.serving import ModelCache
+
+    model_cache = model_cache or ModelCache()
+    forecasters = {}
+    served = model_cache.get("Hourly_Weather_Forecast")
+    if served is not None:
+        forecasters['linear_regression'] = regression_forecaster(served.model, served.features)
+
+    if predictor_cache is None:
+        from ml_models import predictor
+        predictor_cache = ModelCache(loader=predictor.load_run)
+    for name, experiment in TRANSFORMER_EXPERIMENTS.items():
+        served = predictor_cache.get(experiment)
+        if served is not None and served.model is not None:
+            forecasters[name] = served.model
+    return forecasters
+
+
+def run(df: pd.DataFrame, model_cache=None, horizons: int = DEFAULT_HORIZON_HOURS, path: str = FORECAST_STORE,
+        predictor_cache=None) -> pd.DataFrame:
+    """Batch inference entry point: forecast ``df`` and write the table."""
+    forecasts = forecast_table(df, default_forecasters(model_cache, predictor_cache), horizons=horizons)
+    if not forecasts.empty:
+        write_forecasts(forecasts, path)
+    return forecasts
+
+
+if __name__ == "__main__":
+    df = pd.read_csv("data/out/canonical.csv", parse_dates=["timestamp"])
+    result = run(df)
+    print(f"Wrote {len(result)} forecasts to {FORECAST_STORE}")
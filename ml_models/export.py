@@ -0,0 +1,155 @@
+"""Export the transformer models for CPU inference.
+
+PatchTST is traced to TorchScript, with a dynamic-int8 variant (``nn.Linear``
+weights quantized, activations quantized on the fly). Informer forecasts by
+autoregressive sampling (``generate``), which does not trace, so it is
+exported as a Hugging Face checkpoint that the predictor quantizes with
+dynamic int8 at load time. Either way the artifact directory holds a
+``spec.json`` with the window lengths and per-station normalization, and is
+logged as an MLflow pyfunc model named ``inference`` and registered, so
+:func:`ml_models.predictor.load_run` can serve it.
+
+Usage (re-export the latest run of an experiment):
+    python ml_models/export.py patchtst
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+from typing import Optional
+
+import mlflow
+import mlflow.pyfunc
+import torch
+
+# Allow running as a script (python ml_models/export.py) from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_models.predictor import SPEC_FILE, BatchedPredictor
+
+INFERENCE_ARTIFACT = "inference"
+REGISTERED_MODELS = {
+    'patchtst': "patchtst_weather_cpu",
+    'informer': "informer_weather_cpu",
+}
+
+
+class _PatchTSTOutput(torch.nn.Module):
+    """Traceable wrapper returning only the point forecast."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, past_values):
+        return self.model(past_values=past_values).prediction_outputs
+
+
+def trace_patchtst(model, context_length: int, quantize: bool = False) -> torch.jit.ScriptModule:
+    """TorchScript PatchTST taking ``(batch, context_length, 1)`` windows."""
+    wrapper = _PatchTSTOutput(model.eval())
+    if quantize:
+        wrapper = torch.ao.quantization.quantize_dynamic(wrapper, {torch.nn.Linear}, dtype=torch.qint8)
+    example = torch.zeros(2, context_length, model.config.num_input_channels)
+    with torch.inference_mode():
+        return torch.jit.freeze(torch.jit.trace(wrapper, example, strict=False).eval())
+
+
+def export_model(model, kind: str, spec: dict, out_dir: str, quantize: bool = True) -> str:
+    """Write the inference artifact of ``model`` to ``out_dir``.
+
+    ``spec`` needs ``context_length``, ``prediction_length`` and
+    ``normalization`` (see ``MultiSeriesWindowDataset.normalization``);
+    ``past_length`` defaults to ``context_length``.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    spec = {'kind': kind, **spec}
+    spec.setdefault('past_length', spec['context_length'])
+    if kind == 'patchtst':
+        torch.jit.save(trace_patchtst(model, spec['context_length']), os.path.join(out_dir, 'model.pt'))
+        spec['files'] = {'fp32': 'model.pt'}
+        if quantize:
+            torch.jit.save(trace_patchtst(model, spec['context_length'], quantize=True),
+                           os.path.join(out_dir, 'model_int8.pt'))
+            spec['files']['int8'] = 'model_int8.pt'
+    elif kind == 'informer':
+        model.save_pretrained(os.path.join(out_dir, 'hf'))
+        spec['files'] = {'hf': 'hf'}
+    else:
+        raise ValueError(f"Unknown model kind: {kind}")
+    with open(os.path.join(out_dir, SPEC_FILE), 'w') as f:
+        json.dump(spec, f)
+    return out_dir
+
+
+class InferenceModel(mlflow.pyfunc.PythonModel):
+    """pyfunc wrapper: ``predict`` takes canonical records and returns forecasts."""
+
+    def load_context(self, context):
+        self.path = context.artifacts[INFERENCE_ARTIFACT]
+        self.predictor = BatchedPredictor.from_dir(self.path)
+
+    def predict(self, context, model_input, params=None):
+        import pandas as pd
+
+        horizons = int((params or {}).get('horizons', self.predictor.prediction_length))
+        values = self.predictor.forecast(model_input, horizons)
+        stations = sorted(model_input['station_id'].dropna().unique())
+        return pd.DataFrame(values, index=stations, columns=[f"h{h + 1}" for h in range(horizons)])
+
+
+def log_inference_model(model, kind: str, spec: dict, quantize: bool = True,
+                        registered_name: Optional[str] = None):
+    """Export ``model`` and log it to the active run as ``inference``, registered.
+
+    Returns the MLflow model info.
+    """
+    tmp = tempfile.mkdtemp()
+    try:
+        export_model(model, kind, spec, os.path.join(tmp, INFERENCE_ARTIFACT), quantize=quantize)
+        return mlflow.pyfunc.log_model(
+            name=INFERENCE_ARTIFACT,
+            python_model=InferenceModel(),
+            artifacts={INFERENCE_ARTIFACT: os.path.join(tmp, INFERENCE_ARTIFACT)},
+            registered_model_name=registered_name or REGISTERED_MODELS[kind],
+        )
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def export_run(kind: str, run_id: str, quantize: bool = True):
+    """Re-export the checkpoint (``model`` artifact) logged by ``run_id``."""
+    from transformers import InformerForPrediction, PatchTSTForPrediction
+
+    model_dir = mlflow.artifacts.download_artifacts(run_id=run_id, artifact_path="model")
+    normalization = mlflow.artifacts.load_dict(f"runs:/{run_id}/normalization.json")
+    model_cls = PatchTSTForPrediction if kind == 'patchtst' else InformerForPrediction
+    model = model_cls.from_pretrained(model_dir)
+    config = model.config
+    spec = {
+        'context_length': config.context_length,
+        'prediction_length': config.prediction_length,
+        'normalization': normalization,
+    }
+    if kind == 'informer':
+        spec['past_length'] = config.context_length + max(config.lags_sequence)
+    with mlflow.start_run(run_id=run_id):
+        return log_inference_model(model, kind, spec, quantize=quantize)
+
+
+if __name__ == "__main__":
+    kind = sys.argv[1] if len(sys.argv) > 1 else 'patchtst'
+    module = {'patchtst': 'ml_models.transformer_informer', 'informer': 'models.train_transformer'}[kind]
+    experiment = __import__(module, fromlist=['EXPERIMENT_NAME']).EXPERIMENT_NAME
+    runs = mlflow.search_runs(
+        experiment_names=[experiment],
+        filter_string="attributes.status = 'FINISHED'",
+        order_by=["attributes.start_time DESC"],
+        max_results=1,
+    )
+    if runs.empty:
+        print(f"No finished run in {experiment}.")
+        sys.exit(1)
+    run_id = runs['run_id'].iloc[0]
+    info = export_run(kind, run_id)
+    print(f"Exported {kind} from run {run_id}: {info.model_uri}")
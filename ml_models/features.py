@@ -0,0 +1,167 @@
+"""Shared feature engineering for training and serving.
+
+Every model input is computed here, vectorized across all stations, so the
+trainers, the batch inference stage and the dashboard build identical
+features. Lags, targets and rolling means are time-aware: they look up the
+observation exactly ``k`` hours away (NaN if it is missing) instead of
+shifting rows, so gaps in the data never leak a wrong neighbour.
+
+Results of :func:`build_features` are cached by data version.
+"""
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from processing import transform
+
+# Cyclic encodings of hour of day and day of year
+TIME_FEATURES = ['hour_sin', 'hour_cos', 'doy_sin', 'doy_cos']
+
+LAG_HOURS = (1, 2, 3, 24)
+ROLLING_HOURS = (3, 24)
+LAG_COLUMNS = ('temp_c',)
+
+# Longest look-back of any feature, in hours
+MAX_LOOKBACK_HOURS = max(max(LAG_HOURS), max(ROLLING_HOURS))
+
+REGRESSION_FEATURES = (
+    ['temp_c', 'wind_m_s', 'precip_mm', 'hour']
+    + TIME_FEATURES
+    + [f'{c}_lag_{k}' for c in LAG_COLUMNS for k in LAG_HOURS]
+    + [f'{c}_roll_{w}' for c in LAG_COLUMNS for w in ROLLING_HOURS]
+)
+
+CACHE_MAX_ENTRIES = 8
+_feature_cache: "OrderedDict[Hashable, pd.DataFrame]" = OrderedDict()
+
+
+def time_features(timestamps: pd.Series) -> pd.DataFrame:
+    """Cyclic hour-of-day and day-of-year encodings in ``[-1, 1]``."""
+    ts = pd.to_datetime(timestamps)
+    hour = (ts.dt.hour + ts.dt.minute / 60.0).to_numpy(dtype=np.float64)
+    doy = (ts.dt.dayofyear - 1).to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        'hour_sin': np.sin(2 * np.pi * hour / 24.0),
+        'hour_cos': np.cos(2 * np.pi * hour / 24.0),
+        'doy_sin': np.sin(2 * np.pi * doy / 365.25),
+        'doy_cos': np.cos(2 * np.pi * doy / 365.25),
+    }, index=timestamps.index).astype(np.float32)
+
+
+def shifted(df: pd.DataFrame, column: str, hours: int) -> pd.Series:
+    """Value of ``column`` at ``timestamp - hours`` for the same station.
+
+    Positive ``hours`` gives lags, negative ``hours`` gives future targets.
+    """
+    key = df[['station_id', 'timestamp']].copy()
+    key['timestamp'] = key['timestamp'] + pd.Timedelta(hours=-hours)
+    source = df[['station_id', 'timestamp', column]].drop_duplicates(['station_id', 'timestamp'])
+    values = key.merge(source, on=['station_id', 'timestamp'], how='left')[column]
+    return pd.Series(values.to_numpy(), index=df.index, name=column)
+
+
+def rolling_mean(df: pd.DataFrame, column: str, hours: int) -> pd.Series:
+    """Mean of ``column`` over the last ``hours`` hours (inclusive) per station."""
+    ordered = df[['station_id', 'timestamp', column]].sort_values(['station_id', 'timestamp'])
+    rolled = (
+        ordered.groupby('station_id', sort=False)
+        .rolling(f'{hours}h', on='timestamp', min_periods=1)[column]
+        .mean()
+    )
+    return pd.Series(rolled.to_numpy(), index=ordered.index).reindex(df.index)
+
+
+def build_features(df: pd.DataFrame, version: Optional[str] = None, cache: bool = True) -> pd.DataFrame:
+    """Add every model feature to a copy of ``df`` (canonical records).
+
+    The result is sorted by station and timestamp. With ``cache`` enabled it is
+    stored under the data version (computed from ``df`` unless given).
+    """
+    key = None
+    if cache:
+        key = version or transform.data_version(df)
+        if key in _feature_cache:
+            _feature_cache.move_to_end(key)
+            return _feature_cache[key]
+
+    out = df.dropna(subset=['station_id', 'timestamp']).copy()
+    out['timestamp'] = pd.to_datetime(out['timestamp'])
+    out = out.sort_values(['station_id', 'timestamp']).reset_index(drop=True)
+    for c in ['temp_c', 'wind_m_s', 'precip_mm']:
+        out[c] = pd.to_numeric(out[c], errors='coerce')
+
+    out['hour'] = out['timestamp'].dt.hour
+    out[TIME_FEATURES] = time_features(out['timestamp'])
+    for c in LAG_COLUMNS:
+        for k in LAG_HOURS:
+            out[f'{c}_lag_{k}'] = shifted(out, c, k)
+        for w in ROLLING_HOURS:
+            out[f'{c}_roll_{w}'] = rolling_mean(out, c, w)
+
+    if cache:
+        _feature_cache[key] = out
+        while len(_feature_cache) > CACHE_MAX_ENTRIES:
+            _feature_cache.popitem(last=False)
+    return out
+
+
+def add_target(df: pd.DataFrame, column: str = 'temp_c', horizon: int = 1) -> pd.Series:
+    """Value of ``column`` ``horizon`` hours after each row (the training target)."""
+    return shifted(df, column, -horizon)
+
+
+def latest_features(df_features: pd.DataFrame) -> pd.DataFrame:
+    """Latest feature row per station from :func:`build_features` output."""
+    return df_features.groupby('station_id', sort=False).tail(1).reset_index(drop=True)
+
+
+def model_inputs(df_features: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Select ``columns`` for inference, filling gaps instead of dropping rows.
+
+    Missing lags and rolling means fall back to the current value of their
+    column (a station without history is assumed persistent); other missing
+    inputs are filled with 0.
+    """
+    X = df_features[columns].astype(np.float64)
+    for c in columns:
+        base = c.split('_lag_')[0].split('_roll_')[0]
+        if base != c and base in df_features.columns:
+            X[c] = X[c].fillna(df_features[base])
+    return X.fillna(0)
+
+
+def history_window(df: pd.DataFrame, hours: int = MAX_LOOKBACK_HOURS) -> pd.DataFrame:
+    """Rows of each station within ``hours`` of its latest observation.
+
+    This is all the history needed to compute the features of the next step.
+    """
+    ts = pd.to_datetime(df['timestamp'])
+    latest = ts.groupby(df['station_id']).transform('max')
+    return df[ts >= latest - pd.Timedelta(hours=hours)]
+
+
+def normalization_stats(df: pd.DataFrame, columns: Sequence[str], by: Optional[str] = 'station_id') -> pd.DataFrame:
+    """Mean and std of ``columns``, per ``by`` group or global if ``by`` is None.
+
+    Returns a frame with ``<column>_mean`` and ``<column>_std`` columns, indexed
+    by group (a single ``None`` row for global stats).
+    """
+    values = df[list(columns)].astype(np.float64)
+    if by is None:
+        stats = pd.DataFrame([values.mean()], index=[None]).add_suffix('_mean')
+        stats = stats.join(pd.DataFrame([values.std(ddof=0)], index=[None]).add_suffix('_std'))
+    else:
+        grouped = values.groupby(df[by])
+        stats = grouped.mean().add_suffix('_mean').join(grouped.std(ddof=0).add_suffix('_std'))
+    return stats
+
+
+def normalize(values: np.ndarray, mean, std, eps: float = 1e-6) -> np.ndarray:
+    """Z-score ``values`` with the given statistics."""
+    return ((values - mean) / (std + eps)).astype(np.float32)
+
+
+def clear_cache() -> None:
+    _feature_cache.clear()
@@ -0,0 +1,241 @@
+"""Online updates of the served models as new hours arrive.
+
+Every trained model logs a ``watermark.json`` (latest timestamp seen per
+station). An update starts from the served model, uses only what came after
+its watermark and logs the result as a new run in the same experiment,
+tagged with the run it updates, so every update is a versioned MLflow run
+that serving picks up like any other:
+
+* ``LinearRegression`` keeps its least-squares sufficient statistics
+  (``normal_equations.json``); adding the new rows and re-solving gives
+  exactly the model a full retrain would.
+* ``SGDRegressor`` pipelines take one ``partial_fit`` pass over the new rows
+  (the scaler stays fixed so the learned weights keep their meaning).
+* Transformers resume from the checkpoint of the latest registered version
+  and fine-tune for a few steps on the windows that end after the
+  watermark, then are re-exported as a new registered version.
+
+Feature look-backs and context windows reach back before the watermark, so
+pass recent history along with the new rows (the latest ingest does).
+
+Usage (hourly, after ingestion):
+    python ml_models/online.py [regression|patchtst|informer ...] [--data data/out/canonical.csv]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+import mlflow
+import mlflow.sklearn
+
+# Allow running as a script (python ml_models/online.py) from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_models import batch_inference, export, regression, streaming
+from ml_models import features as feature_store
+from ml_models.windows import MultiSeriesWindowDataset, collate_batch
+
+LATEST_INGEST = "data/out/canonical.csv"
+UPDATE_TAG = "online_update_of"
+
+# Transformer fine-tuning per update
+FINETUNE_STEPS = 20
+FINETUNE_LR = 1e-4
+FINETUNE_BATCH_SIZE = 32
+
+
+def latest_run(experiment: str) -> Optional[pd.Series]:
+    """Latest finished run of ``experiment`` (the one being served), if any."""
+    runs = mlflow.search_runs(
+        experiment_names=[experiment],
+        filter_string="attributes.status = 'FINISHED'",
+        order_by=["attributes.start_time DESC"],
+        max_results=1,
+    )
+    return None if runs.empty else runs.iloc[0]
+
+
+def load_watermark(run_id: str) -> Optional[Dict[str, str]]:
+    """Watermark logged by ``run_id``; None for runs that predate watermarks."""
+    from mlflow.exceptions import MlflowException
+
+    try:
+        return mlflow.artifacts.load_dict(f"runs:/{run_id}/watermark.json")
+    except (MlflowException, OSError):
+        return None
+
+
+def fresh_rows(df: pd.DataFrame, watermark: Dict[str, str]) -> pd.DataFrame:
+    """Rows of ``df`` after their station's watermark (all rows of new stations)."""
+    cutoff = pd.to_datetime(df['station_id'].astype(str).map(watermark))
+    return df[cutoff.isna() | (pd.to_datetime(df['timestamp']) > cutoff)]
+
+
+def advance(watermark: Dict[str, str], rows: pd.DataFrame) -> Dict[str, str]:
+    """``watermark`` moved forward to the latest of ``rows`` per station."""
+    last = pd.to_datetime(rows['timestamp']).groupby(rows['station_id'].astype(str)).max()
+    old = pd.to_datetime(pd.Series(watermark, dtype=object))
+    return streaming.watermark(pd.concat([old, last]).groupby(level=0).max())
+
+
+def update_regression(df: pd.DataFrame, experiment: str = regression.EXPERIMENT_NAME) -> Optional[str]:
+    """Update the served regression with the rows of ``df`` it has not seen.
+
+    Returns the id of the new run, or None when there is nothing to update.
+    """
+    base = latest_run(experiment)
+    if base is None:
+        print(f"No model in {experiment}; train one first.")
+        return None
+    base_id = base['run_id']
+    model_type = base.get('params.model_type')
+    watermark = load_watermark(base_id)
+    if watermark is None:
+        print(f"Run {base_id} has no watermark; retrain it once to enable updates.")
+        return None
+
+    features = feature_store.REGRESSION_FEATURES
+    rows = fresh_rows(regression._feature_rows(df), watermark)
+    if rows.empty:
+        print("No new rows.")
+        return None
+    X, y = rows[features], rows[regression.TARGET].to_numpy()
+
+    model = mlflow.sklearn.load_model(f"runs:/{base_id}/model")
+    # Prequential score: the served model on rows it has not seen yet
+    err = model.predict(X) - y
+    metrics = {"rmse_new_rows": float(np.sqrt(np.mean(err ** 2))), "mae_new_rows": float(np.mean(np.abs(err)))}
+
+    state = None
+    if model_type == "LinearRegression":
+        state = mlflow.artifacts.load_dict(f"runs:/{base_id}/normal_equations.json")
+        state = regression.normal_equations(X, y, state)
+        model = regression.solve_normal_equations(state, features)
+    elif model_type == "SGDRegressor":
+        model.named_steps['regressor'].partial_fit(model.named_steps['scaler'].transform(X), y)
+    else:
+        print(f"Cannot update a {model_type} model online.")
+        return None
+
+    mlflow.set_experiment(experiment)
+    with mlflow.start_run(run_name=f"{base.get('tags.mlflow.runName') or 'regression'}_update",
+                          tags={UPDATE_TAG: base_id}) as run:
+        mlflow.log_params({"model_type": model_type, "features": features, "target": "temp_c (t+1)",
+                           "new_rows": len(rows)})
+        mlflow.log_metrics(metrics)
+        mlflow.sklearn.log_model(model, "model")
+        if state is not None:
+            mlflow.log_dict(state, "normal_equations.json")
+        mlflow.log_dict(advance(watermark, rows), "watermark.json")
+    print(f"Updated {model_type} with {len(rows)} rows (RMSE before update {metrics['rmse_new_rows']:.4f}).")
+    return run.info.run_id
+
+
+def latest_registered_run(kind: str) -> Optional[str]:
+    """Run of the latest registered version of the ``kind`` transformer."""
+    versions = mlflow.MlflowClient().search_model_versions(
+        f"name='{export.REGISTERED_MODELS[kind]}'", order_by=["version_number DESC"], max_results=1,
+    )
+    return versions[0].run_id if versions else None
+
+
+def window_dataset(kind: str, df: pd.DataFrame, config, normalization: dict) -> MultiSeriesWindowDataset:
+    """Windows of ``df`` shaped like the ``kind`` trainer's, in its station vocabulary and scaling."""
+    stats = pd.DataFrame({'temp_c_mean': normalization['mean'], 'temp_c_std': normalization['std']},
+                         index=normalization['stations'])
+    df = df.assign(station_id=df['station_id'].astype(str))
+    common = dict(stations=normalization['stations'], stats=stats)
+    if kind == 'patchtst':
+        return MultiSeriesWindowDataset(df, 'temp_c', config.context_length, config.prediction_length,
+                                        channel_dim=True, with_station=False, **common)
+    past_length = config.context_length + max(config.lags_sequence)
+    return MultiSeriesWindowDataset(df, 'temp_c', past_length, config.prediction_length,
+                                    time_features=True, with_mask=True, **common)
+
+
+def update_transformer(df: pd.DataFrame, kind: str, steps: int = FINETUNE_STEPS,
+                       learning_rate: float = FINETUNE_LR, batch_size: int = FINETUNE_BATCH_SIZE) -> Optional[str]:
+    """Fine-tune the latest registered ``kind`` model on fresh windows of ``df``.
+
+    Returns the id of the new run, or None when there is nothing to update.
+    """
+    from transformers import InformerForPrediction, PatchTSTForPrediction, Trainer, TrainingArguments
+
+    base_id = latest_registered_run(kind)
+    if base_id is None:
+        print(f"No registered {kind} model; train one first.")
+        return None
+    model_dir = mlflow.artifacts.download_artifacts(run_id=base_id, artifact_path="model")
+    normalization = mlflow.artifacts.load_dict(f"runs:/{base_id}/normalization.json")
+    model_cls = PatchTSTForPrediction if kind == 'patchtst' else InformerForPrediction
+    model = model_cls.from_pretrained(model_dir)
+
+    # Station vocabulary and scaling stay those of the base model
+    watermark = load_watermark(base_id) or {}
+    dataset = window_dataset(kind, df, model.config, normalization).ending_after(watermark)
+    if len(dataset) == 0:
+        print("No new windows.")
+        return None
+
+    with tempfile.TemporaryDirectory() as out:
+        args = TrainingArguments(
+            output_dir=out,
+            learning_rate=learning_rate,
+            max_steps=steps,
+            per_device_train_batch_size=batch_size,
+            logging_strategy="no",
+            save_strategy="no",
+            remove_unused_columns=False,
+            label_names=["future_values"],
+            report_to=[],
+        )
+        result = Trainer(model=model, args=args, train_dataset=dataset, data_collator=collate_batch).train()
+
+    new_rows = fresh_rows(df.dropna(subset=['temp_c']), watermark)
+    mlflow.set_experiment(batch_inference.TRANSFORMER_EXPERIMENTS[kind])
+    with mlflow.start_run(run_name=f"{kind}_update", tags={UPDATE_TAG: base_id}) as run:
+        mlflow.log_params({"finetune_steps": steps, "learning_rate": learning_rate,
+                           "batch_size": batch_size, "windows": len(dataset)})
+        mlflow.log_metric("train_loss", result.training_loss)
+        mlflow.log_dict(normalization, "normalization.json")
+        mlflow.log_dict(advance(watermark, new_rows), "watermark.json")
+        with tempfile.TemporaryDirectory() as tmp:
+            model.save_pretrained(tmp)
+            mlflow.log_artifacts(tmp, "model")
+        spec = {
+            "context_length": model.config.context_length,
+            "prediction_length": model.config.prediction_length,
+            "normalization": normalization,
+        }
+        if kind == 'informer':
+            spec["past_length"] = dataset.past_length
+        export.log_inference_model(model, kind, spec)
+    print(f"Fine-tuned {kind} for {steps} steps on {len(dataset)} windows (loss {result.training_loss:.4f}).")
+    return run.info.run_id
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('models', nargs='*', choices=['regression', 'patchtst', 'informer'],
+                        default=['regression', 'patchtst', 'informer'])
+    parser.add_argument('--data', default=LATEST_INGEST, help='latest canonical records (csv or parquet)')
+    parser.add_argument('--steps', type=int, default=FINETUNE_STEPS, help='fine-tuning steps per transformer')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.data):
+        print(f"Error: {args.data} not found. Run the data pipeline first.")
+        sys.exit(1)
+    df = pd.read_csv(args.data) if args.data.endswith('.csv') else pd.read_parquet(args.data)
+    df = df.dropna(subset=['station_id', 'timestamp']).assign(timestamp=lambda d: pd.to_datetime(d['timestamp']))
+    for name in args.models:
+        if name == 'regression':
+            update_regression(df)
+        else:
+            update_transformer(df, name, steps=args.steps)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Batched CPU predictor for the exported transformer models.
+
+Loads the inference artifact written by :mod:`ml_models.export` (a traced
+TorchScript PatchTST or a Hugging Face Informer, optionally with dynamic
+int8 quantization) and forecasts every station in fixed-size batches under
+``torch.inference_mode``. :meth:`BatchedPredictor.forecast` follows the
+forecaster contract of :mod:`ml_models.batch_inference`: it takes the recent
+canonical records and returns a ``(n_stations, horizons)`` array in °C with
+stations sorted by ``station_id``; horizons beyond the model's prediction
+length are forecast recursively.
+"""
+import json
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import torch
+
+from ml_models import features
+
+SPEC_FILE = "spec.json"
+BATCH_SIZE = 256
+# Samples drawn by the probabilistic Informer head; the forecast is their mean
+INFORMER_SAMPLES = 20
+
+
+def hourly_context(history: pd.DataFrame, length: int):
+    """Last ``length`` hourly temperatures of every station.
+
+    Returns ``(station_ids, values, last_hour)`` where ``values`` is a
+    ``(n_stations, length)`` float array with NaN for missing hours and
+    ``last_hour`` the latest hour of each station. Stations are sorted.
+    """
+    ts = pd.to_datetime(history['timestamp']).dt.floor('h')
+    hourly = history['temp_c'].astype(np.float64).groupby([history['station_id'], ts]).mean()
+    stations = hourly.index.get_level_values(0)
+    hours = hourly.index.get_level_values(1)
+    station_ids = stations.unique()  # groupby output is sorted
+    codes = pd.Categorical(stations, categories=station_ids).codes
+    last_hour = pd.Series(hours).groupby(codes).max().to_numpy()
+
+    offset = ((last_hour[codes] - hours.to_numpy()) // np.timedelta64(1, 'h')).astype(np.int64)
+    keep = offset < length
+    values = np.full((len(station_ids), length), np.nan)
+    values[codes[keep], length - 1 - offset[keep]] = hourly.to_numpy()[keep]
+    return np.asarray(station_ids), values, last_hour
+
+
+def _fill_forward(values: np.ndarray) -> np.ndarray:
+    """Forward-fill NaNs along the time axis (leading NaNs stay)."""
+    idx = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    filled = values[np.arange(values.shape[0])[:, None], idx]
+    return filled
+
+
+def _time_features(start: np.ndarray, length: int) -> np.ndarray:
+    """``(n, length, F)`` time features of ``length`` hours from each ``start``."""
+    stamps = start[:, None] + np.arange(length) * np.timedelta64(1, 'h')
+    tf = features.time_features(pd.Series(stamps.ravel()))
+    return tf.to_numpy().reshape(len(start), length, -1)
+
+
+class BatchedPredictor:
+    """Batched inference over an exported transformer.
+
+    Args:
+        kind: ``'patchtst'`` or ``'informer'``.
+        module: TorchScript module (PatchTST) or Informer model.
+        spec: Export spec (lengths, lags and per-station normalization).
+        batch_size: Series per forward pass.
+    """
+
+    def __init__(self, kind: str, module, spec: dict, batch_size: int = BATCH_SIZE):
+        self.kind = kind
+        self.module = module
+        self.spec = spec
+        self.batch_size = batch_size
+        self.context_length = spec['context_length']
+        self.prediction_length = spec['prediction_length']
+        self.past_length = spec.get('past_length', self.context_length)
+        norm = spec['normalization']
+        self.station_codes = {s: i for i, s in enumerate(norm['stations'])}
+        self.mean = np.asarray(norm['mean'], dtype=np.float64)
+        self.std = np.asarray(norm['std'], dtype=np.float64)
+
+    @classmethod
+    def from_dir(cls, path: str, int8: bool = True, batch_size: int = BATCH_SIZE) -> "BatchedPredictor":
+        with open(os.path.join(path, SPEC_FILE)) as f:
+            spec = json.load(f)
+        if spec['kind'] == 'patchtst':
+            name = spec['files']['int8' if int8 and 'int8' in spec['files'] else 'fp32']
+            module = torch.jit.load(os.path.join(path, name), map_location='cpu').eval()
+        else:
+            from transformers import InformerForPrediction
+
+            module = InformerForPrediction.from_pretrained(os.path.join(path, spec['files']['hf'])).eval()
+            module.config.num_parallel_samples = INFORMER_SAMPLES
+            if int8:
+                module = torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+        return cls(spec['kind'], module, spec, batch_size)
+
+    @property
+    def lookback_hours(self) -> int:
+        """History :func:`ml_models.batch_inference.forecast_table` must pass in."""
+        return self.past_length
+
+    def __call__(self, history: pd.DataFrame, horizons: int) -> np.ndarray:
+        return self.forecast(history, horizons)
+
+    def predict(self, past_values: np.ndarray, past_time_features: Optional[np.ndarray] = None,
+                future_time_features: Optional[np.ndarray] = None,
+                static: Optional[np.ndarray] = None) -> np.ndarray:
+        """Normalized ``(n, prediction_length)`` forecasts for normalized windows."""
+        n = len(past_values)
+        out = np.empty((n, self.prediction_length), dtype=np.float32)
+        with torch.inference_mode():
+            for i in range(0, n, self.batch_size):
+                sl = slice(i, i + self.batch_size)
+                values = torch.from_numpy(np.ascontiguousarray(past_values[sl], dtype=np.float32))
+                if self.kind == 'patchtst':
+                    pred = self.module(values[:, -self.context_length:, None])[..., 0]
+                else:
+                    observed = ~torch.isnan(values)
+                    pred = self.module.generate(
+                        past_values=torch.nan_to_num(values),
+                        past_observed_mask=observed.float(),
+                        past_time_features=torch.from_numpy(past_time_features[sl].astype(np.float32)),
+                        future_time_features=torch.from_numpy(future_time_features[sl].astype(np.float32)),
+                        static_categorical_features=torch.from_numpy(static[sl, None].astype(np.int64)),
+                    ).sequences.mean(dim=1)
+                out[sl] = pred.numpy()
+        return out
+
+    def forecast(self, history: pd.DataFrame, horizons: int) -> np.ndarray:
+        """Forecast every station in ``history`` ``horizons`` hours ahead (°C)."""
+        stations, values, last_hour = hourly_context(history, self.past_length)
+        codes = np.array([self.station_codes.get(str(s), -1) for s in stations])
+        known = codes >= 0
+        # Stations unseen in training are scaled by their own context
+        with np.errstate(all='ignore'):
+            mean = np.where(known, self.mean[codes], np.nanmean(values, axis=1))
+            std = np.where(known, self.std[codes], np.nanstd(values, axis=1))
+        mean, std = np.nan_to_num(mean), np.where(np.nan_to_num(std) > 0, np.nan_to_num(std), 1.0)
+
+        window = (values - mean[:, None]) / (std[:, None] + 1e-6)
+        if self.kind == 'patchtst':
+            # PatchTST has no observed mask: carry the last value over gaps
+            window = np.nan_to_num(_fill_forward(window))
+        start = last_hour - (self.past_length - 1) * np.timedelta64(1, 'h')
+        static = np.where(known, codes, 0)
+
+        out = np.empty((len(stations), 0))
+        while out.shape[1] < horizons:
+            kwargs = {}
+            if self.kind == 'informer':
+                kwargs = dict(
+                    past_time_features=_time_features(start, self.past_length),
+                    future_time_features=_time_features(start + self.past_length * np.timedelta64(1, 'h'),
+                                                        self.prediction_length),
+                    static=static,
+                )
+            pred = self.predict(window, **kwargs)
+            out = np.concatenate([out, pred], axis=1)
+            # Roll the window forward over the predicted hours
+            window = np.concatenate([window, pred], axis=1)[:, -self.past_length:]
+            start = start + self.prediction_length * np.timedelta64(1, 'h')
+        return out[:, :horizons] * (std[:, None] + 1e-6) + mean[:, None]
+
+
+def load_run(run_id: str, int8: bool = True) -> Optional[BatchedPredictor]:
+    """Predictor of the inference model logged by run ``run_id``, if any."""
+    import mlflow.pyfunc
+    from mlflow.exceptions import MlflowException
+
+    try:
+        model = mlflow.pyfunc.load_model(f"runs:/{run_id}/inference")
+    except (MlflowException, OSError):
+        return None
+    predictor = model.unwrap_python_model().predictor
+    if not int8 and predictor.spec['files'].get('int8'):
+        return BatchedPredictor.from_dir(model.unwrap_python_model().path, int8=False)
+    return predictor
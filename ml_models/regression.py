@@ -1,10 +1,81 @@
+import numpy as np
 import pandas as pd
 import mlflow
 import mlflow.sklearn
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error, mean_absolute_error
+from sklearn.linear_model import LinearRegression, SGDRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
 import os
+import sys
+
+# Allow running as a script (python ml_models/regression.py) from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_models import backtest
+from ml_models import batch_inference
+from ml_models import features as feature_store
+from ml_models import streaming
+
+TARGET = 'target_temp_next_hour'
+EXPERIMENT_NAME = "Hourly_Weather_Forecast"
+
+# Defaults of the incremental (SGD) trainer a sweep may override
+INCREMENTAL_PARAMS = {
+    "epochs": 3,
+    "batch_size": 1024,
+    "eta0": 0.01,
+    "alpha": 1e-4,
+    "holdout": 0.2,
+}
+
+
+def _feature_rows(chunk):
+    """Feature rows with a known next-hour target for one streamed chunk."""
+    df = feature_store.build_features(chunk, cache=False)
+    df[TARGET] = feature_store.add_target(df, 'temp_c', horizon=1)
+    return df.dropna(subset=feature_store.REGRESSION_FEATURES + [TARGET])
+
+
+def fit_linear_regression(df):
+    """Fit the t+1 linear regression on canonical records ``df``."""
+    df_model = _feature_rows(df)
+    model = LinearRegression()
+    if len(df_model):
+        model.fit(df_model[feature_store.REGRESSION_FEATURES], df_model[TARGET])
+    return model
+
+
+def normal_equations(X, y, state=None):
+    """Add rows to the least-squares sufficient statistics ``X'X`` and ``X'y``.
+
+    A trailing column of ones carries the intercept. ``state`` (a previous
+    result, possibly loaded from JSON) is updated; the result is JSON
+    serializable, so a linear model can be refit exactly on all rows seen so
+    far from only the new ones.
+    """
+    X = np.column_stack([np.asarray(X, dtype=np.float64), np.ones(len(X))])
+    y = np.asarray(y, dtype=np.float64)
+    xtx, xty, n = X.T @ X, X.T @ y, len(y)
+    if state is not None:
+        xtx = xtx + np.asarray(state['xtx'])
+        xty = xty + np.asarray(state['xty'])
+        n += state['n']
+    return {'xtx': xtx.tolist(), 'xty': xty.tolist(), 'n': int(n)}
+
+
+def solve_normal_equations(state, features):
+    """``LinearRegression`` solving the least squares problem in ``state``."""
+    coef = np.linalg.lstsq(np.asarray(state['xtx']), np.asarray(state['xty']), rcond=None)[0]
+    model = LinearRegression()
+    model.coef_, model.intercept_ = coef[:-1], float(coef[-1])
+    model.feature_names_in_ = np.asarray(features, dtype=object)
+    model.n_features_in_ = len(features)
+    return model
+
+
+def linear_regression_forecaster(df):
+    """Backtest entry point: fit on ``df`` and forecast recursively."""
+    return batch_inference.regression_forecaster(fit_linear_regression(df), feature_store.REGRESSION_FEATURES)
+
 
 def train():
     print("Starting Hourly Forecast training...")
@@ -18,22 +89,11 @@ def train():
     df = pd.read_csv(data_path)
     
     # 1. Preprocessing & Feature Engineering
-    # Convert timestamp
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    
-    # Sort for lag creation
-    df = df.sort_values(by=['station_id', 'timestamp'])
-    
-    # Extract Time Features
-    df['hour'] = df['timestamp'].dt.hour
-    
-    # Create Target: Next Hour's Temperature
-    # We group by station to ensure we don't shift data between different stations
-    df['target_temp_next_hour'] = df.groupby('station_id')['temp_c'].shift(-1)
-    
-    # Drop rows where target is NaN (last hour of each station) or features are NaN
-    features = ['temp_c', 'wind_m_s', 'precip_mm', 'hour']
-    df_model = df.dropna(subset=features + ['target_temp_next_hour'])
+    # Shared with batch inference so serving builds the same inputs.
+    # Target: next hour's temperature (same station, exactly 1h later);
+    # rows without a target or with missing features are dropped
+    features = feature_store.REGRESSION_FEATURES
+    df_model = _feature_rows(df)
     
     print(f"Training data rows: {len(df_model)}")
     
@@ -41,14 +101,11 @@ def train():
         print("Not enough data to train.")
         return
 
-    # 2. Split Data
-    X = df_model[features]
-    y = df_model['target_temp_next_hour']
-    
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # 2. Rolling-origin backtest (no future data in any training fold)
+    metrics = backtest.backtest(df, {"linear_regression": linear_regression_forecaster})
     
     # 3. MLflow Tracking
-    mlflow.set_experiment("Hourly_Weather_Forecast")
+    mlflow.set_experiment(EXPERIMENT_NAME)
     
     with mlflow.start_run(run_name="linear_regression_t+1"):
         # Log Parameters
@@ -56,32 +113,110 @@ def train():
             "model_type": "LinearRegression",
             "features": features,
             "target": "temp_c (t+1)",
-            "test_size": 0.2,
-            "random_state": 42
+            "backtest_folds": backtest.N_FOLDS,
+            "backtest_step_hours": backtest.STEP_HOURS,
+            "backtest_horizons": backtest.HORIZON_HOURS,
         }
         mlflow.log_params(params)
         
-        # Train
-        model = LinearRegression()
-        model.fit(X_train, y_train)
+        # Metrics: per-horizon RMSE/MAE in one call
+        if not metrics.empty:
+            metrics = metrics.loc["linear_regression"]
+            print(f"RMSE (t+1): {metrics['rmse'].iloc[0]:.4f}")
+            print(f"MAE (t+1): {metrics['mae'].iloc[0]:.4f}")
+            print(f"RMSE (mean over {len(metrics)}h): {metrics['rmse'].mean():.4f}")
+            backtest.log_metrics(metrics)
+        else:
+            print("Not enough history for a backtest.")
         
-        # Predict
-        predictions = model.predict(X_test)
-        
-        # Metrics
-        mse = mean_squared_error(y_test, predictions)
-        rmse = mse ** 0.5
-        mae = mean_absolute_error(y_test, predictions)
-        
-        print(f"RMSE: {rmse:.4f}")
-        print(f"MAE: {mae:.4f}")
-        
-        mlflow.log_metric("rmse", rmse)
-        mlflow.log_metric("mae", mae)
+        # Train the served model on all data
+        model = LinearRegression()
+        model.fit(df_model[features], df_model[TARGET])
         
-        # Log Model
+        # Log Model, with the state online updates start from
+        mlflow.sklearn.log_model(model, "model")
+        mlflow.log_dict(normal_equations(df_model[features], df_model[TARGET]), "normal_equations.json")
+        mlflow.log_dict(streaming.watermark(df_model.groupby('station_id')['timestamp'].max()), "watermark.json")
+        print("Model logged to MLflow.")
+
+def train_incremental(path=None, params=None, report=None, run_tags=None,
+                      experiment=EXPERIMENT_NAME):
+    """Train an SGD regressor on the streamed store with ``partial_fit``.
+
+    Memory is bounded by the stream's chunk and shuffle buffer sizes, not by
+    the history length. The last ``holdout`` fraction of each station's time
+    range is held out. ``params`` overrides :data:`INCREMENTAL_PARAMS`;
+    ``report(epoch, rmse)`` is called after every epoch and stops training
+    when it returns True (sweep pruning). ``path`` is a training store that
+    is already up to date (a sweep builds it once for all trials); by default
+    the store is built or refreshed from the CSV. Returns the holdout RMSE.
+    """
+    print("Starting incremental Hourly Forecast training...")
+    path = path or streaming.ensure_store()
+    if path is None:
+        print(f"Error: {streaming.CANONICAL_CSV} not found. Run the data pipeline first.")
+        return
+
+    p = {**INCREMENTAL_PARAMS, **(params or {})}
+    features = feature_store.REGRESSION_FEATURES
+    stats = streaming.scan_stats(path, ['temp_c'])
+    holdout = p["holdout"]
+    train_span, test_span = (0.0, 1.0 - holdout), (1.0 - holdout, 1.0)
+
+    def batches(span, seed):
+        return streaming.feature_batches(
+            path, stats, _feature_rows, feature_store.MAX_LOOKBACK_HOURS, span=span,
+            batch_size=p["batch_size"], seed=seed, columns=['lat', 'lon', 'temp_c', 'precip_mm', 'wind_m_s'],
+        )
+
+    def evaluate(model):
+        # Streamed evaluation on the held-out span
+        n, sq_err, abs_err = 0, 0.0, 0.0
+        for batch in batches(test_span, seed=None):
+            err = model.predict(batch[features]) - batch[TARGET].to_numpy()
+            n += len(err)
+            sq_err += float((err ** 2).sum())
+            abs_err += float(abs(err).sum())
+        return ((sq_err / n) ** 0.5, abs_err / n) if n else (None, None)
+
+    # Pass 1 fits the scaler, the following ones the regressor
+    scaler = StandardScaler()
+    for batch in batches(train_span, seed=None):
+        scaler.partial_fit(batch[features])
+    if not hasattr(scaler, 'n_samples_seen_') or scaler.n_samples_seen_.max() < 10:
+        print("Not enough data to train.")
+        return
+    print(f"Training data rows: {int(scaler.n_samples_seen_.max())}")
+
+    regressor = SGDRegressor(learning_rate='adaptive', eta0=p["eta0"], alpha=p["alpha"], random_state=42)
+    model = Pipeline([('scaler', scaler), ('regressor', regressor)])
+    for epoch in range(p["epochs"]):
+        for batch in batches(train_span, seed=epoch):
+            regressor.partial_fit(scaler.transform(batch[features]), batch[TARGET].to_numpy())
+        if report is not None and report(epoch, evaluate(model)[0]):
+            break
+
+    rmse, mae = evaluate(model)
+
+    mlflow.set_experiment(experiment)
+    with mlflow.start_run(run_name="sgd_regression_t+1", tags=run_tags):
+        mlflow.log_params({
+            "model_type": "SGDRegressor",
+            "features": features,
+            "target": "temp_c (t+1)",
+            **p,
+        })
+        if rmse is not None:
+            print(f"RMSE: {rmse:.4f}")
+            print(f"MAE: {mae:.4f}")
+            mlflow.log_metrics({"rmse": rmse, "mae": mae})
         mlflow.sklearn.log_model(model, "model")
+        mlflow.log_dict(streaming.watermark(stats['last']), "watermark.json")
         print("Model logged to MLflow.")
+    return rmse
 
 if __name__ == "__main__":
-    train()
+    if "--stream" in sys.argv:
+        train_incremental()
+    else:
+        train()
@@ -0,0 +1,153 @@
+"""In-memory model serving cache.
+
+Keeps the latest finished model of each MLflow experiment loaded across
+dashboard sessions. Instead of searching runs on every render, the cache
+checks a cheap signature of the run index (for the local ``mlruns`` file
+store: the number of runs and the newest ``meta.yaml`` mtime) at most every
+``check_interval_s`` seconds and only searches and loads when it changes.
+A newer model is fully loaded before it replaces the old one, so readers
+always see a complete model.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+
+@dataclass(frozen=True)
+class ServedModel:
+    experiment_name: str
+    run_id: str
+    model: object
+    features: Optional[List[str]] = None
+    loaded_at: float = field(default_factory=time.time)
+
+
+def load_sklearn_model(run_id: str):
+    import mlflow.sklearn
+    return mlflow.sklearn.load_model(f"runs:/{run_id}/model")
+
+
+def _file_store_root() -> Optional[str]:
+    """Return the local directory of the tracking store, if it is a file store."""
+    import mlflow
+
+    uri = mlflow.get_tracking_uri()
+    parsed = urlparse(uri)
+    if parsed.scheme == 'file':
+        return url2pathname(parsed.path)
+    if parsed.scheme == '' and os.path.isdir(uri):
+        return uri
+    return None
+
+
+class ModelCache:
+    """Latest model per experiment, shared by every session of the process."""
+
+    def __init__(self, check_interval_s: float = 10.0, loader: Callable = load_sklearn_model):
+        self.check_interval_s = check_interval_s
+        self.loader = loader
+        self._models: Dict[str, ServedModel] = {}
+        self._experiment_ids: Dict[str, str] = {}
+        self._signatures: Dict[str, object] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def get(self, experiment_name: str) -> Optional[ServedModel]:
+        """Return the served model of ``experiment_name``, refreshing if stale.
+
+        Returns ``None`` while the experiment has no finished runs.
+        """
+        served = self._models.get(experiment_name)
+        if served is not None and time.monotonic() - self._checked_at.get(experiment_name, 0) < self.check_interval_s:
+            return served
+
+        with self._locks_lock:
+            lock = self._locks.setdefault(experiment_name, threading.Lock())
+        # Another session is already refreshing: keep serving the current model
+        if not lock.acquire(blocking=served is None):
+            return served
+        try:
+            self._refresh(experiment_name)
+        finally:
+            lock.release()
+        return self._models.get(experiment_name)
+
+    def invalidate(self, experiment_name: Optional[str] = None) -> None:
+        """Force a run index check on the next :meth:`get`."""
+        names = [experiment_name] if experiment_name else list(self._checked_at)
+        for name in names:
+            self._checked_at.pop(name, None)
+            self._signatures.pop(name, None)
+
+    def _refresh(self, experiment_name: str) -> None:
+        self._checked_at[experiment_name] = time.monotonic()
+        experiment_id = self._experiment_id(experiment_name)
+        if experiment_id is None:
+            return
+
+        signature = self._index_signature(experiment_id)
+        if signature is not None and signature == self._signatures.get(experiment_name):
+            return
+
+        run_id = self._latest_run_id(experiment_id)
+        served = self._models.get(experiment_name)
+        if run_id is not None and (served is None or served.run_id != run_id):
+            model = self.loader(run_id)
+            features = getattr(model, 'feature_names_in_', None)
+            # Single reference assignment: readers see the old or the new model
+            self._models[experiment_name] = ServedModel(
+                experiment_name, run_id, model, list(features) if features is not None else None
+            )
+        self._signatures[experiment_name] = signature
+
+    def _experiment_id(self, experiment_name: str) -> Optional[str]:
+        if experiment_name not in self._experiment_ids:
+            import mlflow
+
+            experiment = mlflow.get_experiment_by_name(experiment_name)
+            if experiment is None:
+                return None
+            self._experiment_ids[experiment_name] = experiment.experiment_id
+        return self._experiment_ids[experiment_name]
+
+    def _index_signature(self, experiment_id: str):
+        """Cheap fingerprint of the experiment's runs, or ``None`` if unknown.
+
+        Runs rewrite their ``meta.yaml`` when they are created and when they
+        finish, so the count of runs plus the newest mtime changes whenever a
+        new model may be available.
+        """
+        root = _file_store_root()
+        if root is None:
+            return None
+        exp_dir = os.path.join(root, experiment_id)
+        count, newest = 0, 0
+        try:
+            with os.scandir(exp_dir) as entries:
+                for entry in entries:
+                    if not entry.is_dir() or entry.name in ('models', 'datasets', 'traces'):
+                        continue
+                    try:
+                        newest = max(newest, os.stat(os.path.join(entry.path, 'meta.yaml')).st_mtime_ns)
+                        count += 1
+                    except FileNotFoundError:
+                        continue
+        except FileNotFoundError:
+            return None
+        return count, newest
+
+    def _latest_run_id(self, experiment_id: str) -> Optional[str]:
+        from mlflow.tracking import MlflowClient
+
+        runs = MlflowClient().search_runs(
+            experiment_ids=[experiment_id],
+            filter_string="attributes.status = 'FINISHED'",
+            order_by=["attributes.start_time DESC"],
+            max_results=1,
+        )
+        return runs[0].info.run_id if runs else None
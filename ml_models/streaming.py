@@ -0,0 +1,349 @@
+"""Out-of-core training data streamed from the station-partitioned store.
+
+The trainers read the canonical data through :func:`open_store` instead of
+loading the whole history: every station partition is scanned in time order
+in chunks of ``chunk_rows`` rows, carrying over just enough rows to bridge
+windows (or feature look-backs) across chunk boundaries. A few stations are
+interleaved and samples go through a bounded shuffle buffer, so peak memory
+depends on the chunk, buffer and batch sizes rather than on the history
+length. Per-station statistics and time bounds come from one streaming pass
+(:func:`scan_stats`).
+"""
+import os
+import shutil
+import tempfile
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+
+from processing import storage
+from ml_models.windows import MultiSeriesWindowDataset, WindowBatch
+
+TRAINING_STORE = "data/canonical_store"
+CANONICAL_CSV = "data/canonical.csv"
+
+CHUNK_ROWS = 16384
+SHUFFLE_BUFFER = 4096
+INTERLEAVE = 4
+
+
+def ensure_store(path: str = TRAINING_STORE, csv_path: str = CANONICAL_CSV) -> Optional[str]:
+    """Return ``path``, (re)building it from ``csv_path`` when the CSV is newer.
+
+    The store is built in a temporary folder next to ``path`` and swapped in
+    whole, stamped with the modification time of the CSV it was built from.
+    Returns None when neither the store nor the CSV exists.
+    """
+    if not os.path.exists(csv_path):
+        return path if os.path.isdir(path) else None
+    csv_mtime = os.path.getmtime(csv_path)
+    if os.path.isdir(path) and os.path.getmtime(path) >= csv_mtime:
+        return path
+
+    print(f"Building training store {path} from {csv_path}...")
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix='.build-')
+    try:
+        storage.csv_to_partitioned(csv_path, tmp)
+        os.utime(tmp, (csv_mtime, csv_mtime))
+        old = None
+        if os.path.isdir(path):
+            old = tempfile.mkdtemp(dir=parent, prefix='.old-')
+            os.replace(path, os.path.join(old, 'store'))
+        os.replace(tmp, path)
+        if old:
+            shutil.rmtree(old, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return path
+
+
+def open_store(path: str = TRAINING_STORE):
+    import pyarrow.dataset as ds
+
+    return ds.dataset(path, format='parquet', partitioning=storage.partitioning())
+
+
+def scan_stats(path: str, columns: Sequence[str]) -> pd.DataFrame:
+    """Per-station row counts, time bounds, means and stds in one streaming pass.
+
+    Returns a frame indexed by station with ``rows``, ``first``, ``last`` and
+    the ``<column>_mean`` / ``<column>_std`` columns of
+    :func:`ml_models.features.normalization_stats`.
+    """
+    columns = list(columns)
+    sums = None
+    bounds = None
+    for batch in open_store(path).to_batches(columns=['station_id', 'timestamp'] + columns):
+        df = batch.to_pandas()
+        if df.empty:
+            continue
+        values = df[columns].astype(np.float64)
+        grouped = values.groupby(df['station_id'])
+        part = pd.concat({
+            'n': grouped.count(),
+            'sum': grouped.sum(),
+            'sumsq': (values ** 2).groupby(df['station_id']).sum(),
+        }, axis=1)
+        part[('rows', '')] = df.groupby('station_id').size()
+        ts = df.groupby('station_id')['timestamp'].agg(['min', 'max'])
+        sums = part if sums is None else sums.add(part, fill_value=0)
+        bounds = ts if bounds is None else pd.concat([bounds, ts]).groupby(level=0).agg({'min': 'min', 'max': 'max'})
+
+    if sums is None:
+        return pd.DataFrame(columns=['rows', 'first', 'last'] + [f'{c}_{s}' for c in columns for s in ('mean', 'std')])
+
+    stats = pd.DataFrame({'rows': sums[('rows', '')].astype(int), 'first': bounds['min'], 'last': bounds['max']})
+    for c in columns:
+        n = sums[('n', c)].replace(0, np.nan)
+        mean = sums[('sum', c)] / n
+        stats[f'{c}_mean'] = mean
+        stats[f'{c}_std'] = np.sqrt((sums[('sumsq', c)] / n - mean ** 2).clip(lower=0))
+    stats.index.name = 'station_id'
+    return stats.sort_index()
+
+
+def watermark(last: pd.Series) -> Dict[str, str]:
+    """JSON form of the latest timestamp a model has seen, per station.
+
+    Logged with every trained model; :mod:`ml_models.online` updates the
+    model on the rows after it.
+    """
+    return {str(s): pd.Timestamp(t).isoformat() for s, t in last.dropna().items()}
+
+
+def span_bounds(stats: pd.DataFrame, span: Tuple[float, float]) -> pd.DataFrame:
+    """Per-station ``[start, end)`` covering the ``span`` fraction of each station's time range."""
+    length = stats['last'] - stats['first']
+    start = stats['first'] + length * span[0]
+    # The last row belongs to the final span
+    end = stats['first'] + length * span[1] + (pd.Timedelta(microseconds=1) if span[1] >= 1 else pd.Timedelta(0))
+    return pd.DataFrame({'start': start, 'end': end})
+
+
+def station_chunks(path: str, station, columns: Sequence[str], start=None, end=None,
+                   chunk_rows: int = CHUNK_ROWS, carry_hours: int = 0) -> Iterator[pd.DataFrame]:
+    """Yield time-ordered chunks of one station.
+
+    Each chunk starts with the rows of the previous chunk's last
+    ``carry_hours`` hours, so windows or look-backs spanning a chunk boundary
+    are not lost.
+    """
+    dataset = open_store(path)
+    columns = ['station_id', 'timestamp'] + [c for c in columns if c not in ('station_id', 'timestamp')]
+    expr = storage._store_filter({'station_id': [station]}, start, end)
+    carry = None
+    for batch in dataset.to_batches(columns=columns, filter=expr, batch_size=chunk_rows):
+        if batch.num_rows == 0:
+            continue
+        chunk = batch.to_pandas()
+        if carry is not None and len(carry):
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        chunk = chunk.sort_values('timestamp', kind='stable').reset_index(drop=True)
+        yield chunk
+        if carry_hours > 0:
+            last = chunk['timestamp'].iloc[-1].floor('h')
+            carry = chunk[chunk['timestamp'] >= last - pd.Timedelta(hours=carry_hours - 1)]
+
+
+def interleave(iterators: Iterable[Iterator], width: int = INTERLEAVE) -> Iterator:
+    """Round-robin over up to ``width`` iterators at a time."""
+    pending = iter(iterators)
+    active: List[Iterator] = []
+    while True:
+        while len(active) < width:
+            nxt = next(pending, None)
+            if nxt is None:
+                break
+            active.append(iter(nxt))
+        if not active:
+            return
+        for it in list(active):
+            item = next(it, None)
+            if item is None:
+                active.remove(it)
+            else:
+                yield item
+
+
+def shuffled(items: Iterable, buffer_size: int, rng: np.random.Generator) -> Iterator:
+    """Approximate shuffle holding at most ``buffer_size`` items."""
+    if buffer_size <= 1:
+        yield from items
+        return
+    buffer = []
+    for item in items:
+        if len(buffer) < buffer_size:
+            buffer.append(item)
+            continue
+        i = rng.integers(buffer_size)
+        yield buffer[i]
+        buffer[i] = item
+    rng.shuffle(buffer)
+    yield from buffer
+
+
+def shuffled_frames(frames: Iterable[pd.DataFrame], batch_size: int, buffer_rows: int,
+                    rng: Optional[np.random.Generator]) -> Iterator[pd.DataFrame]:
+    """Re-batch ``frames`` into ``batch_size`` rows, shuffling within ``buffer_rows``.
+
+    Pass ``rng=None`` to keep the order.
+    """
+    buffer: List[pd.DataFrame] = []
+    size = 0
+
+    def drain(final: bool):
+        nonlocal buffer, size
+        df = pd.concat(buffer, ignore_index=True)
+        if rng is not None:
+            df = df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+        n_full = len(df) // batch_size * batch_size
+        for i in range(0, n_full, batch_size):
+            yield df.iloc[i:i + batch_size]
+        rest = df.iloc[n_full:]
+        if final and len(rest):
+            yield rest
+        buffer, size = ([rest] if len(rest) else []), len(rest)
+
+    for frame in frames:
+        if frame.empty:
+            continue
+        buffer.append(frame)
+        size += len(frame)
+        if size >= max(buffer_rows, batch_size):
+            yield from drain(final=False)
+    if size:
+        yield from drain(final=True)
+
+
+class StreamingWindowDataset(IterableDataset):
+    """Shuffled windows of every station, streamed from the partitioned store.
+
+    Each chunk is windowed with :class:`MultiSeriesWindowDataset` using the
+    given station vocabulary and statistics, so samples match the in-memory
+    dataset. Stations are split across DataLoader workers, which then
+    prefetch in parallel.
+
+    Args:
+        path: Station-partitioned store.
+        column: Value column to window.
+        past_length: Length of the past window (context plus any lags).
+        prediction_length: Length of the future window.
+        stats: Output of :func:`scan_stats`; defines stations and scaling.
+        span: Fraction of each station's time range to read, e.g. ``(0, 0.8)``.
+        shuffle_buffer: Samples held for shuffling (0 keeps the order).
+        chunk_rows: Rows read per chunk.
+        seed: Base seed; the epoch set by :meth:`set_epoch` is added to it.
+        batch_size: Yield :class:`~ml_models.windows.WindowBatch` items of up
+            to this many windows of one chunk, gathered in one indexing
+            operation per field (shuffled within the chunk, then across
+            ``shuffle_buffer // batch_size`` batches). Load them with
+            ``batch_size=1`` and :func:`~ml_models.windows.collate_batch`.
+            None yields single windows.
+        **window_kwargs: Passed to :class:`MultiSeriesWindowDataset`.
+    """
+
+    def __init__(self, path: str, column: str, past_length: int, prediction_length: int, stats: pd.DataFrame,
+                 span: Tuple[float, float] = (0.0, 1.0), shuffle_buffer: int = SHUFFLE_BUFFER,
+                 chunk_rows: int = CHUNK_ROWS, seed: int = 0, batch_size: Optional[int] = None, **window_kwargs):
+        self.path = path
+        self.column = column
+        self.past_length = past_length
+        self.prediction_length = prediction_length
+        self.stats = stats
+        self.stations = list(stats.index)
+        self.bounds = span_bounds(stats, span)
+        self.span = span
+        self.shuffle_buffer = shuffle_buffer
+        self.chunk_rows = chunk_rows
+        self.seed = seed
+        self.epoch = 0
+        self.batch_size = batch_size
+        self.window_kwargs = window_kwargs
+
+    @property
+    def cardinality(self) -> int:
+        return len(self.stations)
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    def approx_len(self) -> int:
+        """Estimated number of windows (assumes hourly rows spread evenly in time)."""
+        rows = self.stats['rows'] * (self.span[1] - self.span[0])
+        window = self.past_length + self.prediction_length
+        return int((rows - window + 1).clip(lower=0).sum())
+
+    def normalization(self) -> dict:
+        return {
+            'stations': [str(s) for s in self.stations],
+            'mean': self.stats[f'{self.column}_mean'].fillna(0.0).tolist(),
+            'std': self.stats[f'{self.column}_std'].fillna(1.0).tolist(),
+        }
+
+    def _station_windows(self, station, rng: np.random.Generator) -> Iterator[Dict[str, torch.Tensor]]:
+        window = self.past_length + self.prediction_length
+        bounds = self.bounds.loc[station]
+        for chunk in station_chunks(self.path, station, [self.column], bounds['start'], bounds['end'],
+                                    chunk_rows=self.chunk_rows, carry_hours=window - 1):
+            ds = MultiSeriesWindowDataset(chunk, self.column, self.past_length, self.prediction_length,
+                                          stations=self.stations, stats=self.stats, **self.window_kwargs)
+            if self.batch_size:
+                order = rng.permutation(len(ds)) if self.shuffle_buffer else np.arange(len(ds))
+                for i in range(0, len(ds), self.batch_size):
+                    # The gather copies out of the chunk buffer, so the chunk can be freed
+                    yield WindowBatch(ds.__getitems__(order[i:i + self.batch_size]))
+                continue
+            for i in range(len(ds)):
+                # Copy out of the chunk buffer so the chunk can be freed
+                yield {k: v.clone() for k, v in ds[i].items()}
+
+    def __iter__(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        stations = list(self.stations)
+        if self.shuffle_buffer:
+            rng.shuffle(stations)
+        worker = get_worker_info()
+        if worker is not None:
+            stations = stations[worker.id::worker.num_workers]
+            rng = np.random.default_rng([self.seed + self.epoch, worker.id])
+        samples = interleave(self._station_windows(s, rng) for s in stations)
+        buffer = self.shuffle_buffer // self.batch_size if self.batch_size else self.shuffle_buffer
+        return shuffled(samples, buffer, rng)
+
+
+def feature_batches(path: str, stats: pd.DataFrame, build: Callable[[pd.DataFrame], pd.DataFrame],
+                    lookback_hours: int, span: Tuple[float, float] = (0.0, 1.0), batch_size: int = 1024,
+                    buffer_rows: int = 8 * CHUNK_ROWS, chunk_rows: int = CHUNK_ROWS, seed: Optional[int] = 0,
+                    columns: Optional[Sequence[str]] = None) -> Iterator[pd.DataFrame]:
+    """Stream feature rows of every station in shuffled batches.
+
+    ``build`` turns a raw chunk into feature rows (dropping incomplete rows).
+    Chunks carry ``lookback_hours`` of history plus two hours, and only rows
+    newer than the previous chunk's complete rows are emitted, so each row
+    is yielded once with full look-back. ``seed=None`` disables shuffling.
+    """
+    bounds = span_bounds(stats, span)
+
+    def station_frames(station):
+        emitted_until = None
+        for chunk in station_chunks(path, station, columns or [], bounds.loc[station, 'start'],
+                                    bounds.loc[station, 'end'], chunk_rows=chunk_rows,
+                                    carry_hours=lookback_hours + 2):
+            frame = build(chunk)
+            if emitted_until is not None:
+                frame = frame[frame['timestamp'] > emitted_until]
+            # The last hour's target lies in the next chunk
+            emitted_until = chunk['timestamp'].max() - pd.Timedelta(hours=1)
+            yield frame
+
+    rng = np.random.default_rng(seed) if seed is not None else None
+    stations = list(stats.index)
+    if rng is not None:
+        rng.shuffle(stations)
+    frames = interleave(station_frames(s) for s in stations)
+    return shuffled_frames(frames, batch_size, buffer_rows, rng)
@@ -0,0 +1,233 @@
+"""Hyperparameter sweeps over the trainers in a process pool.
+
+Trials are sampled from a search space and run in ``spawn`` worker
+processes, each limited to ``threads`` BLAS/OpenMP/torch threads so that
+``workers * threads`` matches the cores of the machine. Every trial reports
+its intermediate eval loss to a shared :class:`MedianPruner`, which stops
+trials that are worse than the median of the others at the same step. Each
+trial is logged as a child run of one parent MLflow run per sweep, in a
+separate ``<experiment>_sweep`` experiment so trials are never served.
+
+Usage:
+    python ml_models/sweep.py informer --trials 16 --workers 4 --threads 2
+"""
+import argparse
+import importlib
+import math
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Allow running as a script (python ml_models/sweep.py) from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Trainer name -> (module, training function); modules define EXPERIMENT_NAME
+TRAINERS = {
+    'informer': ('models.train_transformer', 'train_transformer'),
+    'patchtst': ('ml_models.transformer_informer', 'train_transformer'),
+    'regression': ('ml_models.regression', 'train_incremental'),
+}
+
+# Values are lists (choice) or ('log' | 'uniform' | 'int', low, high)
+DEFAULT_SPACES = {
+    'informer': {
+        'learning_rate': ('log', 1e-4, 3e-3),
+        'd_model': [16, 32, 64],
+        'encoder_layers': [1, 2, 3],
+        'decoder_layers': [1, 2],
+        'context_length': [24, 48, 96],
+        'batch_size': [32, 64],
+    },
+    'patchtst': {
+        'learning_rate': ('log', 1e-4, 3e-3),
+        'd_model': [16, 32, 64],
+        'encoder_layers': [1, 2, 3],
+        'encoder_ffn_dim': [32, 64, 128],
+        'dropout': ('uniform', 0.0, 0.3),
+        'context_length': [24, 48],
+        'batch_size': [16, 32, 64],
+    },
+    'regression': {
+        'eta0': ('log', 1e-3, 1e-1),
+        'alpha': ('log', 1e-6, 1e-2),
+        'batch_size': [256, 1024, 4096],
+    },
+}
+
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+
+def sample_space(space: Dict[str, Any], n_trials: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Draw ``n_trials`` random configurations from ``space``."""
+    rng = np.random.default_rng(seed)
+    trials = []
+    for _ in range(n_trials):
+        params = {}
+        for name, spec in space.items():
+            if isinstance(spec, list):
+                params[name] = spec[rng.integers(len(spec))]
+            elif spec[0] == 'log':
+                params[name] = float(math.exp(rng.uniform(math.log(spec[1]), math.log(spec[2]))))
+            elif spec[0] == 'uniform':
+                params[name] = float(rng.uniform(spec[1], spec[2]))
+            elif spec[0] == 'int':
+                params[name] = int(rng.integers(spec[1], spec[2] + 1))
+            else:
+                raise ValueError(f"Unknown distribution for {name}: {spec!r}")
+        # numpy scalars do not survive MLflow params / JSON cleanly
+        trials.append({k: v.item() if isinstance(v, np.generic) else v for k, v in params.items()})
+    return trials
+
+
+class MedianPruner:
+    """Stop a trial whose value is worse than the median of other trials at that step.
+
+    ``shared`` maps trial id -> list of reported values; pass a
+    ``multiprocessing.Manager().dict()`` to share it across processes.
+    Lower values are better.
+    """
+
+    def __init__(self, shared=None, n_startup_trials: int = 2):
+        self.shared = shared if shared is not None else {}
+        self.n_startup_trials = n_startup_trials
+
+    def report(self, trial: int, step: int, value: float) -> bool:
+        values = list(self.shared.get(trial, []))
+        values.append(value)
+        self.shared[trial] = values
+        others = [v[step] for t, v in self.shared.items()
+                  if t != trial and len(v) > step and v[step] is not None]
+        if value is None or len(others) < self.n_startup_trials:
+            return False
+        return value > float(np.median(others))
+
+
+def report_callback(report: Callable[[int, float], bool]):
+    """transformers callback passing every eval loss to ``report``."""
+    from transformers import TrainerCallback
+
+    class ReportCallback(TrainerCallback):
+        def __init__(self):
+            self.evaluations = 0
+
+        def on_evaluate(self, args, state, control, metrics=None, **kwargs):
+            if metrics and 'eval_loss' in metrics:
+                if report(self.evaluations, metrics['eval_loss']):
+                    control.should_training_stop = True
+                self.evaluations += 1
+
+    return ReportCallback()
+
+
+def limit_threads(threads: int) -> None:
+    """Cap the BLAS/OpenMP/torch threads of this process."""
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+
+
+def run_trial(trainer: str, trial: int, params: Dict[str, Any], pruner: MedianPruner,
+              parent_run_id: Optional[str], experiment: str, threads: int,
+              store: Optional[str] = None) -> Dict[str, Any]:
+    """Run one trial in the current process and return its result row.
+
+    ``store`` is the training store, already built by :func:`run_sweep`.
+    """
+    from mlflow.utils.mlflow_tags import MLFLOW_PARENT_RUN_ID
+
+    limit_threads(threads)
+    module, function = TRAINERS[trainer]
+    train = getattr(importlib.import_module(module), function)
+    limit_threads(threads)  # again, now that the trainer's libraries are loaded
+
+    pruned = False
+
+    def report(step, value):
+        nonlocal pruned
+        pruned = pruner.report(trial, step, value)
+        return pruned
+
+    tags = {'sweep_trial': str(trial)}
+    if parent_run_id:
+        tags[MLFLOW_PARENT_RUN_ID] = parent_run_id
+    value = train(params={**params, **fixed_params(trainer)}, report=report, run_tags=tags, experiment=experiment,
+                  path=store)
+    return {'trial': trial, **params, 'value': value, 'state': 'pruned' if pruned else 'complete'}
+
+
+def fixed_params(trainer: str) -> Dict[str, Any]:
+    # Trials already run in parallel, so no extra loader processes
+    return {'num_workers': 0} if trainer != 'regression' else {}
+
+
+def run_sweep(trainer: str, space: Optional[Dict[str, Any]] = None, n_trials: int = 8,
+              workers: Optional[int] = None, threads: int = 1, seed: int = 0,
+              n_startup_trials: int = 2) -> pd.DataFrame:
+    """Run a sweep and return one row per trial, best first.
+
+    ``workers`` defaults to ``cpu_count // threads``.
+    """
+    import mlflow
+    from ml_models import streaming
+
+    module, _ = TRAINERS[trainer]
+    experiment = f"{importlib.import_module(module).EXPERIMENT_NAME}_sweep"
+    trials = sample_space(space or DEFAULT_SPACES[trainer], n_trials, seed)
+    workers = workers or max(1, (os.cpu_count() or 1) // threads)
+    # Built (or refreshed) once here: trials rebuilding it concurrently would
+    # swap the store out from under each other
+    store = streaming.ensure_store()
+    if store is None:
+        raise FileNotFoundError(f"{streaming.CANONICAL_CSV} not found. Run the data pipeline first.")
+
+    mlflow.set_experiment(experiment)
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Manager() as manager, mlflow.start_run(run_name=f"sweep_{trainer}") as parent:
+        mlflow.log_params({'trainer': trainer, 'n_trials': n_trials, 'workers': workers,
+                           'threads_per_trial': threads, 'seed': seed})
+        pruner = MedianPruner(manager.dict(), n_startup_trials)
+        results = []
+        with ProcessPoolExecutor(workers, mp_context=ctx, initializer=limit_threads, initargs=(threads,)) as pool:
+            futures = [
+                pool.submit(run_trial, trainer, i, params, pruner, parent.info.run_id, experiment, threads, store)
+                for i, params in enumerate(trials)
+            ]
+            for future in as_completed(futures):
+                row = future.result()
+                print(f"Trial {row['trial']} {row['state']}: {row['value']}")
+                results.append(row)
+
+        table = pd.DataFrame(results).sort_values('value', na_position='last').reset_index(drop=True)
+        best = table.iloc[0]
+        if pd.notna(best['value']):
+            mlflow.log_metrics({'best_value': float(best['value']),
+                                'pruned_trials': int((table['state'] == 'pruned').sum())})
+            mlflow.log_params({f'best_{k}': best[k] for k in trials[0]})
+        return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('trainer', choices=sorted(TRAINERS))
+    parser.add_argument('--trials', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threads', type=int, default=1, help='threads per trial')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    table = run_sweep(args.trainer, n_trials=args.trials, workers=args.workers, threads=args.threads, seed=args.seed)
+    print(table.to_string())
+
+
+if __name__ == "__main__":
+    main()
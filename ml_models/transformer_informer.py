@@ -1,104 +1,109 @@
 import pandas as pd
 import numpy as np
 import torch
-from torch.utils.data import Dataset
 from transformers import InformerConfig, InformerForPrediction, Trainer, TrainingArguments, AutoformerConfig, AutoformerForPrediction, PatchTSTConfig, PatchTSTForPrediction
 import mlflow
 import mlflow.transformers
 import os
+import sys
+import tempfile
+
+# Allow running as a script (python ml_models/transformer_informer.py) from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_models import export, streaming, sweep
+from ml_models.streaming import StreamingWindowDataset
+from ml_models.windows import collate_batch
 
 # --- Configuration ---
 PREDICTION_LENGTH = 6   # Predict next 6 hours
 CONTEXT_LENGTH = 24     # Use past 24 hours
 BATCH_SIZE = 16
+NUM_WORKERS = 2       # Prefetching loader processes
 EPOCHS = 5
+EXPERIMENT_NAME = "Transformer_Weather_Forecast"
 
-class WeatherDataset(Dataset):
-    def __init__(self, df, context_length, prediction_length):
-        self.df = df.copy()
-        self.context_length = context_length
-        self.prediction_length = prediction_length
-        
-        # Ensure sorted
-        self.df = self.df.sort_values('timestamp')
-        self.data = self.df['temp_c'].values.astype(np.float32)
-        
-        # Simple time feature: Hour of day normalized [0, 1]
-        self.time_features = (self.df['timestamp'].dt.hour.values / 23.0).astype(np.float32)
-        
-        # Normalize Data (Z-score)
-        self.mean = np.mean(self.data)
-        self.std = np.std(self.data)
-        self.data = (self.data - self.mean) / (self.std + 1e-6)
+# Defaults for every parameter a sweep may override
+DEFAULT_PARAMS = {
+    "prediction_length": PREDICTION_LENGTH,
+    "context_length": CONTEXT_LENGTH,
+    "batch_size": BATCH_SIZE,
+    "epochs": EPOCHS,
+    "num_workers": NUM_WORKERS,
+    "learning_rate": 1e-3,
+    "d_model": 16,
+    "encoder_layers": 2,
+    "encoder_attention_heads": 2,
+    "encoder_ffn_dim": 32,
+    "dropout": 0.1,
+}
 
-    def __len__(self):
-        # We need enough data for context + prediction
-        return len(self.data) - self.context_length - self.prediction_length
+class WeatherDataset(StreamingWindowDataset):
+    """Per-station normalized temperature windows for PatchTST, all stations.
 
-    def __getitem__(self, idx):
-        # Past (Context)
-        past_len = self.context_length
-        past_start = idx
-        past_end = idx + past_len
-        past_values = self.data[past_start:past_end]
-        
-        # Future (Target)
-        future_start = past_end
-        future_end = past_end + self.prediction_length
-        future_values = self.data[future_start:future_end]
-        
-        return {
-            "past_values": torch.tensor(past_values).unsqueeze(-1),
-            "future_values": torch.tensor(future_values).unsqueeze(-1),
-        }
+    Streamed from the station-partitioned store. PatchTST is channel
+    independent and has no static inputs, so the station code is left out;
+    per-station scaling is what lets one model serve all.
+    """
+
+    def __init__(self, path, stats, context_length, prediction_length, **kwargs):
+        # PatchTST takes (seq_len, num_input_channels) windows
+        super().__init__(
+            path,
+            'temp_c',
+            context_length,
+            prediction_length,
+            stats,
+            channel_dim=True,
+            with_station=False,
+            **kwargs,
+        )
+
+def train_transformer(params=None, report=None, run_tags=None, experiment=EXPERIMENT_NAME, path=None):
+    """Train PatchTST on every station and return the final eval loss.
 
-def train_transformer():
+    ``params`` overrides :data:`DEFAULT_PARAMS`. ``report(step, eval_loss)`` is
+    called after every evaluation and stops training when it returns True
+    (sweep pruning). ``run_tags`` are set on the MLflow run, logged to
+    ``experiment``. ``path`` is a training store that is already up to date
+    (a sweep builds it once for all trials); by default the store is built or
+    refreshed from the CSV.
+    """
     print("Starting Transformer training...")
+    p = {**DEFAULT_PARAMS, **(params or {})}
     
-    # Load Data
-    data_path = "data/canonical.csv"
-    if not os.path.exists(data_path):
+    # Stream from the station-partitioned store (rebuilt when the CSV is newer)
+    data_path = path or streaming.ensure_store()
+    if data_path is None:
         print("Data not found.")
         return
-        
-    df = pd.read_csv(data_path)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    
-    # Filter for one station for simplicity in this demo
-    # Ideally we would train on all, but let's pick the one with most data
-    station_counts = df['station_id'].value_counts()
-    station_id = station_counts.index[0]
-    print(f"Training on station: {station_id} ({station_counts.iloc[0]} rows)")
     
-    df_station = df[df['station_id'] == station_id].dropna(subset=['temp_c']).reset_index(drop=True)
+    # Global model over every station, split in time within each station
+    stats = streaming.scan_stats(data_path, ['temp_c'])
+    # Datasets yield whole batches gathered from the strided windows
+    train_dataset = WeatherDataset(data_path, stats, p["context_length"], p["prediction_length"], span=(0.0, 0.8),
+                                   batch_size=p["batch_size"])
+    test_dataset = WeatherDataset(data_path, stats, p["context_length"], p["prediction_length"], span=(0.8, 1.0),
+                                  shuffle_buffer=0, batch_size=p["batch_size"])
     
-    if len(df_station) < (CONTEXT_LENGTH + PREDICTION_LENGTH + 10):
+    if train_dataset.approx_len() <= 0 or test_dataset.approx_len() <= 0:
         print("Not enough data.")
         return
-
-    # Split Train/Test
-    split_idx = int(len(df_station) * 0.8)
-    train_df = df_station.iloc[:split_idx]
-    test_df = df_station.iloc[split_idx:]
-    
-    train_dataset = WeatherDataset(train_df, CONTEXT_LENGTH, PREDICTION_LENGTH)
-    test_dataset = WeatherDataset(test_df, CONTEXT_LENGTH, PREDICTION_LENGTH)
-    
-    print(f"Train samples: {len(train_dataset)}, Test samples: {len(test_dataset)}")
+    print(f"Stations: {train_dataset.cardinality}, Train samples: ~{train_dataset.approx_len()}, "
+          f"Test samples: ~{test_dataset.approx_len()}")
     
     # Model Config
     config = PatchTSTConfig(
-        prediction_length=PREDICTION_LENGTH,
-        context_length=CONTEXT_LENGTH,
+        prediction_length=p["prediction_length"],
+        context_length=p["context_length"],
         input_size=1,
         num_input_channels=1, # PatchTST uses channels
         lags_sequence=[1],
         num_time_features=1,
-        d_model=16,
-        encoder_layers=2,
-        encoder_attention_heads=2,
-        encoder_ffn_dim=32,
-        dropout=0.1,
+        d_model=p["d_model"],
+        encoder_layers=p["encoder_layers"],
+        encoder_attention_heads=p["encoder_attention_heads"],
+        encoder_ffn_dim=p["encoder_ffn_dim"],
+        dropout=p["dropout"],
     )
     
     model = PatchTSTForPrediction(config)
@@ -107,10 +112,14 @@ def train_transformer():
     training_args = TrainingArguments(
         output_dir="out/informer_checkpoints",
         overwrite_output_dir=True,
-        learning_rate=1e-3,
-        num_train_epochs=EPOCHS,
-        per_device_train_batch_size=BATCH_SIZE,
-        per_device_eval_batch_size=BATCH_SIZE,
+        learning_rate=p["learning_rate"],
+        # Streamed datasets have no length: run `epochs` passes worth of steps
+        max_steps=p["epochs"] * max(1, train_dataset.approx_len() // p["batch_size"]),
+        dataloader_num_workers=p["num_workers"],
+        dataloader_prefetch_factor=2 if p["num_workers"] else None,
+        # One dataset batch per step (see the datasets above)
+        per_device_train_batch_size=1,
+        per_device_eval_batch_size=1,
         eval_strategy="epoch",
         logging_strategy="epoch",
         save_strategy="no",
@@ -120,14 +129,19 @@ def train_transformer():
     )
     
     # MLflow Setup
-    mlflow.set_experiment("Transformer_Weather_Forecast")
+    mlflow.set_experiment(experiment)
     
-    with mlflow.start_run(run_name="informer_demo"):
+    with mlflow.start_run(run_name="informer_demo", tags=run_tags):
+        mlflow.log_params(p)
+        mlflow.log_dict(train_dataset.normalization(), "normalization.json")
+        mlflow.log_dict(streaming.watermark(stats['last']), "watermark.json")
         trainer = Trainer(
             model=model,
             args=training_args,
             train_dataset=train_dataset,
             eval_dataset=test_dataset,
+            data_collator=collate_batch,  # datasets return whole batches
+            callbacks=[sweep.report_callback(report)] if report else None,
         )
         
         trainer.train()
@@ -136,13 +150,18 @@ def train_transformer():
         metrics = trainer.evaluate()
         print("Evaluation Metrics:", metrics)
         
-        # Save Model manually to MLflow to ensure transformers flavor
-        # mlflow.transformers.log_model(
-        #     transformers_model={"model": model, "feature_extractor": None}, # No feature extractor for raw time series
-        #     artifact_path="informer_model",
-        #     task="time-series-forecasting"
-        # )
-        print("Model logged to MLflow (via autolog or skipped).")
+        # Checkpoint (for fine-tuning) and CPU inference artifact (for serving)
+        with tempfile.TemporaryDirectory() as tmp:
+            model.save_pretrained(tmp)
+            mlflow.log_artifacts(tmp, "model")
+        if report is None:  # sweep trials are not served
+            export.log_inference_model(model, "patchtst", {
+                "context_length": p["context_length"],
+                "prediction_length": p["prediction_length"],
+                "normalization": train_dataset.normalization(),
+            })
+        print("Model logged to MLflow.")
+        return metrics["eval_loss"]
 
 if __name__ == "__main__":
     train_transformer()
@@ -0,0 +1,249 @@
+"""Zero-copy sliding-window datasets for the transformer trainers.
+
+All past/future windows are strided views over one contiguous float32
+buffer (``numpy.lib.stride_tricks.as_strided`` fed to ``torch.from_numpy``),
+so building a dataset allocates nothing per window and ``__getitem__``
+returns views. Observed masks and time features are precomputed buffers
+windowed the same way. ``__getitems__`` gathers a whole batch with one
+indexing operation per field, and :func:`collate_batch` passes that batch
+(or a :class:`WindowBatch` yielded by a streamed dataset) through instead of
+stacking samples one by one.
+
+:class:`MultiSeriesWindowDataset` trains on every station at once: all
+stations share one packed buffer plus an index of valid window starts, so
+hundreds of stations cost one array rather than one frame each.
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import Dataset, default_collate
+
+from ml_models import features
+
+
+def strided_windows(buffer: np.ndarray, window: int) -> np.ndarray:
+    """Return every window of ``window`` rows of ``buffer`` as a view.
+
+    ``buffer`` of shape ``(T, ...)`` gives ``(T - window + 1, window, ...)``
+    sharing memory with ``buffer``. The view must be treated as read-only.
+    """
+    n = max(buffer.shape[0] - window + 1, 0)
+    return np.lib.stride_tricks.as_strided(
+        buffer,
+        shape=(n, window) + buffer.shape[1:],
+        strides=(buffer.strides[0],) + buffer.strides,
+    )
+
+
+class SlidingWindowDataset(Dataset):
+    """Past/future windows over a single series.
+
+    Args:
+        values: ``(T,)`` univariate or ``(T, C)`` multivariate series. NaNs are
+            zeroed and reported through the observed mask.
+        past_length: Length of the past window (context plus any lags).
+        prediction_length: Length of the future window.
+        time_features: Optional ``(T, F)`` time features.
+        with_mask: Emit ``past_observed_mask``.
+    """
+
+    def __init__(self, values: np.ndarray, past_length: int, prediction_length: int,
+                 time_features: Optional[np.ndarray] = None, with_mask: bool = False):
+        values = np.asarray(values, dtype=np.float32)
+        self.past_length = past_length
+        self.prediction_length = prediction_length
+        window = past_length + prediction_length
+        # Time is the last axis of a univariate sample and the one before the
+        # channels of a multivariate sample
+        self._time_dim = -1 if values.ndim == 1 else -2
+
+        observed = ~np.isnan(values)
+        self.values = np.ascontiguousarray(np.where(observed, values, 0.0), dtype=np.float32)
+        self._windows = {'values': torch.from_numpy(strided_windows(self.values, window))}
+
+        if with_mask:
+            self.observed_mask = np.ascontiguousarray(observed, dtype=np.float32)
+            self._windows['mask'] = torch.from_numpy(strided_windows(self.observed_mask, window))
+        if time_features is not None:
+            self.time_features = np.ascontiguousarray(time_features, dtype=np.float32).reshape(len(values), -1)
+            self._windows['time'] = torch.from_numpy(strided_windows(self.time_features, window))
+
+    def __len__(self):
+        return self._windows['values'].shape[0]
+
+    def _split(self, window: torch.Tensor, dim: int):
+        p = self.past_length
+        return window.narrow(dim, 0, p), window.narrow(dim, p, self.prediction_length)
+
+    def _sample(self, idx):
+        windows = self._windows
+        past_values, future_values = self._split(windows['values'][idx], self._time_dim)
+        item = {'past_values': past_values, 'future_values': future_values}
+        if 'mask' in windows:
+            item['past_observed_mask'] = self._split(windows['mask'][idx], self._time_dim)[0]
+        if 'time' in windows:
+            item['past_time_features'], item['future_time_features'] = self._split(windows['time'][idx], -2)
+        return item
+
+    def __getitem__(self, idx):
+        # Views over the shared buffers, no copy
+        return self._sample(idx)
+
+    def __getitems__(self, indices):
+        # One gather per field for the whole batch
+        return self._sample(torch.as_tensor(indices, dtype=torch.long))
+
+
+def valid_starts(codes: np.ndarray, hours: np.ndarray, window: int) -> np.ndarray:
+    """Start rows of every window that stays inside one contiguous hourly run.
+
+    ``codes`` and ``hours`` are the station code and integer hour of each row
+    of a buffer sorted by station and time. A run breaks where the station
+    changes or an hour is missing, so no window crosses either.
+    """
+    n = len(codes)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    breaks = (codes[1:] != codes[:-1]) | (np.diff(hours) != 1)
+    run_start = np.concatenate([[0], np.flatnonzero(breaks) + 1])
+    run_end = np.append(run_start[1:], n)
+    counts = np.maximum(run_end - run_start - window + 1, 0)
+    # Expand each run into start, start + 1, ..., start + count - 1
+    first = np.repeat(run_start, counts)
+    step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return (first + step).astype(np.int64)
+
+
+def temporal_split(df: pd.DataFrame, frac: float = 0.8, by: str = 'station_id'):
+    """Split each station's rows at its own ``frac`` time quantile.
+
+    Returns ``(train, test)``; every station keeps its earliest rows for
+    training, whatever period it covers.
+    """
+    rank = df.groupby(by)['timestamp'].rank(method='first', pct=True)
+    return df[rank <= frac], df[rank > frac]
+
+
+class MultiSeriesWindowDataset(SlidingWindowDataset):
+    """Windows over every station, packed into one buffer.
+
+    Rows are floored to the hour, sorted by station and time and packed into
+    the shared buffers of :class:`SlidingWindowDataset`; ``offsets`` holds the
+    first row of each station and ``starts`` the start row of every valid
+    window. Values are normalized per station, and each sample carries the
+    station code as ``static_categorical_features``.
+
+    Args:
+        df: Long frame with ``station_id``, ``timestamp`` and ``column``.
+        column: Value column to window.
+        past_length: Length of the past window (context plus any lags).
+        prediction_length: Length of the future window.
+        stations: Station vocabulary (codes are positions in it). Defaults to
+            the sorted stations of ``df``; pass the training vocabulary when
+            building evaluation or inference datasets.
+        stats: Per-station ``normalization_stats``. Defaults to stats of ``df``.
+        channel_dim: Add a trailing channel axis to values.
+        time_features: Emit cyclic time features.
+        with_mask: Emit ``past_observed_mask``.
+        with_station: Emit ``static_categorical_features`` (models without
+            static features, such as PatchTST, reject the extra input).
+    """
+
+    def __init__(self, df: pd.DataFrame, column: str, past_length: int, prediction_length: int,
+                 stations: Optional[Sequence] = None, stats: Optional[pd.DataFrame] = None,
+                 channel_dim: bool = False, time_features: bool = False, with_mask: bool = False,
+                 with_station: bool = True):
+        df = df[['station_id', 'timestamp', column]].dropna(subset=[column])
+        df = df.assign(timestamp=pd.to_datetime(df['timestamp']).dt.floor('h'))
+        df = df.groupby(['station_id', 'timestamp'], as_index=False)[column].mean()
+
+        self.stations = list(stations) if stations is not None else sorted(df['station_id'].unique())
+        codes = pd.Categorical(df['station_id'], categories=self.stations).codes
+        df = df[codes >= 0].assign(code=codes[codes >= 0]).sort_values(['code', 'timestamp'])
+
+        self.stats = stats if stats is not None else features.normalization_stats(df, [column])
+        station_stats = self.stats.reindex(self.stations)
+        self.mean = station_stats[f'{column}_mean'].fillna(0.0).to_numpy(np.float32)
+        self.std = station_stats[f'{column}_std'].fillna(1.0).to_numpy(np.float32)
+
+        self.codes = df['code'].to_numpy(np.int64)
+        self.timestamps = df['timestamp'].to_numpy()
+        self.offsets = np.searchsorted(self.codes, np.arange(len(self.stations) + 1))
+        values = features.normalize(df[column].to_numpy(np.float32), self.mean[self.codes], self.std[self.codes])
+        super().__init__(
+            values[:, None] if channel_dim else values,
+            past_length,
+            prediction_length,
+            time_features=features.time_features(df['timestamp']).to_numpy() if time_features else None,
+            with_mask=with_mask,
+        )
+
+        hours = self.timestamps.astype('datetime64[h]').astype(np.int64)
+        self.starts = valid_starts(self.codes, hours, past_length + prediction_length)
+        self._static = torch.from_numpy(self.codes[:, None]) if with_station else None
+
+    @property
+    def cardinality(self) -> int:
+        return len(self.stations)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _station_sample(self, rows):
+        item = self._sample(rows)
+        if self._static is not None:
+            item['static_categorical_features'] = self._static[rows]
+        return item
+
+    def __getitem__(self, idx):
+        return self._station_sample(int(self.starts[idx]))
+
+    def __getitems__(self, indices):
+        return self._station_sample(torch.from_numpy(self.starts[np.asarray(indices)]))
+
+    def ending_after(self, cutoffs: dict) -> "MultiSeriesWindowDataset":
+        """Keep only windows ending after their station's cutoff timestamp.
+
+        ``cutoffs`` maps station -> timestamp; stations without one keep all
+        their windows. Filters in place and returns ``self``.
+        """
+        window = self.past_length + self.prediction_length
+        cut = np.array([np.datetime64(pd.Timestamp(cutoffs[s])) if s in cutoffs else np.datetime64('NaT')
+                        for s in self.stations], dtype='datetime64[ns]')
+        ends = self.timestamps[self.starts + window - 1]
+        # Comparisons with NaT are False, so stations without a cutoff keep everything
+        self.starts = self.starts[~(ends <= cut[self.codes[self.starts]])]
+        return self
+
+    def normalization(self) -> dict:
+        """Station vocabulary and per-station statistics, JSON serializable."""
+        return {
+            'stations': [str(s) for s in self.stations],
+            'mean': self.mean.tolist(),
+            'std': self.std.tolist(),
+        }
+
+    def denormalize(self, values: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Undo the per-station normalization of ``values`` (leading axis = sample)."""
+        shape = (-1,) + (1,) * (np.ndim(values) - 1)
+        return values * (self.std[codes].reshape(shape) + 1e-6) + self.mean[codes].reshape(shape)
+
+
+class WindowBatch(dict):
+    """A whole batch of windows (field -> batched tensor) yielded by an iterable dataset."""
+
+
+def collate_batch(data):
+    """Collate function for datasets that already return whole batches.
+
+    Map-style datasets hand over the dict built by ``__getitems__``; iterable
+    datasets yield :class:`WindowBatch` items, loaded one per batch
+    (``batch_size=1``).
+    """
+    if isinstance(data, dict):
+        return data
+    if len(data) == 1 and isinstance(data[0], WindowBatch):
+        return dict(data[0])
+    return default_collate(data)
@@ -1,105 +1,112 @@
 import pandas as pd
 import numpy as np
 import torch
-from torch.utils.data import Dataset, DataLoader
 from transformers import InformerConfig, InformerForPrediction, Trainer, TrainingArguments
 import mlflow
 import mlflow.transformers
 import os
+import sys
+import tempfile
+
+# Allow running as a script (python models/train_transformer.py) from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_models import features
+from ml_models import export, streaming, sweep
+from ml_models.streaming import StreamingWindowDataset
+from ml_models.windows import collate_batch
 
 # --- Configuration ---
 PREDICTION_LENGTH = 24  # Predict next 24 hours
 CONTEXT_LENGTH = 48     # Use past 48 hours
 BATCH_SIZE = 32
+NUM_WORKERS = 2       # Prefetching loader processes
 EPOCHS = 3
+LAGS_SEQUENCE = [1, 24]
+STATION_EMBEDDING_DIM = 4
+EXPERIMENT_NAME = "Informer_Weather_Forecast"
 
-class WeatherDataset(Dataset):
-    def __init__(self, df, context_length, prediction_length):
-        self.df = df
-        self.context_length = context_length
-        self.prediction_length = prediction_length
-        
-        # Ensure sorted
-        self.df = self.df.sort_values('timestamp')
-        self.data = self.df['temp_c'].values.astype(np.float32)
-        self.time_features = self.df['timestamp'].dt.hour.values.astype(np.float32)
-        
-        # Normalize
-        self.mean = np.mean(self.data)
-        self.std = np.std(self.data)
-        self.data = (self.data - self.mean) / self.std
+# Defaults for every parameter a sweep may override
+DEFAULT_PARAMS = {
+    "prediction_length": PREDICTION_LENGTH,
+    "context_length": CONTEXT_LENGTH,
+    "batch_size": BATCH_SIZE,
+    "epochs": EPOCHS,
+    "num_workers": NUM_WORKERS,
+    "learning_rate": 1e-4,
+    "d_model": 16,  # Small model for speed
+    "encoder_layers": 2,
+    "decoder_layers": 2,
+    "embedding_dim": STATION_EMBEDDING_DIM,
+}
 
-    def __len__(self):
-        return len(self.data) - self.context_length - self.prediction_length
+class WeatherDataset(StreamingWindowDataset):
+    """Per-station normalized temperature windows for Informer, all stations.
 
-    def __getitem__(self, idx):
-        # Past values
-        past_start = idx
-        past_end = idx + self.context_length
-        past_values = self.data[past_start:past_end]
-        past_time_features = self.time_features[past_start:past_end]
-        
-        # Future values (Target)
-        future_start = past_end
-        future_end = past_end + self.prediction_length
-        future_values = self.data[future_start:future_end]
-        future_time_features = self.time_features[future_start:future_end]
-        
-        # Informer expects:
-        # past_values: (seq_len, input_size)
-        # past_time_features: (seq_len, num_features)
-        # future_values: (pred_len, input_size)
-        # future_time_features: (pred_len, num_features)
-        
-        return {
-            "past_values": torch.tensor(past_values).unsqueeze(-1),
-            "past_time_features": torch.tensor(past_time_features).unsqueeze(-1),
-            "past_observed_mask": torch.ones_like(torch.tensor(past_values)).unsqueeze(-1),
-            "future_values": torch.tensor(future_values).unsqueeze(-1),
-            "future_time_features": torch.tensor(future_time_features).unsqueeze(-1),
-        }
+    Streamed from the station-partitioned store. Informer needs
+    ``context_length + max(lags_sequence)`` past values, the time features of
+    past and future steps, the past observed mask and the station code as a
+    static categorical feature.
+    """
+
+    def __init__(self, path, stats, context_length, prediction_length, lags_sequence=LAGS_SEQUENCE, **kwargs):
+        super().__init__(
+            path,
+            'temp_c',
+            context_length + max(lags_sequence),
+            prediction_length,
+            stats,
+            time_features=True,
+            with_mask=True,
+            **kwargs,
+        )
+
+def train_transformer(params=None, report=None, run_tags=None, experiment=EXPERIMENT_NAME, path=None):
+    """Train Informer on every station and return the final eval loss.
 
-def train_transformer():
+    ``params`` overrides :data:`DEFAULT_PARAMS`. ``report(step, eval_loss)`` is
+    called after every evaluation and stops training when it returns True
+    (sweep pruning). ``run_tags`` are set on the MLflow run, logged to
+    ``experiment``. ``path`` is a training store that is already up to date
+    (a sweep builds it once for all trials); by default the store is built or
+    refreshed from the CSV.
+    """
     print("Starting Transformer training...")
+    p = {**DEFAULT_PARAMS, **(params or {})}
     
-    # Load Data
-    data_path = "data/canonical.csv"
-    if not os.path.exists(data_path):
+    # Stream from the station-partitioned store (rebuilt when the CSV is newer)
+    data_path = path or streaming.ensure_store()
+    if data_path is None:
         print("Data not found.")
         return
-        
-    df = pd.read_csv(data_path)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
     
-    # Filter for one station for simplicity in this demo
-    station_id = df['station_id'].iloc[0]
-    print(f"Training on station: {station_id}")
-    df_station = df[df['station_id'] == station_id].dropna(subset=['temp_c'])
+    # Global model over every station, split in time within each station
+    stats = streaming.scan_stats(data_path, ['temp_c'])
+    # Datasets yield whole batches gathered from the strided windows
+    train_dataset = WeatherDataset(data_path, stats, p["context_length"], p["prediction_length"], span=(0.0, 0.8),
+                                   batch_size=p["batch_size"])
+    test_dataset = WeatherDataset(data_path, stats, p["context_length"], p["prediction_length"], span=(0.8, 1.0),
+                                  shuffle_buffer=0, batch_size=p["batch_size"])
     
-    if len(df_station) < (CONTEXT_LENGTH + PREDICTION_LENGTH + 10):
+    if train_dataset.approx_len() <= 0 or test_dataset.approx_len() <= 0:
         print("Not enough data.")
         return
-
-    # Split
-    split_idx = int(len(df_station) * 0.8)
-    train_df = df_station.iloc[:split_idx]
-    test_df = df_station.iloc[split_idx:]
-    
-    train_dataset = WeatherDataset(train_df, CONTEXT_LENGTH, PREDICTION_LENGTH)
-    test_dataset = WeatherDataset(test_df, CONTEXT_LENGTH, PREDICTION_LENGTH)
+    print(f"Training on {train_dataset.cardinality} stations "
+          f"(~{train_dataset.approx_len()} train samples, ~{test_dataset.approx_len()} test samples)")
     
     # Model Config
     config = InformerConfig(
-        prediction_length=PREDICTION_LENGTH,
-        context_length=CONTEXT_LENGTH,
+        prediction_length=p["prediction_length"],
+        context_length=p["context_length"],
         input_size=1,
-        num_time_features=1,
-        lags_sequence=[1, 24],
-        num_static_categorical_features=0,
+        num_time_features=len(features.TIME_FEATURES),
+        lags_sequence=LAGS_SEQUENCE,
+        num_static_categorical_features=1,
+        cardinality=[train_dataset.cardinality],
+        embedding_dimension=[p["embedding_dim"]],
         num_static_real_features=0,
-        encoder_layers=2,
-        decoder_layers=2,
-        d_model=16, # Small model for speed
+        encoder_layers=p["encoder_layers"],
+        decoder_layers=p["decoder_layers"],
+        d_model=p["d_model"],
     )
     
     model = InformerForPrediction(config)
@@ -108,11 +115,15 @@ def train_transformer():
     training_args = TrainingArguments(
         output_dir="out/informer_checkpoints",
         overwrite_output_dir=True,
-        learning_rate=1e-4,
-        num_train_epochs=EPOCHS,
-        per_device_train_batch_size=BATCH_SIZE,
-        per_device_eval_batch_size=BATCH_SIZE,
-        evaluation_strategy="epoch",
+        learning_rate=p["learning_rate"],
+        # Streamed datasets have no length: run `epochs` passes worth of steps
+        max_steps=p["epochs"] * max(1, train_dataset.approx_len() // p["batch_size"]),
+        dataloader_num_workers=p["num_workers"],
+        dataloader_prefetch_factor=2 if p["num_workers"] else None,
+        # One dataset batch per step (see the datasets above)
+        per_device_train_batch_size=1,
+        per_device_eval_batch_size=1,
+        eval_strategy="epoch",
         logging_strategy="epoch",
         save_strategy="no",
         remove_unused_columns=False, # Important for custom datasets
@@ -122,17 +133,39 @@ def train_transformer():
     # MLflow Autologging
     mlflow.transformers.autolog()
     
-    with mlflow.start_run(run_name="informer_weather_forecast"):
+    mlflow.set_experiment(experiment)
+    
+    with mlflow.start_run(run_name="informer_weather_forecast", tags=run_tags):
+        mlflow.log_params(p)
+        # Station vocabulary and per-station scaling needed to serve the model
+        mlflow.log_dict(train_dataset.normalization(), "normalization.json")
+        mlflow.log_dict(streaming.watermark(stats['last']), "watermark.json")
         trainer = Trainer(
             model=model,
             args=training_args,
             train_dataset=train_dataset,
             eval_dataset=test_dataset,
+            data_collator=collate_batch,  # datasets return whole batches
+            callbacks=[sweep.report_callback(report)] if report else None,
         )
         
         trainer.train()
+        metrics = trainer.evaluate()
+        
+        # Checkpoint (for fine-tuning) and CPU inference artifact (for serving)
+        with tempfile.TemporaryDirectory() as tmp:
+            model.save_pretrained(tmp)
+            mlflow.log_artifacts(tmp, "model")
+        if report is None:  # sweep trials are not served
+            export.log_inference_model(model, "informer", {
+                "context_length": p["context_length"],
+                "prediction_length": p["prediction_length"],
+                "past_length": train_dataset.past_length,
+                "normalization": train_dataset.normalization(),
+            })
         
         print("Training complete.")
+        return metrics["eval_loss"]
 
 if __name__ == "__main__":
     train_transformer()
@@ -0,0 +1,124 @@
+"""Chart series helpers.
+
+Pivots canonical records into one series per source and downsamples them for
+display. The pivoted matrices are cached per caller-provided key (filters,
+date range and data version), so reruns of the dashboard only pay for
+slicing and downsampling the visible window.
+"""
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Points per source sent to the browser; enough to keep the shape of a
+# month of hourly data without shipping every row.
+DEFAULT_TARGET_POINTS = 800
+
+# Number of pivoted matrices kept in memory (3 metrics x a few filter sets)
+CACHE_MAX_ENTRIES = 32
+
+_pivot_cache: "OrderedDict[Hashable, pd.DataFrame]" = OrderedDict()
+
+
+def pivot_series(df: pd.DataFrame, value_col: str, key: Optional[Hashable] = None) -> pd.DataFrame:
+    """Pivot ``value_col`` to a timestamp x source matrix (mean per cell).
+
+    When ``key`` is given the result is cached under ``(key, value_col)``; the
+    key must change whenever the data or the filters behind ``df`` change.
+    """
+    cache_key = (key, value_col)
+    if key is not None and cache_key in _pivot_cache:
+        _pivot_cache.move_to_end(cache_key)
+        return _pivot_cache[cache_key]
+
+    df_valid = df.dropna(subset=[value_col])
+    pivot = df_valid.pivot_table(index='timestamp', columns='source', values=value_col, aggfunc='mean')
+    pivot = pivot.sort_index()
+
+    if key is not None:
+        _pivot_cache[cache_key] = pivot
+        while len(_pivot_cache) > CACHE_MAX_ENTRIES:
+            _pivot_cache.popitem(last=False)
+    return pivot
+
+
+def clear_cache() -> None:
+    _pivot_cache.clear()
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets downsampling.
+
+    Returns the indices of the points to keep. The first and last points are
+    always kept; every bucket in between keeps the point forming the largest
+    triangle with the previously kept point and the mean of the next bucket,
+    which preserves peaks and troughs.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    prev = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[prev] - avg_x) * (y[start:end] - y[prev])
+            - (x[prev] - x[start:end]) * (avg_y - y[prev])
+        )
+        prev = start + int(np.argmax(area))
+        keep[i + 1] = prev
+    return keep
+
+
+def downsample(pivot: pd.DataFrame, target_points: int = DEFAULT_TARGET_POINTS) -> pd.DataFrame:
+    """Downsample each source of ``pivot`` with LTTB.
+
+    Returns a long frame with ``timestamp``, ``source`` and ``value`` columns.
+    Sources are downsampled independently so a sparse source does not leave
+    gaps in a dense one.
+    """
+    parts = []
+    for source in pivot.columns:
+        series = pivot[source].dropna()
+        if series.empty:
+            continue
+        x = series.index.values.astype('datetime64[ns]').astype(np.int64)
+        idx = lttb(x, series.values, target_points)
+        parts.append(pd.DataFrame({
+            'timestamp': series.index[idx],
+            'source': source,
+            'value': series.values[idx],
+        }))
+    if not parts:
+        return pd.DataFrame(columns=['timestamp', 'source', 'value'])
+    return pd.concat(parts, ignore_index=True)
+
+
+def chart_series(
+    df: pd.DataFrame,
+    value_col: str,
+    key: Optional[Hashable] = None,
+    start=None,
+    end=None,
+    target_points: int = DEFAULT_TARGET_POINTS,
+) -> pd.DataFrame:
+    """Return the display series of ``value_col`` between ``start`` and ``end``.
+
+    The full-resolution pivot is cached; only the requested window is
+    downsampled, so a shorter window keeps more of the original points.
+    """
+    pivot = pivot_series(df, value_col, key=key)
+    window = pivot.loc[start:end]
+    return downsample(window, target_points=target_points)
@@ -4,8 +4,8 @@ Small functions to drop duplicates, fill gaps and apply quality filters.
 """
 import pandas as pd
 
+from processing import tracking
 
-import mlflow
 
 def drop_duplicate_observations(df: pd.DataFrame) -> pd.DataFrame:
     # Ensure municipality is in columns before dropping, or ignore if not present
@@ -17,11 +17,12 @@ def drop_duplicate_observations(df: pd.DataFrame) -> pd.DataFrame:
     df_dedup = df.drop_duplicates(subset=subset)
     final_rows = len(df_dedup)
     
-    # Log to MLflow if there is an active run, or start a new one
-    if mlflow.active_run():
-        mlflow.log_metric("cleaning_initial_rows", initial_rows)
-        mlflow.log_metric("cleaning_final_rows", final_rows)
-        mlflow.log_metric("cleaning_dropped_rows", initial_rows - final_rows)
+    # Log to MLflow if there is an active run
+    tracking.log_metrics({
+        "cleaning_initial_rows": initial_rows,
+        "cleaning_final_rows": final_rows,
+        "cleaning_dropped_rows": initial_rows - final_rows,
+    })
     
     return df_dedup
 
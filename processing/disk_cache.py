@@ -0,0 +1,147 @@
+"""Content-addressed local disk cache for remote objects.
+
+Objects are fetched once through ``fsspec``, streamed straight to a
+temporary file in the cache directory and atomically renamed to a path
+derived from the SHA-256 of their URL (``<root>/ab/abcdef...``), so readers
+never see partial files and callers get a plain local path they can
+memory-map. Published objects are treated as immutable: a cached URL is
+served from disk without contacting the remote store again. The cache is
+bounded by ``max_bytes`` and evicts in least-recently-used order, using the
+file modification time as the access clock (refreshed on every hit), so
+the LRU order survives restarts and is shared by every process using the
+same directory. Locally built artifacts (rendered images, say) go through
+the same machinery with :meth:`DiskCache.get_or_build`.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from typing import Callable, Optional
+
+import fsspec
+
+# Default size budget of a cache directory
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Bytes per read while streaming an object to disk
+COPY_BUFFER = 1024 ** 2
+
+
+class DiskCache:
+    """Size-bounded LRU cache of remote objects on local disk.
+
+    Args:
+        root: Cache directory (created on demand).
+        max_bytes: Total size budget; least recently used files are evicted
+            after each download that exceeds it.
+        storage_options: Passed to ``fsspec.open`` (e.g. ``anon=True``).
+    """
+
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_BYTES, **storage_options):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.storage_options = storage_options
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.fetches = 0
+
+    def path_for(self, url: str) -> str:
+        """Local path of ``url``, whether or not it is cached."""
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.root, digest[:2], digest)
+
+    def cached(self, url: str) -> Optional[str]:
+        """Local path of ``url`` if it is cached, without fetching it."""
+        path = self.path_for(url)
+        return path if os.path.exists(path) else None
+
+    def get(self, url: str) -> str:
+        """Local path of ``url``, downloading it on first use."""
+        return self.get_or_build(url, lambda tmp: self._download(url, tmp))
+
+    def get_or_build(self, key: str, build: Callable[[str], None]) -> str:
+        """Local path of ``key``, calling ``build(path)`` to write it on first use.
+
+        ``build`` writes to a temporary path that is renamed into place only
+        if it succeeds.
+        """
+        path = self.path_for(key)
+        if self._touch(path):
+            self.hits += 1
+            return path
+        with self._key_lock(key):
+            # Another thread may have built it while we waited
+            if self._touch(path):
+                self.hits += 1
+                return path
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+            os.close(fd)
+            try:
+                build(tmp)
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            self.fetches += 1
+        self.evict(keep=path)
+        return path
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _download(self, url: str, path: str) -> None:
+        with fsspec.open(url, mode='rb', **self.storage_options) as src, open(path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER)
+
+    def entries(self):
+        """``(mtime, size, path)`` of every cached file, least recently used first."""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith('.part'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found.append((st.st_mtime, st.st_size, path))
+        return sorted(found)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Remove least recently used files until the budget holds; returns bytes freed."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, path in entries:
+            if total - freed <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                freed += size
+            except FileNotFoundError:
+                pass
+        return freed
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,125 @@
+"""Map layer helpers.
+
+Reduces canonical records to one record per station and builds the map
+layers for the dashboard. The payload sent to the browser scales with the
+number of stations, not with the number of rows: below a density threshold
+each source gets its own scatter layer (color by source, radius by value);
+above it stations are aggregated into hexagonal bins computed here.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# RGB colors per source
+SOURCE_COLORS = {
+    'siata': [255, 0, 0],        # Red
+    'meteoblue': [0, 0, 255],    # Blue
+    'meteosource': [0, 200, 0],  # Green
+}
+DEFAULT_COLOR = [128, 128, 128]
+
+# Above this many stations the map switches to hexbin aggregation
+HEXBIN_THRESHOLD = 500
+
+# Hexagon circumradius in degrees (~5.5 km at the equator)
+HEX_RADIUS_DEG = 0.05
+
+VALUE_COLUMNS = ['temp_c', 'precip_mm', 'wind_m_s']
+
+
+def station_snapshot(df: pd.DataFrame) -> pd.DataFrame:
+    """Return one row per station with its latest values.
+
+    Each value column carries the latest non-null observation of the station,
+    so a station reporting only precipitation in its last row still keeps its
+    last temperature.
+    """
+    df_valid = df.dropna(subset=['lat', 'lon'])
+    if df_valid.empty:
+        return pd.DataFrame(columns=['station_id', 'source', 'lat', 'lon', 'timestamp'] + VALUE_COLUMNS)
+
+    value_cols = [c for c in VALUE_COLUMNS if c in df_valid.columns]
+    snapshot = (
+        df_valid.sort_values('timestamp')
+        .groupby(['station_id', 'source'], sort=False)[['lat', 'lon', 'timestamp'] + value_cols]
+        .last()
+        .reset_index()
+    )
+    for c in ['lat', 'lon'] + value_cols:
+        snapshot[c] = pd.to_numeric(snapshot[c], errors='coerce')
+    return snapshot
+
+
+def hexbin(snapshot: pd.DataFrame, value_col: str, radius: float = HEX_RADIUS_DEG) -> pd.DataFrame:
+    """Aggregate stations into pointy-top hexagons of circumradius ``radius``.
+
+    Returns one row per non-empty hexagon with its center, station count, mean
+    of ``value_col`` and the hexagon ``polygon`` as ``[lon, lat]`` vertices.
+    """
+    x = snapshot['lon'].to_numpy(dtype=np.float64)
+    y = snapshot['lat'].to_numpy(dtype=np.float64)
+
+    # Fractional axial coordinates, then cube rounding to the nearest hexagon
+    q = (np.sqrt(3) / 3 * x - y / 3) / radius
+    r = (2 / 3 * y) / radius
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+
+    bins = pd.DataFrame({'q': rq.astype(np.int64), 'r': rr.astype(np.int64), 'value': snapshot[value_col].to_numpy()})
+    agg = bins.groupby(['q', 'r']).agg(count=('value', 'size'), value=('value', 'mean')).reset_index()
+
+    agg['lon'] = radius * np.sqrt(3) * (agg['q'] + agg['r'] / 2)
+    agg['lat'] = radius * 1.5 * agg['r']
+    angles = np.deg2rad(60 * np.arange(6) + 30)
+    corner_lon = agg['lon'].to_numpy()[:, None] + radius * np.cos(angles)[None, :]
+    corner_lat = agg['lat'].to_numpy()[:, None] + radius * np.sin(angles)[None, :]
+    agg['polygon'] = [np.stack([lo, la], axis=1).tolist() for lo, la in zip(corner_lon, corner_lat)]
+    return agg.drop(columns=['q', 'r'])
+
+
+def _scale(values: pd.Series, low: float, high: float) -> np.ndarray:
+    v = values.astype(float).to_numpy()
+    finite = np.isfinite(v)
+    if not finite.any():
+        return np.full(len(v), low)
+    vmin, vmax = np.nanmin(v), np.nanmax(v)
+    span = vmax - vmin if vmax > vmin else 1.0
+    return low + (np.where(finite, v, vmin) - vmin) / span * (high - low)
+
+
+def build_deck(snapshot: pd.DataFrame, value_col: str = 'temp_c', hexbin_threshold: int = HEXBIN_THRESHOLD,
+               radius: Optional[float] = None):
+    """Build a ``pydeck.Deck`` for ``snapshot`` (see :func:`station_snapshot`)."""
+    import pydeck as pdk
+
+    # Timestamps are not JSON serializable in the layer payload
+    snapshot = snapshot.assign(timestamp=snapshot['timestamp'].astype(str))
+    layers = []
+    if len(snapshot) > hexbin_threshold:
+        bins = hexbin(snapshot, value_col, radius=radius or HEX_RADIUS_DEG)
+        heat = _scale(bins['value'], 0, 255)
+        bins['color'] = [[int(h), 80, int(255 - h), 180] for h in heat]
+        layers.append(pdk.Layer(
+            'PolygonLayer', bins, get_polygon='polygon', get_fill_color='color',
+            get_line_color=[255, 255, 255, 80], pickable=True, stroked=True, filled=True,
+        ))
+        tooltip = {'text': f'{{count}} estaciones\n{value_col} medio: {{value}}'}
+    else:
+        sizes = _scale(snapshot[value_col], 300, 1500) if value_col in snapshot.columns else np.full(len(snapshot), 500)
+        snapshot = snapshot.assign(radius=sizes)
+        for source, df_source in snapshot.groupby('source'):
+            color = SOURCE_COLORS.get(source, DEFAULT_COLOR) + [200]
+            layers.append(pdk.Layer(
+                'ScatterplotLayer', df_source, id=f'stations-{source}', get_position=['lon', 'lat'],
+                get_radius='radius', get_fill_color=color, pickable=True,
+            ))
+        tooltip = {'text': f'{{station_id}} ({{source}})\n{value_col}: {{{value_col}}}'}
+
+    view = pdk.ViewState(latitude=float(snapshot['lat'].mean()), longitude=float(snapshot['lon'].mean()), zoom=9)
+    return pdk.Deck(layers=layers, initial_view_state=view, tooltip=tooltip, map_style=None)
@@ -0,0 +1,320 @@
+"""Regridding of polar radar sweeps onto fixed latitude/longitude grids.
+
+The position of every gate depends only on the radar site, the elevation
+and the ray/bin layout, none of which change between scans. So the
+gate -> grid mapping is computed once per geometry as a sparse matrix and
+cached on disk (``<cache_dir>/<key>.npz``); regridding a scan is then one
+sparse matrix product (plus one for the observed-gate weights, so missing
+gates do not bias the result).
+
+Each grid cell is the mean of the gates whose centres fall in it; cells
+that no gate centre reaches (far from the radar, where gates are wider than
+cells) take the nearest gate. Values are averaged as given (dBZ for
+reflectivity). Rays are placed on nominal azimuth slots first, so scans whose
+azimuths jitter by a fraction of a degree share one matrix.
+
+Grid bounds are multiples of the resolution, so grids of different radars
+with the same resolution are aligned cell for cell.
+"""
+import hashlib
+import math
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+GRID_CACHE_DIR = "data/cache/radar_grid"
+GRID_RESOLUTION = 0.01  # degrees, about 1.1 km
+EARTH_RADIUS = 6371000.0
+EFFECTIVE_RADIUS_FRACTION = 4.0 / 3.0
+KM_PER_DEG_LAT = 111.32
+
+
+@dataclass(frozen=True)
+class GridSpec:
+    """Regular latitude/longitude grid; cells are ``resolution`` degrees wide."""
+
+    lat_min: float
+    lat_max: float
+    lon_min: float
+    lon_max: float
+    resolution: float = GRID_RESOLUTION
+
+    @classmethod
+    def around(cls, lat: float, lon: float, range_km: float, resolution: float = GRID_RESOLUTION) -> "GridSpec":
+        """Smallest aligned grid covering ``range_km`` around a point."""
+        dlat = range_km / KM_PER_DEG_LAT
+        dlon = dlat / math.cos(math.radians(lat))
+        return cls(
+            math.floor((lat - dlat) / resolution) * resolution,
+            math.ceil((lat + dlat) / resolution) * resolution,
+            math.floor((lon - dlon) / resolution) * resolution,
+            math.ceil((lon + dlon) / resolution) * resolution,
+            resolution,
+        )
+
+    @classmethod
+    def covering(cls, grids) -> "GridSpec":
+        """Smallest grid containing every grid of ``grids`` (all of one resolution)."""
+        grids = list(grids)
+        return cls(min(g.lat_min for g in grids), max(g.lat_max for g in grids),
+                   min(g.lon_min for g in grids), max(g.lon_max for g in grids), grids[0].resolution)
+
+    def embed(self, values: np.ndarray, grid: "GridSpec") -> np.ndarray:
+        """``values`` of the aligned ``grid`` placed on this grid, NaN elsewhere."""
+        out = np.full(self.shape, np.nan, dtype=np.float32)
+        i0 = int(round((grid.lat_min - self.lat_min) / self.resolution))
+        j0 = int(round((grid.lon_min - self.lon_min) / self.resolution))
+        ny, nx = grid.shape
+        # Clip to the part of ``grid`` inside this one
+        si, sj = max(0, -i0), max(0, -j0)
+        ei, ej = min(ny, self.shape[0] - i0), min(nx, self.shape[1] - j0)
+        if si < ei and sj < ej:
+            out[i0 + si:i0 + ei, j0 + sj:j0 + ej] = values[si:ei, sj:ej]
+        return out
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (int(round((self.lat_max - self.lat_min) / self.resolution)),
+                int(round((self.lon_max - self.lon_min) / self.resolution)))
+
+    @property
+    def lats(self) -> np.ndarray:
+        """Cell centre latitudes, south to north."""
+        return self.lat_min + (np.arange(self.shape[0]) + 0.5) * self.resolution
+
+    @property
+    def lons(self) -> np.ndarray:
+        """Cell centre longitudes, west to east."""
+        return self.lon_min + (np.arange(self.shape[1]) + 0.5) * self.resolution
+
+    @property
+    def extent(self) -> Tuple[float, float, float, float]:
+        """``(lon_min, lon_max, lat_min, lat_max)``, as matplotlib and cartopy take it."""
+        return (self.lon_min, self.lon_max, self.lat_min, self.lat_max)
+
+    def cell_index(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Flat cell index of each point, -1 outside the grid."""
+        ny, nx = self.shape
+        i = np.floor((np.asarray(lat) - self.lat_min) / self.resolution).astype(np.int64)
+        j = np.floor((np.asarray(lon) - self.lon_min) / self.resolution).astype(np.int64)
+        inside = (i >= 0) & (i < ny) & (j >= 0) & (j < nx)
+        return np.where(inside, i * nx + j, -1)
+
+
+def ground_range(ranges: np.ndarray, elevation: float) -> np.ndarray:
+    """Distance along the ground of gates at slant ``ranges`` (4/3 earth model)."""
+    R = EARTH_RADIUS * EFFECTIVE_RADIUS_FRACTION
+    el = np.radians(elevation)
+    z = np.sqrt(ranges ** 2 + R ** 2 + 2 * ranges * R * np.sin(el)) - R
+    return R * np.arcsin(ranges * np.cos(el) / (R + z))
+
+
+def _slot_phase(azimuth: np.ndarray, res: float) -> float:
+    """Offset of the ray centres within a slot of ``res`` degrees, snapped to half slots.
+
+    The phase is a circular mean, so centres jittering across a slot edge
+    average to the edge instead of to the middle of the slot.
+    """
+    phase = np.angle(np.nanmean(np.exp(2j * np.pi * np.asarray(azimuth) / res))) * res / (2 * np.pi)
+    # Half-ray steps: rays are centred on whole or half slots
+    return float(np.mod(np.round(phase / (res / 2)) * (res / 2), res))
+
+
+@dataclass(frozen=True)
+class SweepGeometry:
+    """Everything gate positions depend on, rounded so repeat scans compare equal."""
+
+    lat: float
+    lon: float
+    elevation: float
+    n_rays: int
+    azimuth_offset: float
+    first_range: float
+    gate_length: float
+    n_bins: int
+
+    @classmethod
+    def from_sweep(cls, ds) -> "SweepGeometry":
+        """Geometry of an xradar sweep dataset."""
+        ranges = np.asarray(ds['range'].values, dtype=np.float64)
+        azimuth = np.asarray(ds['azimuth'].values, dtype=np.float64)
+        n_rays = len(azimuth)
+        res = 360.0 / n_rays
+        if 'sweep_fixed_angle' in ds:
+            elevation = float(ds['sweep_fixed_angle'].values)
+        else:
+            elevation = float(np.nanmedian(ds['elevation'].values))
+        return cls(
+            lat=round(float(ds['latitude'].values), 5),
+            lon=round(float(ds['longitude'].values), 5),
+            elevation=round(elevation, 1),
+            n_rays=n_rays,
+            azimuth_offset=_slot_phase(azimuth, res),
+            first_range=round(float(ranges[0]), 1),
+            gate_length=round(float(ranges[1] - ranges[0]) if len(ranges) > 1 else 1.0, 1),
+            n_bins=len(ranges),
+        )
+
+    @property
+    def ranges(self) -> np.ndarray:
+        return self.first_range + np.arange(self.n_bins) * self.gate_length
+
+    @property
+    def azimuths(self) -> np.ndarray:
+        """Nominal azimuth of each ray slot."""
+        return np.mod(self.azimuth_offset + np.arange(self.n_rays) * 360.0 / self.n_rays, 360.0)
+
+    @property
+    def max_range_km(self) -> float:
+        return float(self.ranges[-1] + self.gate_length / 2) / 1000.0
+
+    def ray_slots(self, azimuth: np.ndarray) -> np.ndarray:
+        """Nominal slot of each measured ray azimuth."""
+        res = 360.0 / self.n_rays
+        return np.mod(np.round((np.asarray(azimuth) - self.azimuth_offset) / res), self.n_rays).astype(np.int64)
+
+    def on_slots(self, values: np.ndarray, azimuth: Optional[np.ndarray] = None) -> np.ndarray:
+        """``(n_rays, n_bins)`` float32 array of ``values`` with rays on their nominal slots."""
+        values = np.asarray(values, dtype=np.float32)
+        if azimuth is None and values.shape == (self.n_rays, self.n_bins):
+            return values
+        out = np.full((self.n_rays, self.n_bins), np.nan, dtype=np.float32)
+        slots = self.ray_slots(azimuth) if azimuth is not None else np.arange(len(values))
+        out[slots, :min(self.n_bins, values.shape[1])] = values[:, :self.n_bins]
+        return out
+
+    def crs(self):
+        """Azimuthal equidistant projection centred on the radar."""
+        import pyproj
+
+        return pyproj.CRS.from_proj4(f"+proj=aeqd +lat_0={self.lat} +lon_0={self.lon} +datum=WGS84 +units=m")
+
+    def key(self, grid: GridSpec) -> str:
+        return hashlib.sha256(repr((self, grid)).encode()).hexdigest()[:32]
+
+
+def nearest_gates(geometry: SweepGeometry, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Flat ``ray_slot * n_bins + bin`` index of the gate nearest each point, -1 out of range."""
+    import pyproj
+
+    s = ground_range(geometry.ranges, geometry.elevation)
+    to_geo = pyproj.Transformer.from_crs(geometry.crs(), "EPSG:4326", always_xy=True)
+    x, y = to_geo.transform(np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64),
+                            direction=pyproj.enums.TransformDirection.INVERSE)
+    dist = np.hypot(x, y)
+    reach = (dist >= s[0] - geometry.gate_length / 2) & (dist <= s[-1] + geometry.gate_length / 2)
+    ray = geometry.ray_slots(np.degrees(np.arctan2(x, y)))
+    bin_ = np.clip(np.round(np.interp(dist, s, np.arange(geometry.n_bins))), 0, geometry.n_bins - 1).astype(np.int64)
+    return np.where(reach, ray * geometry.n_bins + bin_, -1)
+
+
+def build_matrix(geometry: SweepGeometry, grid: GridSpec):
+    """Row-normalized sparse ``(n_cells, n_rays * n_bins)`` regridding matrix."""
+    import pyproj
+    import scipy.sparse as sp
+
+    n_rays, n_bins = geometry.n_rays, geometry.n_bins
+    n_cells = grid.shape[0] * grid.shape[1]
+    s = ground_range(geometry.ranges, geometry.elevation)
+    az = np.radians(geometry.azimuths)
+    to_geo = pyproj.Transformer.from_crs(geometry.crs(), "EPSG:4326", always_xy=True)
+
+    # Gate centres -> the cell containing them
+    lon, lat = to_geo.transform(s[None, :] * np.sin(az)[:, None], s[None, :] * np.cos(az)[:, None])
+    cells = grid.cell_index(lat, lon).ravel()
+    gates = np.arange(n_rays * n_bins)
+    hit = cells >= 0
+    rows, cols = [cells[hit]], [gates[hit]]
+
+    # Cells no gate centre falls in -> nearest gate, within range
+    empty = np.setdiff1d(np.arange(n_cells), cells[hit])
+    nearest = nearest_gates(geometry, grid.lats[empty // grid.shape[1]], grid.lons[empty % grid.shape[1]])
+    reach = nearest >= 0
+    rows.append(empty[reach])
+    cols.append(nearest[reach])
+
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    matrix = sp.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n_cells, n_rays * n_bins))
+    counts = np.asarray(matrix.sum(axis=1)).ravel()
+    return sp.diags(np.where(counts > 0, 1.0 / np.maximum(counts, 1), 0.0).astype(np.float32)) @ matrix
+
+
+class Regridder:
+    """Sparse regridding of one sweep geometry onto one grid."""
+
+    def __init__(self, matrix, geometry: SweepGeometry, grid: GridSpec):
+        self.matrix = matrix.tocsr()
+        self.geometry = geometry
+        self.grid = grid
+
+    def polar(self, values: np.ndarray, azimuth: Optional[np.ndarray] = None) -> np.ndarray:
+        """``(n_rays, n_bins)`` float32 array with rays on their nominal slots."""
+        return self.geometry.on_slots(values, azimuth)
+
+    def regrid(self, values: np.ndarray, azimuth: Optional[np.ndarray] = None) -> np.ndarray:
+        """Grid ``(n_rays, n_bins)`` gate values; NaN where nothing was observed.
+
+        ``azimuth`` (one per ray) places rays on the nominal slots when the
+        scan's ray order or count differs from the geometry's.
+        """
+        flat = self.polar(values, azimuth).ravel()
+        observed = np.isfinite(flat)
+        total = self.matrix @ np.where(observed, flat, 0.0).astype(np.float32)
+        weight = self.matrix @ observed.astype(np.float32)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = np.where(weight > 0, total / weight, np.nan)
+        return out.reshape(self.grid.shape).astype(np.float32)
+
+    def to_dataarray(self, values: np.ndarray, azimuth: Optional[np.ndarray] = None, name: Optional[str] = None):
+        """:meth:`regrid` as an ``xarray.DataArray`` on ``(lat, lon)``."""
+        import xarray as xr
+
+        return xr.DataArray(self.regrid(values, azimuth), dims=('lat', 'lon'),
+                            coords={'lat': self.grid.lats, 'lon': self.grid.lons}, name=name)
+
+
+_regridders: Dict[str, Regridder] = {}
+_lock = threading.Lock()
+
+
+def get_regridder(geometry: SweepGeometry, grid: GridSpec, cache_dir: str = GRID_CACHE_DIR) -> Regridder:
+    """Regridder of ``geometry`` onto ``grid``, from memory, disk or built once."""
+    import scipy.sparse as sp
+
+    key = geometry.key(grid)
+    with _lock:
+        if key in _regridders:
+            return _regridders[key]
+    path = os.path.join(cache_dir, f"{key}.npz")
+    if os.path.exists(path):
+        matrix = sp.load_npz(path)
+    else:
+        matrix = build_matrix(geometry, grid)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix='.npz')
+        os.close(fd)
+        sp.save_npz(tmp, matrix)
+        os.replace(tmp, path)
+    regridder = Regridder(matrix, geometry, grid)
+    with _lock:
+        return _regridders.setdefault(key, regridder)
+
+
+def default_grid(geometry: SweepGeometry, resolution: float = GRID_RESOLUTION) -> GridSpec:
+    """Aligned grid covering the full range of a sweep."""
+    return GridSpec.around(geometry.lat, geometry.lon, geometry.max_range_km, resolution)
+
+
+def regrid_sweep(ds, moment: str = 'DBZH', grid: Optional[GridSpec] = None, cache_dir: str = GRID_CACHE_DIR):
+    """Grid ``moment`` of an xradar sweep dataset (lat/lon ``DataArray``).
+
+    ``grid`` defaults to the aligned grid covering the sweep's range.
+    """
+    geometry = SweepGeometry.from_sweep(ds)
+    grid = grid or default_grid(geometry)
+    values = ds[moment].transpose(..., 'range').values
+    return get_regridder(geometry, grid, cache_dir).to_dataarray(values, ds['azimuth'].values, name=moment)
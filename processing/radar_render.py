@@ -0,0 +1,220 @@
+"""Cached PNG rendering of gridded radar fields.
+
+A frame is composited from layers instead of drawn as a cartopy figure:
+
+* the field, colorized straight from the regular lat/lon grid of
+  :mod:`processing.radar_grid` (one colormap lookup, no reprojection);
+* the basemap (coastlines, borders, graticule), drawn with cartopy once per
+  grid extent and size and kept as a transparent PNG;
+* a colorbar per colormap and value range, drawn once with matplotlib;
+* a title line drawn with PIL.
+
+Published scans never change, so finished frames are stored in a
+:class:`processing.disk_cache.DiskCache` keyed by scan, moment, colormap
+and layout, and served from disk afterwards.
+"""
+import hashlib
+import io
+import os
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from processing.disk_cache import DiskCache
+from processing.radar_grid import GridSpec
+
+RENDER_CACHE_DIR = "data/cache/radar_render"
+RENDER_CACHE_MAX_BYTES = 512 * 1024 ** 2
+# Part of every cache key: bump when the frame layout changes
+RENDER_VERSION = 1
+
+SCALE = 2  # pixels per grid cell
+VMIN, VMAX = -10.0, 60.0
+UNITS = 'Reflectividad [dBZ]'
+TITLE_HEIGHT = 28
+COLORBAR_WIDTH = 90
+BACKGROUND = (255, 255, 255, 255)
+LAND = (245, 243, 238, 255)
+
+_layers: Dict[Tuple, "object"] = {}
+_layers_lock = threading.Lock()
+_render_cache: Optional[DiskCache] = None
+
+
+def default_cmap() -> str:
+    """ChaseSpectral when cmweather is installed (it registers it), else jet."""
+    try:
+        import cmweather  # noqa: F401
+        return "ChaseSpectral"
+    except ImportError:
+        return "jet"
+
+
+def get_render_cache() -> DiskCache:
+    """Process-wide cache of rendered frames."""
+    global _render_cache
+    with _layers_lock:
+        if _render_cache is None:
+            _render_cache = DiskCache(RENDER_CACHE_DIR, RENDER_CACHE_MAX_BYTES)
+        return _render_cache
+
+
+def colorize(values: np.ndarray, cmap: str, vmin: float = VMIN, vmax: float = VMAX) -> np.ndarray:
+    """RGBA ``uint8`` image of a south-to-north grid, north up, NaN transparent."""
+    import matplotlib
+
+    lut = (matplotlib.colormaps[cmap].resampled(256)(np.linspace(0, 1, 256)) * 255).astype(np.uint8)
+    values = np.flipud(np.asarray(values, dtype=np.float32))
+    finite = np.isfinite(values)
+    idx = np.clip((np.where(finite, values, vmin) - vmin) / (vmax - vmin) * 255, 0, 255).astype(np.uint8)
+    rgba = lut[idx]
+    rgba[~finite] = 0
+    return rgba
+
+
+def _memo(key: Tuple, build: Callable):
+    with _layers_lock:
+        if key in _layers:
+            return _layers[key]
+    layer = build()
+    with _layers_lock:
+        return _layers.setdefault(key, layer)
+
+
+def basemap(grid: GridSpec, scale: int = SCALE, cache_dir: str = RENDER_CACHE_DIR):
+    """Transparent coastlines/borders/graticule layer of ``grid`` (PIL image).
+
+    Drawn once per extent and size, then read from ``<cache_dir>/basemap``.
+    Layers whose data cannot be loaded (Natural Earth files need a first
+    download) are left out, and such a partial basemap is not stored.
+    """
+    return _memo(('basemap', grid, scale, cache_dir), lambda: _load_or_draw_basemap(grid, scale, cache_dir))
+
+
+def _load_or_draw_basemap(grid: GridSpec, scale: int, cache_dir: str):
+    from PIL import Image
+
+    key = hashlib.sha256(repr((grid, scale, RENDER_VERSION)).encode()).hexdigest()[:32]
+    path = os.path.join(cache_dir, "basemap", f"{key}.png")
+    if os.path.exists(path):
+        return Image.open(path).convert('RGBA')
+    png, complete = _draw_basemap(grid, scale)
+    if complete:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.part"
+        with open(tmp, 'wb') as f:
+            f.write(png)
+        os.replace(tmp, path)
+    return Image.open(io.BytesIO(png)).convert('RGBA')
+
+
+def _draw_basemap(grid: GridSpec, scale: int) -> Tuple[bytes, bool]:
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+
+    ny, nx = grid.shape
+    dpi = 100
+    fig = plt.figure(figsize=(nx * scale / dpi, ny * scale / dpi), dpi=dpi)
+    try:
+        ax = fig.add_axes([0, 0, 1, 1], projection=ccrs.PlateCarree())
+        ax.set_extent(grid.extent, crs=ccrs.PlateCarree())
+        ax.set_axis_off()
+        ax.patch.set_alpha(0)
+        fig.patch.set_alpha(0)
+        ax.gridlines(linestyle='--', alpha=0.5, linewidth=0.6)
+        complete = True
+        for feature, style in ((cfeature.COASTLINE, {'linewidth': 0.8}),
+                               (cfeature.BORDERS, {'linestyle': ':', 'linewidth': 0.8})):
+            artist = ax.add_feature(feature, edgecolor='black', **style)
+            try:
+                # Geometries load lazily on draw; fail here, not in savefig
+                next(iter(feature.intersecting_geometries(grid.extent)), None)
+            except Exception as e:
+                print(f"Basemap layer unavailable ({e}); drawing without it.")
+                artist.remove()
+                complete = False
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png', dpi=dpi, transparent=True)
+        return buf.getvalue(), complete
+    finally:
+        plt.close(fig)
+
+
+def colorbar(cmap: str, vmin: float, vmax: float, height: int, label: str = UNITS):
+    """Vertical colorbar image (PIL), drawn once per colormap, range and height."""
+    return _memo(('colorbar', cmap, vmin, vmax, height, label), lambda: _draw_colorbar(cmap, vmin, vmax, height, label))
+
+
+def _draw_colorbar(cmap: str, vmin: float, vmax: float, height: int, label: str):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from PIL import Image
+
+    dpi = 100
+    fig = plt.figure(figsize=(COLORBAR_WIDTH / dpi, height / dpi), dpi=dpi)
+    try:
+        ax = fig.add_axes([0.12, 0.05, 0.18, 0.9])
+        norm = matplotlib.colors.Normalize(vmin=vmin, vmax=vmax)
+        fig.colorbar(matplotlib.cm.ScalarMappable(norm=norm, cmap=cmap), cax=ax, label=label)
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png', dpi=dpi, facecolor='white')
+        return Image.open(buf).convert('RGBA')
+    finally:
+        plt.close(fig)
+
+
+def compose(values: np.ndarray, grid: GridSpec, title: str = "", cmap: Optional[str] = None,
+            vmin: float = VMIN, vmax: float = VMAX, scale: int = SCALE, with_basemap: bool = True,
+            with_colorbar: bool = True, cache_dir: str = RENDER_CACHE_DIR):
+    """Frame (PIL image) of a gridded field with title, basemap and colorbar."""
+    from PIL import Image, ImageDraw
+
+    cmap = cmap or default_cmap()
+    ny, nx = grid.shape
+    size = (nx * scale, ny * scale)
+    field = Image.fromarray(colorize(values, cmap, vmin, vmax), 'RGBA').resize(size, Image.NEAREST)
+    layer = Image.new('RGBA', size, LAND)
+    layer.alpha_composite(field)
+    if with_basemap:
+        layer.alpha_composite(basemap(grid, scale, cache_dir))
+
+    bar_width = COLORBAR_WIDTH if with_colorbar else 0
+    frame = Image.new('RGBA', (size[0] + bar_width, size[1] + TITLE_HEIGHT), BACKGROUND)
+    frame.alpha_composite(layer, (0, TITLE_HEIGHT))
+    if with_colorbar:
+        frame.alpha_composite(colorbar(cmap, vmin, vmax, size[1]), (size[0], TITLE_HEIGHT))
+    if title:
+        ImageDraw.Draw(frame).text((8, 6), title, fill=(0, 0, 0, 255))
+    return frame
+
+
+def to_png(image) -> bytes:
+    buf = io.BytesIO()
+    image.convert('RGB').save(buf, format='png', optimize=False)
+    return buf.getvalue()
+
+
+def render_key(scan: str, moment: str = 'DBZH', cmap: Optional[str] = None, vmin: float = VMIN,
+               vmax: float = VMAX, scale: int = SCALE, variant: str = 'full') -> str:
+    """Cache key of a rendered frame."""
+    return f"v{RENDER_VERSION}|{variant}|{scan}|{moment}|{cmap or default_cmap()}|{vmin}|{vmax}|{scale}"
+
+
+def cached_render(key: str, cache: Optional[DiskCache] = None) -> Optional[str]:
+    """Path of the frame rendered under ``key``, if any, without rendering it."""
+    return (cache or get_render_cache()).cached(key)
+
+
+def render(key: str, frame: Callable[[], "object"], cache: Optional[DiskCache] = None) -> str:
+    """Path of the PNG under ``key``; ``frame()`` builds the image on a miss."""
+
+    def build(path):
+        with open(path, 'wb') as f:
+            f.write(to_png(frame()))
+
+    return (cache or get_render_cache()).get_or_build(key, build)
@@ -0,0 +1,180 @@
+"""Process-wide cache of fetched time ranges.
+
+Stores contiguous, half-open ``[start, end)`` ranges of canonical records per
+key (typically ``(source, location)``). A query for a range that is already
+covered is answered by slicing; a query that overlaps cached data only fetches
+the missing edges. Sources that ignore the requested range (a forecast API
+that always returns its current horizon, a feed of the latest observations)
+are cached whole with :meth:`RangeCache.snapshot` instead, never clipped.
+Cached data is bounded by a memory budget and evicted in least-recently-used
+order.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Hashable, List, Tuple
+
+import pandas as pd
+
+# Default memory budget for all cached ranges
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Ranges that reach past the moment they were fetched may still receive new
+# data (latest observations, forecasts), so they expire after this many seconds.
+DEFAULT_LIVE_TTL_S = 300
+
+
+@dataclass
+class Segment:
+    start: pd.Timestamp
+    end: pd.Timestamp
+    df: pd.DataFrame
+    fetched_at: pd.Timestamp = field(default_factory=pd.Timestamp.now)
+    nbytes: int = 0
+
+    def __post_init__(self):
+        self.nbytes = int(self.df.memory_usage(deep=True).sum())
+
+
+class RangeCache:
+    """Thread-safe cache of contiguous time ranges with an LRU memory budget.
+
+    ``fetch(start, end)`` callables passed to :meth:`get` must return the
+    records of ``[start, end)`` with a ``timestamp`` column; rows outside the
+    requested range are dropped so cached ranges stay exact. Sources report
+    failures as empty frames, so empty results are returned but not cached.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, live_ttl_s: float = DEFAULT_LIVE_TTL_S):
+        self.max_bytes = max_bytes
+        self.live_ttl_s = live_ttl_s
+        self._lock = threading.Lock()
+        # (key, segment start) -> Segment, in least-recently-used order
+        self._segments: "OrderedDict[Tuple[Hashable, pd.Timestamp], Segment]" = OrderedDict()
+        self.hits = 0
+        self.fetches = 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(seg.nbytes for seg in self._segments.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._segments.clear()
+
+    def get(self, key: Hashable, start, end, fetch: Callable) -> pd.DataFrame:
+        """Return the records of ``key`` in ``[start, end)``, fetching only gaps."""
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+
+        with self._lock:
+            self._expire_live(key)
+            gaps = self._missing(key, start, end)
+            if not gaps:
+                self.hits += 1
+
+        # Fetch outside the lock so slow sources do not block other sessions
+        for gap_start, gap_end in gaps:
+            df = _clip(fetch(gap_start, gap_end), gap_start, gap_end)
+            self.fetches += 1
+            if df.empty:
+                continue
+            with self._lock:
+                self._insert(key, gap_start, gap_end, df)
+
+        with self._lock:
+            parts = []
+            for seg_key in self._overlapping(key, start, end):
+                self._segments.move_to_end(seg_key)
+                parts.append(_clip(self._segments[seg_key].df, start, end))
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+
+    def snapshot(self, key: Hashable, fetch: Callable) -> pd.DataFrame:
+        """Return everything ``fetch()`` returns for ``key``, cached whole.
+
+        For sources whose result does not depend on the requested range: the
+        snapshot is kept as one live range covering all time, so it expires
+        after ``live_ttl_s`` whatever dates are asked for.
+        """
+        seg_key = (key, pd.Timestamp.min)
+        with self._lock:
+            self._expire_live(key)
+            if seg_key in self._segments:
+                self.hits += 1
+                self._segments.move_to_end(seg_key)
+                return self._segments[seg_key].df.reset_index(drop=True)
+
+        # Fetch outside the lock so slow sources do not block other sessions
+        df = fetch()
+        self.fetches += 1
+        if df is None or df.empty:
+            return pd.DataFrame() if df is None else df
+        with self._lock:
+            self._segments[seg_key] = Segment(pd.Timestamp.min, pd.Timestamp.max, df)
+            self._evict(keep=seg_key)
+        return df.reset_index(drop=True)
+
+    def _overlapping(self, key, start, end, adjacent: bool = False) -> List[Tuple[Hashable, pd.Timestamp]]:
+        out = []
+        for (seg_owner, seg_start), seg in self._segments.items():
+            if seg_owner != key:
+                continue
+            if (seg.start <= end and seg.end >= start) if adjacent else (seg.start < end and seg.end > start):
+                out.append((seg_owner, seg_start))
+        return sorted(out, key=lambda k: k[1])
+
+    def _missing(self, key, start, end) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        gaps = []
+        cursor = start
+        for seg_key in self._overlapping(key, start, end):
+            seg = self._segments[seg_key]
+            if seg.start > cursor:
+                gaps.append((cursor, seg.start))
+            cursor = max(cursor, seg.end)
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def _insert(self, key, start, end, df: pd.DataFrame) -> None:
+        # Merge with overlapping or adjacent segments into one contiguous range.
+        # Existing data wins where ranges overlap (another session may have
+        # filled part of the gap meanwhile).
+        merged_start, merged_end = start, end
+        parts = []
+        fetched_at = pd.Timestamp.now()
+        for seg_key in self._overlapping(key, start, end, adjacent=True):
+            seg = self._segments.pop(seg_key)
+            df = df[(df['timestamp'] < seg.start) | (df['timestamp'] >= seg.end)]
+            parts.append(seg.df)
+            merged_start, merged_end = min(merged_start, seg.start), max(merged_end, seg.end)
+            fetched_at = min(fetched_at, seg.fetched_at)
+        parts.append(df)
+        merged = pd.concat([p for p in parts if len(p)], ignore_index=True)
+        merged = merged.sort_values('timestamp', kind='stable', ignore_index=True)
+
+        self._segments[(key, merged_start)] = Segment(merged_start, merged_end, merged, fetched_at)
+        self._evict(keep=(key, merged_start))
+
+    def _expire_live(self, key) -> None:
+        now = pd.Timestamp.now()
+        for seg_key in self._overlapping(key, pd.Timestamp.min, pd.Timestamp.max):
+            seg = self._segments[seg_key]
+            if seg.end > seg.fetched_at and (now - seg.fetched_at).total_seconds() > self.live_ttl_s:
+                del self._segments[seg_key]
+
+    def _evict(self, keep) -> None:
+        total = self.nbytes
+        for seg_key in list(self._segments):
+            if total <= self.max_bytes:
+                break
+            if seg_key == keep:
+                continue
+            total -= self._segments.pop(seg_key).nbytes
+
+
+def _clip(df: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    if df is None or df.empty or 'timestamp' not in df.columns:
+        return df if df is not None else pd.DataFrame()
+    ts = pd.to_datetime(df['timestamp'], errors='coerce')
+    return df[(ts >= start) & (ts < end)]
@@ -1,9 +1,12 @@
 """Storage helpers for processed data.
 
 This module contains small functions to persist data locally as CSV or to
-push to object storage. Starts with CSV persistence only.
+push to object storage. The canonical store is also kept as Parquet so it can
+be queried page by page and exported without loading it whole, and as a
+station-partitioned Parquet dataset that the trainers stream from.
 """
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
 import pandas as pd
 
 
@@ -19,3 +22,209 @@ def append_csv(df: pd.DataFrame, path: str, index: bool = False) -> None:
         existing = pd.read_csv(p)
         df = pd.concat([existing, df], ignore_index=True)
     save_csv(df, path, index=index)
+
+
+def save_parquet(df: pd.DataFrame, path: str) -> None:
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(p, index=False)
+
+
+def canonical_store_path(version: str, root: str = 'data/out') -> str:
+    """Parquet store of the canonical record with content hash ``version``.
+
+    Each loaded dataset gets its own file, so sessions that loaded different
+    data never read each other's store.
+    """
+    return str(Path(root) / f"canonical-{version}.parquet")
+
+
+def prune_canonical_stores(root: str = 'data/out', keep: int = 8) -> None:
+    """Delete all but the ``keep`` most recently written canonical stores."""
+    stores = sorted(Path(root).glob('canonical-*.parquet'), key=lambda p: p.stat().st_mtime, reverse=True)
+    for p in stores[keep:]:
+        p.unlink(missing_ok=True)
+
+
+# Arrow types of the canonical columns, fixed so streamed CSV blocks agree
+CANONICAL_ARROW_TYPES = {
+    'timestamp': 'timestamp[ns]',
+    'lat': 'float64',
+    'lon': 'float64',
+    'temp_c': 'float64',
+    'precip_mm': 'float64',
+    'wind_m_s': 'float64',
+    'source': 'string',
+    'station_id': 'string',
+}
+
+
+def partitioning(by: str = 'station_id'):
+    """Hive partitioning on a string ``by`` column (``<by>=<value>`` folders)."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(pa.schema([(by, pa.string())]), flavor='hive')
+
+
+def save_partitioned(df: pd.DataFrame, path: str, by: str = 'station_id') -> None:
+    """Write ``df`` as a Parquet dataset with one folder per ``by`` value.
+
+    Rows are sorted by time inside each partition, which the streaming
+    readers rely on.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    df = df.assign(**{by: df[by].astype(str)}).sort_values([by, 'timestamp'])
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(table, path, format='parquet', partitioning=partitioning(by),
+                     existing_data_behavior='delete_matching')
+
+
+def csv_to_partitioned(csv_path: str, path: str, by: str = 'station_id', block_size: int = 1 << 24) -> int:
+    """Convert a canonical CSV to a partitioned dataset without loading it whole.
+
+    The CSV is read block by block straight into the dataset writer; each
+    partition is then sorted by time, one partition in memory at a time.
+    Returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.dataset as ds
+
+    header = pd.read_csv(csv_path, nrows=0).columns
+    column_types = {c: pa.type_for_alias(t) for c, t in CANONICAL_ARROW_TYPES.items() if c in header}
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(column_types=column_types),
+    )
+    rows = 0
+
+    def batches():
+        nonlocal rows
+        for batch in reader:
+            rows += batch.num_rows
+            yield batch
+
+    ds.write_dataset(batches(), path, schema=reader.schema, format='parquet',
+                     partitioning=partitioning(by), existing_data_behavior='delete_matching')
+
+    # Sort each partition by time
+    for folder in sorted(Path(path).glob(f'{by}=*')):
+        files = sorted(folder.glob('*.parquet'))
+        table = ds.dataset(files, format='parquet').to_table()
+        table = table.sort_by('timestamp')
+        for f in files:
+            f.unlink()
+        ds.write_dataset(table, folder, format='parquet', basename_template='part-{i}.parquet')
+    return rows
+
+
+def _store_filter(filters: Optional[Dict[str, Iterable]] = None, start=None, end=None):
+    """Build a pyarrow filter from column -> allowed values and a time range."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    expr = None
+    for column, values in (filters or {}).items():
+        if values:
+            cond = ds.field(column).isin(list(values))
+            expr = cond if expr is None else expr & cond
+    if start is not None:
+        cond = ds.field('timestamp') >= pa.scalar(pd.Timestamp(start), pa.timestamp('ns'))
+        expr = cond if expr is None else expr & cond
+    if end is not None:
+        cond = ds.field('timestamp') < pa.scalar(pd.Timestamp(end), pa.timestamp('ns'))
+        expr = cond if expr is None else expr & cond
+    return expr
+
+
+def query_page(
+    path: str,
+    columns: Optional[List[str]] = None,
+    filters: Optional[Dict[str, Iterable]] = None,
+    sort_by: Optional[str] = None,
+    ascending: bool = True,
+    page: int = 0,
+    page_size: int = 100,
+    start=None,
+    end=None,
+) -> Tuple[pd.DataFrame, int]:
+    """Read one page of the Parquet store at ``path``.
+
+    Filtering, sorting and column projection run in Arrow; only the rows of
+    the requested page are converted to pandas. Returns ``(page_df, total)``
+    where ``total`` is the number of rows matching the filters.
+    """
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format='parquet')
+    columns = columns or dataset.schema.names
+    read_cols = columns if sort_by is None or sort_by in columns else columns + [sort_by]
+    table = dataset.to_table(columns=read_cols, filter=_store_filter(filters, start, end))
+
+    total = table.num_rows
+    offset = max(page, 0) * page_size
+    if sort_by is not None:
+        order = 'ascending' if ascending else 'descending'
+        indices = pc.sort_indices(table[sort_by], sort_keys=[(sort_by, order)])
+        table = table.take(indices[offset:offset + page_size])
+    else:
+        table = table.slice(offset, page_size)
+    return table.select(columns).to_pandas(), total
+
+
+def export_stream(
+    path: str,
+    sink,
+    fmt: str = 'csv',
+    columns: Optional[List[str]] = None,
+    filters: Optional[Dict[str, Iterable]] = None,
+    start=None,
+    end=None,
+    batch_size: int = 65536,
+) -> int:
+    """Write the filtered store at ``path`` to ``sink`` batch by batch.
+
+    ``sink`` is a path or binary file object and ``fmt`` is ``'csv'`` or
+    ``'parquet'``. Only one record batch is held in memory at a time. Returns
+    the number of rows written.
+    """
+    import pyarrow.csv as pa_csv
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    dataset = ds.dataset(path, format='parquet')
+    scanner = dataset.scanner(columns=columns, filter=_store_filter(filters, start, end), batch_size=batch_size)
+    if fmt == 'csv':
+        writer = pa_csv.CSVWriter(sink, scanner.projected_schema)
+    elif fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, scanner.projected_schema)
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    rows = 0
+    with writer:
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    return rows
+
+
+def export_bytes(path: str, fmt: str = 'csv', **kwargs) -> bytes:
+    """Filtered store at ``path`` as ``fmt`` bytes, e.g. for a download button.
+
+    The export is streamed through a temporary file (closed on return), so
+    only the finished file and one record batch are in memory at once.
+    ``kwargs`` are passed to :func:`export_stream`.
+    """
+    import tempfile
+
+    with tempfile.TemporaryFile() as spool:
+        export_stream(path, spool, fmt=fmt, **kwargs)
+        spool.seek(0)
+        return spool.read()
@@ -0,0 +1,23 @@
+"""MLflow tracking helpers.
+
+Pipeline steps only log metrics when they run inside an active MLflow run.
+Importing ``mlflow`` costs about a second, so these helpers never import it:
+if nothing has imported ``mlflow`` yet, there cannot be an active run either.
+"""
+import sys
+from typing import Dict
+
+
+def active_mlflow():
+    """Return the ``mlflow`` module if a run is active, otherwise ``None``."""
+    mlflow = sys.modules.get("mlflow")
+    if mlflow is None or not mlflow.active_run():
+        return None
+    return mlflow
+
+
+def log_metrics(metrics: Dict[str, float]) -> None:
+    """Log ``metrics`` in a single call to the active run, if any."""
+    mlflow = active_mlflow()
+    if mlflow is not None:
+        mlflow.log_metrics(metrics)
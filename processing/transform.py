@@ -5,8 +5,7 @@ pipeline.
 """
 import pandas as pd
 
-
-import mlflow
+from processing import tracking
 
 CANONICAL_COLS = ["timestamp", "lat", "lon", "temp_c", "precip_mm", "wind_m_s", "source", "station_id"]
 
@@ -28,7 +27,12 @@ def to_canonical(df: pd.DataFrame) -> pd.DataFrame:
         out['timestamp'] = pd.to_datetime(out['timestamp'], errors='coerce')
     
     # Log to MLflow
-    if mlflow.active_run():
-        mlflow.log_metric("transform_output_rows", len(out))
+    tracking.log_metrics({"transform_output_rows": len(out)})
         
     return out
+
+
+def data_version(df: pd.DataFrame) -> str:
+    """Return a content hash of ``df`` to key caches of derived data."""
+    hashed = pd.util.hash_pandas_object(df, index=False)
+    return f"{len(df)}-{int(hashed.sum()) & 0xFFFFFFFFFFFFFFFF:016x}"
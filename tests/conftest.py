@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def make_radar_tree(lat=4.567, lon=-71.333, time='2022-08-09T00:00:04', n_rays=360, n_bins=400,
+                    gate_m=250.0, sweeps=(0.5,), seed=0):
+    """Synthetic IRIS-like volume as xradar reads it (not georeferenced)."""
+    xr = pytest.importorskip("xarray")
+    rng = np.random.default_rng(seed)
+    azimuth = np.arange(n_rays) * 360.0 / n_rays + 180.0 / n_rays
+    ranges = (np.arange(n_bins) + 0.5) * gate_m
+    start = np.datetime64(pd.Timestamp(time), 'ms')
+    # Like xradar, the site is a coordinate of the root that sweeps inherit
+    groups = {'/': xr.Dataset({'time_coverage_start': str(time)},
+                              coords={'latitude': lat, 'longitude': lon, 'altitude': 200.0})}
+    for i, angle in enumerate(sweeps):
+        moments = {name: (('azimuth', 'range'), rng.uniform(low, high, (n_rays, n_bins)).astype('float32'))
+                   for name, low, high in (('DBZH', -10, 60), ('VRADH', -20, 20), ('RHOHV', 0, 1))}
+        groups[f'/sweep_{i}'] = xr.Dataset(
+            {**moments, 'sweep_mode': 'azimuth_surveillance', 'sweep_fixed_angle': angle},
+            coords={
+                'azimuth': azimuth, 'range': ranges,
+                'elevation': ('azimuth', np.full(n_rays, angle)),
+                'time': ('azimuth', start + np.arange(n_rays).astype('timedelta64[ms]') * 20),
+            },
+        )
+    return xr.DataTree.from_dict(groups)
+
+
+@pytest.fixture
+def radar_tree():
+    return make_radar_tree
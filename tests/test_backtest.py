@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from ml_models import backtest
+
+
+def make_df(days=12):
+    ts = pd.date_range('2024-01-01', periods=days * 24, freq='h')
+    return pd.concat([
+        pd.DataFrame({'timestamp': ts, 'station_id': s, 'temp_c': np.arange(len(ts)) * slope,
+                      'wind_m_s': 1.0, 'precip_mm': 0.0})
+        for s, slope in (('A', 0.5), ('B', 1.0))
+    ], ignore_index=True)
+
+
+def test_folds_never_train_on_the_future():
+    df = make_df()
+    folds = backtest.rolling_origins(df, n_folds=3, step_hours=24, horizons=6)
+    assert len(folds) == 3
+    last = df['timestamp'].max()
+    assert (folds[-1] == last - pd.Timedelta(hours=6)).all()
+    for origins in folds:
+        train, actuals = backtest.split_fold(df, origins, horizons=6)
+        assert (train.groupby('station_id')['timestamp'].max() <= origins).all()
+        assert (actuals.groupby('station_id')['valid_time'].min() > origins).all()
+        assert len(actuals) == 2 * 6
+
+
+def test_persistence_errors_grow_with_horizon():
+    # Persistence on a linear trend is off by slope * horizon
+    metrics = backtest.backtest(make_df(), {'persistence': backtest.persistence},
+                                n_folds=2, horizons=3, max_workers=0)
+    m = metrics.loc['persistence']
+    np.testing.assert_allclose(m['mae'], [0.75, 1.5, 2.25])
+    assert m['n'].tolist() == [4, 4, 4]
+
+
+def test_process_pool_matches_in_process():
+    kwargs = dict(n_folds=2, horizons=3)
+    serial = backtest.backtest(make_df(), {'persistence': backtest.persistence}, max_workers=0, **kwargs)
+    parallel = backtest.backtest(make_df(), {'persistence': backtest.persistence}, max_workers=2, **kwargs)
+    pd.testing.assert_frame_equal(serial, parallel)
+
+
+def test_folds_share_one_origin_across_stations():
+    # C stops reporting two days early and starts late: its own last
+    # timestamp must not set an origin earlier than the others'
+    df = make_df()
+    c = df[df['station_id'] == 'B'].assign(station_id='C')
+    df = pd.concat([df, c[(c['timestamp'] >= '2024-01-04') & (c['timestamp'] < '2024-01-11')]], ignore_index=True)
+    folds = backtest.rolling_origins(df, n_folds=3, step_hours=24, horizons=6)
+    last = df['timestamp'].max()
+    for k, origins in enumerate(folds):
+        assert origins.nunique() == 1
+        assert origins.iloc[0] == last - pd.Timedelta(hours=6 + (2 - k) * 24)
+        train, _ = backtest.split_fold(df, origins, horizons=6)
+        assert train['timestamp'].max() <= origins.iloc[0]
+    # C has a week of history only before the last two origins
+    assert ['C' in origins.index for origins in folds] == [False, True, True]
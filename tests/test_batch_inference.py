@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pandas as pd
+from ml_models import batch_inference
+
+
+class PlusOne:
+    """Toy t+1 model: next temperature is the current one plus one."""
+    def predict(self, X):
+        return X['temp_c'].to_numpy() + 1
+
+
+def make_df():
+    ts = pd.date_range('2023-01-01', periods=3, freq='h')
+    return pd.DataFrame({
+        'timestamp': list(ts) * 2,
+        'station_id': ['A'] * 3 + ['B'] * 3,
+        'temp_c': [10.0, 11.0, 12.0, 20.0, 21.0, np.nan],
+        'wind_m_s': 1.0,
+        'precip_mm': 0.0,
+    })
+
+
+def test_forecast_table_runs_all_horizons_per_station():
+    forecasts = batch_inference.forecast_table(make_df(), {'toy': batch_inference.regression_forecaster(PlusOne())}, horizons=3)
+    assert list(forecasts.columns) == batch_inference.FORECAST_COLS
+    a = forecasts[forecasts['station_id'] == 'A']
+    assert a['value'].tolist() == [13.0, 14.0, 15.0]
+    assert a['valid_time'].tolist() == list(pd.date_range('2023-01-01 03:00', periods=3, freq='h'))
+    assert (a['issue_time'] == pd.Timestamp('2023-01-01 02:00')).all()
+
+
+def test_stations_without_temperature_are_not_forecast():
+    gauge = make_df().assign(station_id='G (SIATA)', temp_c=np.nan, precip_mm=1.0)
+    forecasts = batch_inference.forecast_table(pd.concat([make_df(), gauge], ignore_index=True),
+                                               {'toy': batch_inference.regression_forecaster(PlusOne())}, horizons=2)
+    assert sorted(forecasts['station_id'].unique()) == ['A', 'B']
+    assert forecasts[forecasts['station_id'] == 'A']['value'].tolist() == [13.0, 14.0]
+    assert batch_inference.forecast_table(gauge, {'toy': batch_inference.regression_forecaster(PlusOne())}).empty
+
+
+def test_write_forecasts_replaces_reissued_forecasts(tmp_path):
+    path = str(tmp_path / 'forecasts')
+    forecaster = {'toy': batch_inference.regression_forecaster(PlusOne())}
+    forecasts = batch_inference.forecast_table(make_df(), forecaster, horizons=2)
+    batch_inference.write_forecasts(forecasts, path)
+    batch_inference.write_forecasts(forecasts.assign(value=forecasts['value'] + 1), path)
+    stored = batch_inference.read_forecasts(path)
+    assert len(stored) == 4
+    assert stored['value'].tolist() == (forecasts['value'] + 1).tolist()
+
+    newer = make_df()
+    newer['timestamp'] += pd.Timedelta(hours=1)
+    batch_inference.write_forecasts(batch_inference.forecast_table(newer, forecaster, horizons=2), path)
+    latest = batch_inference.read_latest_forecasts(path, station_ids=['A'])
+    assert len(latest) == 2
+    assert (latest['issue_time'] == pd.Timestamp('2023-01-01 03:00')).all()
+
+
+def test_write_forecasts_prunes_expired_issues(tmp_path):
+    path = str(tmp_path / 'forecasts')
+    forecaster = {'toy': batch_inference.regression_forecaster(PlusOne())}
+    old = batch_inference.write_forecasts(batch_inference.forecast_table(make_df(), forecaster, horizons=2), path)
+    later = make_df()
+    later['timestamp'] += pd.Timedelta(days=8)
+    new = batch_inference.write_forecasts(batch_inference.forecast_table(later, forecaster, horizons=2), path)
+    assert batch_inference.forecast_files(path) == [new]
+    assert old != new
+    assert sorted(os.listdir(path)) == [os.path.basename(new)]
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from processing import chart_series
+
+
+def make_df(n=1000):
+    ts = pd.date_range('2023-01-01', periods=n, freq='h')
+    temp = np.sin(np.arange(n) / 10.0)
+    temp[500] = 50.0  # spike that must survive downsampling
+    return pd.DataFrame({
+        'timestamp': list(ts) * 2,
+        'source': ['siata'] * n + ['meteoblue'] * n,
+        'temp_c': np.concatenate([temp, temp + 1]),
+    })
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    y = np.zeros(1000)
+    y[321] = 10.0
+    idx = chart_series.lttb(np.arange(1000), y, 50)
+    assert len(idx) == 50
+    assert idx[0] == 0 and idx[-1] == 999
+    assert 321 in idx
+
+
+def test_chart_series_downsamples_per_source():
+    chart_series.clear_cache()
+    result = chart_series.chart_series(make_df(), 'temp_c', key='v1', target_points=100)
+    assert set(result['source']) == {'siata', 'meteoblue'}
+    assert (result.groupby('source').size() == 100).all()
+    assert result['value'].max() == 51.0
+
+
+def test_shorter_window_keeps_full_resolution():
+    chart_series.clear_cache()
+    df = make_df()
+    result = chart_series.chart_series(df, 'temp_c', key='v1', start='2023-01-02', end='2023-01-03', target_points=100)
+    # Two days of hourly points per source fit under the target, nothing is dropped
+    assert (result.groupby('source').size() == 48).all()
+    # The pivot is cached and reused for the same key
+    assert chart_series.pivot_series(df.iloc[:0], 'temp_c', key='v1').shape[0] == 1000
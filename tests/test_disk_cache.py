@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from processing.disk_cache import DiskCache
+
+
+def write(path, size):
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size))
+    return f"file://{path}"
+
+
+def test_objects_are_fetched_once_and_served_from_disk(tmp_path):
+    url = write(tmp_path / 'scan.RAW', 1000)
+    cache = DiskCache(str(tmp_path / 'cache'))
+    first = cache.get(url)
+    os.remove(tmp_path / 'scan.RAW')  # the remote is never read again
+    assert cache.get(url) == first
+    assert (cache.fetches, cache.hits) == (1, 1)
+    assert os.path.getsize(first) == 1000
+    assert not [p for _, _, p in cache.entries() if p.endswith('.part')]
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    urls = [write(tmp_path / f'scan{i}.RAW', 1000) for i in range(3)]
+    cache = DiskCache(str(tmp_path / 'cache'), max_bytes=2500)
+    a = cache.get(urls[0])
+    b = cache.get(urls[1])
+    os.utime(a, (0, 0))  # a is the least recently used
+    os.utime(b, (1, 1))
+    cache.get(urls[2])
+    assert cache.cached(urls[0]) is None
+    assert cache.cached(urls[1]) and cache.cached(urls[2])
+    assert cache.nbytes == 2000
+
+
+def test_built_artifacts_are_cached_and_failed_builds_leave_nothing(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache'))
+
+    def build(path):
+        with open(path, 'wb') as f:
+            f.write(b'frame')
+
+    def fail(path):
+        with open(path, 'wb') as f:
+            f.write(b'partial')
+        raise RuntimeError('boom')
+
+    path = cache.get_or_build('scan|DBZH', build)
+    assert cache.get_or_build('scan|DBZH', fail) == path  # hit: fail is never called
+    assert open(path, 'rb').read() == b'frame'
+    with pytest.raises(RuntimeError):
+        cache.get_or_build('other', fail)
+    assert cache.cached('other') is None
+    leftovers = [name for _, _, names in os.walk(cache.root) for name in names]
+    assert leftovers == [os.path.basename(path)]
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+from ml_models import features
+
+
+def make_df():
+    # Station A has a gap at 02:00; station B is complete
+    ts_a = pd.to_datetime(['2023-01-01 00:00', '2023-01-01 01:00', '2023-01-01 03:00'])
+    ts_b = pd.date_range('2023-01-01', periods=4, freq='h')
+    return pd.DataFrame({
+        'timestamp': list(ts_a) + list(ts_b),
+        'station_id': ['A'] * 3 + ['B'] * 4,
+        'temp_c': [10.0, 11.0, 13.0, 20.0, 21.0, 22.0, 23.0],
+        'wind_m_s': 1.0,
+        'precip_mm': 0.0,
+    })
+
+
+def test_lags_and_targets_are_time_aware():
+    out = features.build_features(make_df(), cache=False).set_index(['station_id', 'timestamp'])
+    # 03:00 of A has no observation at 02:00: lag 1 is missing, not 11.0
+    assert np.isnan(out.loc[('A', pd.Timestamp('2023-01-01 03:00')), 'temp_c_lag_1'])
+    assert out.loc[('A', pd.Timestamp('2023-01-01 03:00')), 'temp_c_lag_2'] == 11.0
+    assert out.loc[('B', pd.Timestamp('2023-01-01 03:00')), 'temp_c_lag_1'] == 22.0
+    assert out.loc[('B', pd.Timestamp('2023-01-01 03:00')), 'temp_c_roll_3'] == 22.0
+
+    df = features.build_features(make_df(), cache=False)
+    target = features.add_target(df, 'temp_c', horizon=1)
+    assert target.isna().sum() == 3  # A 01:00 (gap), A 03:00 and B 03:00
+
+
+def test_features_are_cached_by_data_version():
+    features.clear_cache()
+    df = make_df()
+    first = features.build_features(df)
+    assert features.build_features(df.copy()) is first
+    changed = df.assign(temp_c=df['temp_c'] + 1)
+    assert features.build_features(changed) is not first
+
+
+def test_model_inputs_fill_missing_history_with_current_value():
+    latest = features.latest_features(features.build_features(make_df(), cache=False))
+    X = features.model_inputs(latest, features.REGRESSION_FEATURES)
+    assert not X.isna().any().any()
+    a = X[latest['station_id'] == 'A'].iloc[0]
+    assert a['temp_c_lag_1'] == 13.0
+
+
+def test_normalization_stats_per_station():
+    stats = features.normalization_stats(make_df(), ['temp_c'])
+    assert stats.loc['B', 'temp_c_mean'] == 21.5
+    assert np.isclose(stats.loc['B', 'temp_c_std'], np.std([20, 21, 22, 23]))
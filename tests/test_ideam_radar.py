@@ -0,0 +1,67 @@
+from data_sources import ideam_radar
+from processing.disk_cache import DiskCache
+
+
+def test_select_moments_keeps_only_requested_gate_fields(radar_tree):
+    tree = ideam_radar.select_moments(radar_tree(sweeps=(0.5, 1.5)), ['DBZH'])
+    for sweep in ('sweep_0', 'sweep_1'):
+        ds = tree[sweep].ds
+        assert 'DBZH' in ds and 'VRADH' not in ds and 'RHOHV' not in ds
+        # Sweep metadata and coordinates stay
+        assert 'sweep_fixed_angle' in ds and 'azimuth' in ds.coords
+    assert 'latitude' in tree.ds
+    assert ideam_radar.select_moments(radar_tree(), None)['sweep_0'].ds.data_vars.keys() >= {'DBZH', 'VRADH'}
+
+
+def test_sweep_dataset_carries_the_site(radar_tree):
+    ds = ideam_radar.sweep_dataset(radar_tree(lat=2.5, lon=-72.6))
+    assert float(ds['latitude']) == 2.5 and float(ds['longitude']) == -72.6
+
+
+def test_quicklook_is_coarse_and_cached_apart(monkeypatch, radar_tree, tmp_path):
+    from PIL import Image
+
+    monkeypatch.chdir(tmp_path)  # render and regridding caches
+    reads = []
+
+    def read(path, **kwargs):
+        reads.append(path)
+        return ideam_radar.select_moments(radar_tree(n_bins=400), kwargs.get('moments'))
+
+    monkeypatch.setattr(ideam_radar, 'fetch_volume', lambda path: path)
+    monkeypatch.setattr(ideam_radar, 'read_radar', read)
+    monkeypatch.setattr(ideam_radar.radar_render, 'get_render_cache',
+                        lambda: DiskCache(str(tmp_path / 'render')))
+    monkeypatch.setattr(ideam_radar.radar_render, 'basemap',
+                        lambda grid, scale, cache_dir: Image.new('RGBA', (grid.shape[1] * scale, grid.shape[0] * scale)))
+
+    quick = ideam_radar.render_radar_image('scan', quicklook=True)
+    assert ideam_radar.cached_radar_image('scan') is None
+    full = ideam_radar.render_radar_image('scan')
+    assert quick != full and ideam_radar.cached_radar_image('scan', quicklook=True) == quick
+    # Shown at the size of the full frame, give or take a coarse cell
+    (qw, qh), (fw, fh) = Image.open(quick).size, Image.open(full).size
+    assert abs(qw - fw) <= ideam_radar.QUICKLOOK_SCALE and abs(qh - fh) <= ideam_radar.QUICKLOOK_SCALE
+    ideam_radar.render_radar_image('scan', quicklook=True)
+    assert len(reads) == 2
+
+
+def test_selected_sweeps_keep_their_volume_numbers(monkeypatch, radar_tree):
+    import xradar as xd
+
+    def open_iris_datatree(path, sweep):
+        # Like xradar: the selection comes back as sweep_0..k-1
+        tree = radar_tree(sweeps=[0.5 + int(name.split('_')[1]) for name in sweep])
+        tree.dataset = tree.dataset.assign(sweep_group_name=('sweep', [f"sweep_{i}" for i in range(len(sweep))]))
+        return tree
+
+    monkeypatch.setattr(xd.io, 'open_iris_datatree', open_iris_datatree)
+    tree = ideam_radar.read_radar('volume', sweeps=[2], georeference=False)
+    assert list(tree.children) == ['sweep_2']
+    assert float(ideam_radar.sweep_dataset(tree, 2)['sweep_fixed_angle']) == 2.5
+    assert list(tree['sweep_group_name'].values) == ['sweep_2']
+
+    tree = ideam_radar.read_radar('volume', sweeps=[3, 1], moments=None, georeference=False)
+    assert float(ideam_radar.sweep_dataset(tree, 1)['sweep_fixed_angle']) == 1.5
+    assert float(ideam_radar.sweep_dataset(tree, 3)['sweep_fixed_angle']) == 3.5
+    assert 'VRADH' in ideam_radar.sweep_dataset(tree, 3)
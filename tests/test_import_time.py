@@ -0,0 +1,27 @@
+import pytest
+from benchmarks.import_time import measure_import
+
+# Cold-start budget per package, generous enough for slow machines but far
+# below the cost of importing mlflow/xradar/cartopy eagerly (~2-3 s).
+IMPORT_BUDGET_S = 1.5
+
+HEAVY_PACKAGES = {"mlflow", "xradar", "cartopy", "matplotlib", "s3fs", "cmweather", "torch", "transformers"}
+
+PACKAGE_MODULES = {
+    "processing": ["processing.transform", "processing.cleaning", "processing.storage"],
+    "data_sources": ["data_sources.siata", "data_sources.meteoblue", "data_sources.meteosource", "data_sources.ideam_radar",
+                     "data_sources.radar_animation", "data_sources.radar_rain", "data_sources.radar_mosaic"],
+}
+
+
+@pytest.mark.parametrize("package", PACKAGE_MODULES)
+def test_import_does_not_load_heavy_dependencies(package):
+    stats = measure_import(", ".join(PACKAGE_MODULES[package]))
+    assert not (stats["loaded"] & HEAVY_PACKAGES)
+
+
+@pytest.mark.parametrize("package", PACKAGE_MODULES)
+def test_cold_start_import_time(package):
+    modules = PACKAGE_MODULES[package]
+    stats = measure_import(", ".join(modules))
+    assert sum(stats["cumulative"][m] for m in modules) < IMPORT_BUDGET_S
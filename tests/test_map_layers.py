@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+from processing import map_layers
+
+
+def test_station_snapshot_keeps_latest_non_null_values():
+    df = pd.DataFrame({
+        'timestamp': pd.to_datetime(['2023-01-01 00:00', '2023-01-01 01:00', '2023-01-01 00:00']),
+        'lat': [6.0, 6.0, 6.2],
+        'lon': [-75.0, -75.0, -75.5],
+        'temp_c': [20.0, np.nan, 18.0],
+        'precip_mm': [0.0, 1.5, 0.0],
+        'wind_m_s': [1.0, 2.0, 3.0],
+        'source': ['siata', 'siata', 'meteoblue'],
+        'station_id': ['A', 'A', 'B'],
+    })
+    snapshot = map_layers.station_snapshot(df).set_index('station_id')
+    assert len(snapshot) == 2
+    assert snapshot.loc['A', 'precip_mm'] == 1.5
+    assert snapshot.loc['A', 'temp_c'] == 20.0
+
+
+def test_hexbin_aggregates_nearby_stations():
+    snapshot = pd.DataFrame({
+        'lat': [6.2000, 6.2001, 7.0],
+        'lon': [-75.5000, -75.5001, -74.0],
+        'temp_c': [20.0, 22.0, 30.0],
+    })
+    bins = map_layers.hexbin(snapshot, 'temp_c', radius=0.05).sort_values('count')
+    assert bins['count'].tolist() == [1, 2]
+    assert bins['value'].tolist() == [30.0, 21.0]
+    assert all(len(p) == 6 for p in bins['polygon'])
+    # Each station lies within the circumradius of its hexagon center
+    assert abs(bins.iloc[1]['lat'] - 6.2) <= 0.05 and abs(bins.iloc[1]['lon'] + 75.5) <= 0.05
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from ml_models import online, regression
+
+
+def test_normal_equation_updates_match_a_full_fit():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 3))
+    y = X @ [1.0, -2.0, 0.5] + 3.0 + rng.normal(scale=0.1, size=200)
+    features = ['a', 'b', 'c']
+
+    state = regression.normal_equations(X[:150], y[:150])
+    state = regression.normal_equations(X[150:], y[150:], state)
+    updated = regression.solve_normal_equations(state, features)
+    full = regression.LinearRegression().fit(pd.DataFrame(X, columns=features), y)
+
+    assert state['n'] == 200
+    np.testing.assert_allclose(updated.coef_, full.coef_, atol=1e-8)
+    np.testing.assert_allclose(updated.intercept_, full.intercept_, atol=1e-8)
+    np.testing.assert_allclose(updated.predict(pd.DataFrame(X, columns=features)), full.predict(X), atol=1e-8)
+
+
+def test_fresh_rows_and_watermark_advance():
+    df = pd.DataFrame({
+        'station_id': ['A', 'A', 'A', 'B'],
+        'timestamp': pd.to_datetime(['2024-01-01 00:00', '2024-01-01 01:00', '2024-01-01 02:00', '2024-01-01 00:00']),
+    })
+    watermark = {'A': '2024-01-01T01:00:00', 'C': '2024-01-02T00:00:00'}
+    rows = online.fresh_rows(df, watermark)
+    # B is new, so all of its rows are fresh
+    assert rows.index.tolist() == [2, 3]
+    assert online.advance(watermark, rows) == {
+        'A': '2024-01-01T02:00:00', 'B': '2024-01-01T00:00:00', 'C': '2024-01-02T00:00:00',
+    }
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from ml_models import batch_inference, export, predictor
+
+
+def make_history(hours=30):
+    ts = pd.date_range('2024-01-01', periods=hours, freq='h')
+    df = pd.DataFrame({
+        'timestamp': list(ts) * 2,
+        'station_id': ['B'] * hours + ['A'] * hours,
+        'temp_c': list(np.arange(hours, dtype=float)) + [5.0] * hours,
+        'wind_m_s': 1.0,
+        'precip_mm': 0.0,
+    })
+    return df.drop(index=[hours - 3])  # B misses one recent hour
+
+
+def test_hourly_context_aligns_on_each_station_last_hour():
+    stations, values, last_hour = predictor.hourly_context(make_history(), 4)
+    assert list(stations) == ['A', 'B']
+    assert values[0].tolist() == [5.0] * 4
+    np.testing.assert_array_equal(values[1], [26.0, np.nan, 28.0, 29.0])
+    assert (last_hour == np.datetime64('2024-01-02T05:00')).all()
+
+
+@pytest.fixture
+def exported(tmp_path):
+    config = transformers.PatchTSTConfig(prediction_length=3, context_length=8, num_input_channels=1,
+                                         d_model=8, encoder_layers=1, encoder_attention_heads=1, encoder_ffn_dim=8)
+    model = transformers.PatchTSTForPrediction(config).eval()
+    spec = {'context_length': 8, 'prediction_length': 3,
+            'normalization': {'stations': ['A', 'B'], 'mean': [5.0, 20.0], 'std': [1.0, 2.0]}}
+    return model, export.export_model(model, 'patchtst', spec, str(tmp_path / 'inference'))
+
+
+def test_torchscript_export_matches_eager(exported):
+    model, path = exported
+    p = predictor.BatchedPredictor.from_dir(path, int8=False, batch_size=2)
+    windows = np.random.default_rng(0).normal(size=(5, 8)).astype(np.float32)
+    with torch.inference_mode():
+        eager = model(past_values=torch.from_numpy(windows)[..., None]).prediction_outputs[..., 0].numpy()
+    np.testing.assert_allclose(p.predict(windows), eager, atol=1e-5)
+    assert predictor.BatchedPredictor.from_dir(path).predict(windows).shape == (5, 3)
+
+
+def test_predictor_serves_batch_inference(exported):
+    _, path = exported
+    p = predictor.BatchedPredictor.from_dir(path)
+    assert p(make_history(), 7).shape == (2, 7)  # recursive beyond 3 steps
+
+    table = batch_inference.forecast_table(make_history(), {'patchtst': p}, horizons=7)
+    assert len(table) == 14 and table['value'].notna().all()
+    assert set(table['station_id']) == {'A', 'B'}
@@ -0,0 +1,60 @@
+import os
+
+import pandas as pd
+from PIL import Image
+
+from data_sources import ideam_radar, radar_animation
+
+
+def fake_scans(monkeypatch, tmp_path, paths, broken=()):
+    scans = pd.DataFrame({'path': paths, 'scan_time': pd.date_range('2022-08-09', periods=len(paths), freq='10min'),
+                          'size': 1})
+    monkeypatch.setattr(ideam_radar, 'list_radar_scans', lambda radar, start, end: scans)
+    frames = tmp_path / 'frames'
+    frames.mkdir(exist_ok=True)
+    rendered = []
+
+    def cached(path, cmap=None):
+        image = frames / f"{os.path.basename(path)}.png"
+        return str(image) if image.exists() else None
+
+    def render(path, cmap=None):
+        rendered.append(path)
+        if path in broken:
+            return None
+        image = frames / f"{os.path.basename(path)}.png"
+        Image.new('RGB', (40, 30), (len(rendered) * 40 % 255, 0, 0)).save(image)
+        return str(image)
+
+    monkeypatch.setattr(ideam_radar, 'cached_radar_image', cached)
+    monkeypatch.setattr(ideam_radar, 'render_radar_image', render)
+    return rendered
+
+
+def test_day_animation_renders_each_scan_once(monkeypatch, tmp_path):
+    paths = [f"b/CAR2208090{i}0000.RAW" for i in range(3)]
+    rendered = fake_scans(monkeypatch, tmp_path, paths)
+    progress = []
+    root = str(tmp_path / 'anim')
+    result = radar_animation.animate_day('Carimagua', '2022-08-09', max_workers=0, root=root,
+                                         progress=lambda done, total, path: progress.append((done, total)))
+    assert Image.open(result.path).n_frames == 3
+    assert list(result.index['frame']) == [0, 1, 2] and result.failed == 0
+    assert progress[-1] == (3, 3)
+    assert list(radar_animation.load_index(radar_animation.animation_paths('Carimagua', '2022-08-09', root)[1])['path']) == paths
+
+    # Same day again: nothing is rendered
+    radar_animation.animate_day('Carimagua', '2022-08-09', max_workers=0, root=root)
+    assert len(rendered) == 3
+
+
+def test_failed_scans_are_indexed_and_retried(monkeypatch, tmp_path):
+    paths = [f"b/CAR2208090{i}0000.RAW" for i in range(3)]
+    rendered = fake_scans(monkeypatch, tmp_path, paths, broken={paths[1]})
+    root = str(tmp_path / 'anim')
+    result = radar_animation.animate_day('Carimagua', '2022-08-09', max_workers=0, root=root)
+    assert result.failed == 1 and Image.open(result.path).n_frames == 2
+    assert result.index['frame'].isna().tolist() == [False, True, False]
+
+    radar_animation.animate_day('Carimagua', '2022-08-09', max_workers=0, root=root)
+    assert rendered[3:] == [paths[1]]  # only the failed scan is tried again
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from data_sources.ideam_radar import sweep_dataset
+from processing import radar_grid
+
+
+@pytest.fixture
+def sweep(radar_tree):
+    return sweep_dataset(radar_tree(n_bins=400))
+
+
+def test_grid_is_aligned_and_covers_the_range():
+    grid = radar_grid.GridSpec.around(4.567, -71.333, 100.0, resolution=0.01)
+    for bound in (grid.lat_min, grid.lat_max, grid.lon_min, grid.lon_max):
+        assert abs(bound / 0.01 - round(bound / 0.01)) < 1e-6
+    assert grid.lat_max - 4.567 >= 100 / radar_grid.KM_PER_DEG_LAT
+    assert grid.shape == (len(grid.lats), len(grid.lons))
+    assert grid.cell_index(np.array([grid.lat_min - 1]), np.array([grid.lon_min]))[0] == -1
+
+
+def test_uniform_field_regrids_to_itself_inside_the_range(sweep, tmp_path):
+    ds = sweep.assign(DBZH=sweep['DBZH'] * 0 + 30.0)
+    field = radar_grid.regrid_sweep(ds, 'DBZH', cache_dir=str(tmp_path))
+    inside = np.isfinite(field.values)
+    np.testing.assert_allclose(field.values[inside], 30.0, rtol=1e-4)
+    # Roughly the disc of the range over its bounding square
+    assert 0.7 < inside.mean() < 0.82
+
+
+def test_gates_land_where_they_are(sweep, tmp_path):
+    geometry = radar_grid.SweepGeometry.from_sweep(sweep)
+    grid = radar_grid.GridSpec.around(geometry.lat, geometry.lon, geometry.max_range_km)
+    regridder = radar_grid.get_regridder(geometry, grid, str(tmp_path))
+    values = np.full((geometry.n_rays, geometry.n_bins), np.nan)
+    values[90, 200] = 50.0  # due east, ~50 km
+    out = regridder.to_dataarray(values, sweep['azimuth'].values)
+    lat, lon = out.where(np.isfinite(out), drop=True).stack(p=('lat', 'lon')).dropna('p')['p'].values[0]
+    assert abs(lat - geometry.lat) < 0.02
+    assert abs((lon - geometry.lon) * 111.32 * np.cos(np.radians(lat)) - 50.0) < 1.5
+
+
+def test_matrix_is_cached_on_disk_and_reused_across_jittered_scans(sweep, tmp_path):
+    geometry = radar_grid.SweepGeometry.from_sweep(sweep)
+    jittered = sweep.assign_coords(azimuth=sweep['azimuth'] + 0.07)
+    assert radar_grid.SweepGeometry.from_sweep(jittered) == geometry
+
+    grid = radar_grid.GridSpec.around(geometry.lat, geometry.lon, 50.0)
+    first = radar_grid.get_regridder(geometry, grid, str(tmp_path))
+    assert len(list(tmp_path.glob('*.npz'))) == 1
+    radar_grid._regridders.clear()
+    again = radar_grid.get_regridder(geometry, grid, str(tmp_path))
+    assert (first.matrix != again.matrix).nnz == 0
+
+
+def test_rays_jittering_across_slot_edges_keep_their_slots(sweep):
+    # Centres on whole slots jitter to either side of the edge (mod res)
+    n_rays = sweep.sizes['azimuth']
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        azimuth = np.mod(np.arange(n_rays) * 360.0 / n_rays + rng.uniform(-0.1, 0.1, n_rays), 360.0)
+        geometry = radar_grid.SweepGeometry.from_sweep(sweep.assign_coords(azimuth=azimuth))
+        assert geometry.azimuth_offset == 0.0
+        assert np.unique(geometry.ray_slots(azimuth)).size == n_rays
+
+
+def test_aligned_grids_embed_cell_for_cell():
+    a = radar_grid.GridSpec.around(4.567, -71.333, 50.0, resolution=0.05)
+    b = radar_grid.GridSpec.around(4.9, -71.0, 30.0, resolution=0.05)
+    big = radar_grid.GridSpec.covering([a, b])
+    values = np.arange(a.shape[0] * a.shape[1], dtype=np.float32).reshape(a.shape)
+    placed = big.embed(values, a)
+    # Every cell lands at the same coordinates
+    i, j = np.unravel_index(np.nanargmax(placed), big.shape)
+    assert np.isclose(big.lats[i], a.lats[-1]) and np.isclose(big.lons[j], a.lons[-1])
+    assert np.isfinite(placed).sum() == values.size
+    # Parts outside the target grid are clipped
+    assert np.isfinite(a.embed(big.embed(values, a), big)).sum() == values.size
+    assert np.isfinite(b.embed(values, a)).sum() < values.size
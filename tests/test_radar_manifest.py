@@ -0,0 +1,57 @@
+import os
+
+import fsspec
+import pandas as pd
+
+from data_sources.radar_manifest import RadarManifest, parse_scan_time
+
+PREFIX = "/bucket/l2_data"
+
+
+def make_fs(names, day='2022/08/09', radar='Carimagua'):
+    fs = fsspec.filesystem('memory')
+    fs.store.clear()  # the memory filesystem is process-wide
+    for name in names:
+        fs.pipe(f"{PREFIX}/{day}/{radar}/{name}", b'x' * 10)
+    return fs
+
+
+def test_parse_scan_time():
+    assert parse_scan_time('bucket/CAR220809000004.RAW7ABC') == pd.Timestamp('2022-08-09 00:00:04')
+    assert pd.isna(parse_scan_time('README.txt'))
+
+
+def test_final_days_are_listed_once(tmp_path):
+    fs = make_fs(['CAR220809001004.RAW0002', 'CAR220809000004.RAW0001'])
+    manifest = RadarManifest(str(tmp_path), fs=fs, prefix=PREFIX)
+    day = manifest.day('Carimagua', '2022-08-09')
+    assert day['scan_time'].tolist() == [pd.Timestamp('2022-08-09 00:00:04'), pd.Timestamp('2022-08-09 00:10:04')]
+
+    # A new process reads the persisted listing without listing again
+    fs.pipe(f"{PREFIX}/2022/08/09/Carimagua/CAR220809002004.RAW0003", b'x')
+    again = RadarManifest(str(tmp_path), fs=fs, prefix=PREFIX)
+    assert len(again.day('Carimagua', '2022-08-09', refresh=True)) == 2
+    assert again.listings == 0
+
+
+def test_open_days_are_refreshed_incrementally(tmp_path):
+    today = pd.Timestamp.now().normalize()
+    name = f"CAR{today:%y%m%d}000004.RAW0001"
+    fs = make_fs([name], day=f"{today:%Y/%m/%d}")
+    manifest = RadarManifest(str(tmp_path), fs=fs, prefix=PREFIX, refresh_s=3600)
+    assert len(manifest.day('Carimagua', today)) == 1
+    fs.pipe(f"{PREFIX}/{today:%Y/%m/%d}/Carimagua/CAR{today:%y%m%d}001004.RAW0002", b'x')
+    # Fresh listing: served from the manifest
+    assert len(manifest.day('Carimagua', today)) == 1
+    assert len(manifest.day('Carimagua', today, refresh=True)) == 2
+    assert manifest.listings == 2
+
+
+def test_scans_query_a_time_range_across_days(tmp_path):
+    fs = make_fs(['CAR220809230004.RAW0001'])
+    for name in ['CAR220810000004.RAW0002', 'CAR220810050004.RAW0003']:
+        fs.pipe(f"{PREFIX}/2022/08/10/Carimagua/{name}", b'x')
+    manifest = RadarManifest(str(tmp_path), fs=fs, prefix=PREFIX)
+    scans = manifest.scans('Carimagua', '2022-08-09 12:00', '2022-08-10 01:00')
+    assert [os.path.basename(p) for p in scans['path']] == ['CAR220809230004.RAW0001', 'CAR220810000004.RAW0002']
+    assert len(manifest.scans('Guaviare', '2022-08-09', '2022-08-10')) == 0
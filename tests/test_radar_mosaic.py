@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_sources import ideam_radar, radar_mosaic
+from processing.disk_cache import DiskCache
+
+SLOT = pd.Timestamp('2022-08-09 12:00')
+
+
+def test_merge_rules():
+    a = np.array([[10.0, np.nan, 30.0, np.nan]], dtype=np.float32)
+    b = np.array([[20.0, 5.0, np.nan, np.nan]], dtype=np.float32)
+    np.testing.assert_array_equal(radar_mosaic.merge([a, b], rule='max'), [[20.0, 5.0, 30.0, np.nan]])
+    weights = [np.full(a.shape, 3.0), np.full(a.shape, 1.0)]
+    np.testing.assert_allclose(radar_mosaic.merge([a, b], weights, 'distance'), [[12.5, 5.0, 30.0, np.nan]])
+    with pytest.raises(ValueError):
+        radar_mosaic.merge([a, b], rule='mean')
+
+
+@pytest.fixture
+def two_radars(monkeypatch, radar_tree, tmp_path):
+    """Carimagua at 20 dBZ and Guaviare at 40 dBZ, 200 km range; others have no scans."""
+    monkeypatch.chdir(tmp_path)  # regridding matrices are cached under the working directory
+    levels = {'Carimagua': 20.0, 'Guaviare': 40.0}
+
+    def scans(radar, start, end):
+        if radar not in levels:
+            return pd.DataFrame({'path': [], 'scan_time': pd.to_datetime([])})
+        return pd.DataFrame({'path': [f"{radar}/a", f"{radar}/b"],
+                             'scan_time': [SLOT - pd.Timedelta(minutes=4), SLOT + pd.Timedelta(minutes=1)]})
+
+    reads = []
+
+    def read(path, **kwargs):
+        reads.append(path)
+        radar = path.split('/')[0]
+        site = ideam_radar.RADAR_LOCATIONS[radar]
+        tree = radar_tree(lat=site['lat'], lon=site['lon'], n_rays=180, n_bins=400, gate_m=500.0)
+        sweep = tree['sweep_0'].to_dataset()
+        tree['sweep_0'] = sweep.assign(DBZH=sweep['DBZH'] * 0 + levels[radar])
+        return tree
+
+    monkeypatch.setattr(ideam_radar, 'list_radar_scans', scans)
+    monkeypatch.setattr(ideam_radar, 'fetch_volume', lambda path: path)
+    monkeypatch.setattr(ideam_radar, 'read_radar', read)
+    return reads
+
+
+def test_closest_scans_are_merged_onto_the_national_grid(two_radars, tmp_path):
+    grid = radar_mosaic.national_grid(resolution=0.05)
+    cache = DiskCache(str(tmp_path / 'mosaics'))
+    [mosaic] = radar_mosaic.composite([SLOT + pd.Timedelta(minutes=7)], 'max', max_workers=0, grid=grid, cache=cache)
+    assert mosaic.slot == SLOT
+    assert mosaic.scans == {'Carimagua': 'Carimagua/b', 'Guaviare': 'Guaviare/b'}
+    values = np.round(mosaic.values, 3)  # regridding is float32
+    assert set(np.unique(values[np.isfinite(values)])) == {20.0, 40.0}
+
+    cari = ideam_radar.RADAR_LOCATIONS['Carimagua']
+    site = grid.cell_index(np.array([cari['lat']]), np.array([cari['lon']]))[0]
+    assert values.ravel()[site] == 20.0  # only Carimagua reaches its site
+    overlap = (values == 40.0).sum()
+
+    [weighted] = radar_mosaic.composite([SLOT], 'distance', max_workers=0, grid=grid, cache=cache)
+    weighted = np.round(weighted.values, 3)
+    finite = np.isfinite(weighted)
+    assert (finite == np.isfinite(values)).all()
+    assert ((weighted[finite] >= 20.0) & (weighted[finite] <= 40.0)).all()
+    # Cells both radars see take a value strictly between them
+    assert ((weighted > 20.0) & (weighted < 40.0)).any()
+    assert (weighted[finite] == 40.0).sum() < overlap
+
+
+def test_slots_are_served_from_the_cache(two_radars, tmp_path):
+    grid = radar_mosaic.national_grid(resolution=0.05)
+    cache = DiskCache(str(tmp_path / 'mosaics'))
+    first = radar_mosaic.composite([SLOT], max_workers=0, grid=grid, cache=cache)[0]
+    n = len(two_radars)
+    again = radar_mosaic.composite([SLOT], max_workers=0, grid=grid, cache=cache)[0]
+    assert len(two_radars) == n == 2
+    np.testing.assert_array_equal(first.values, again.values)
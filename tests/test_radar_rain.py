@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pyproj
+
+from data_sources import ideam_radar, radar_rain
+from processing.radar_grid import KM_PER_DEG_LAT
+
+SITE = ideam_radar.RADAR_LOCATIONS['Carimagua']
+
+
+def points():
+    return pd.DataFrame({
+        'station_id': ['north_50km', 'east_20km', 'far'],
+        'lat': [SITE['lat'] + 50 / KM_PER_DEG_LAT, SITE['lat'], SITE['lat'] + 3.0],
+        'lon': [SITE['lon'], SITE['lon'] + 20 / (KM_PER_DEG_LAT * np.cos(np.radians(SITE['lat']))), SITE['lon']],
+    })
+
+
+def test_marshall_palmer_rain_rate():
+    dbz = np.array([10 * np.log10(200.0), 5.0, np.nan, 70.0])
+    rate = radar_rain.rain_rate(dbz)
+    assert np.isclose(rate[0], 1.0) and rate[1] == 0.0 and np.isnan(rate[2])
+    assert np.isclose(rate[3], radar_rain.rain_rate(radar_rain.MAX_DBZ))  # capped
+
+
+def test_points_are_assigned_to_a_covering_radar():
+    radars = radar_rain.assign_radars(pd.concat([points(), pd.DataFrame(
+        {'station_id': ['medellin'], 'lat': [6.2442], 'lon': [-75.5812]})], ignore_index=True))
+    assert radars.to_dict() == {0: 'Carimagua', 1: 'Carimagua'}  # 'far' and Medellín are out of range
+
+
+def test_sampling_gathers_the_nearest_gate(radar_tree):
+    sweep = ideam_radar.sweep_dataset(radar_tree(lat=SITE['lat'], lon=SITE['lon'], n_bins=400))
+    # Reflectivity = slant range in km; the sweep reaches 100 km
+    sweep = sweep.assign(DBZH=sweep['DBZH'] * 0 + sweep['range'] / 1000.0)
+    pts = points()
+    dbz = radar_rain.sample_sweep(sweep, pts)
+    _, _, dist = pyproj.Geod(ellps='WGS84').inv([SITE['lon']] * 2, [SITE['lat']] * 2, pts['lon'][:2], pts['lat'][:2])
+    np.testing.assert_allclose(dbz[:2], np.asarray(dist) / 1000.0, atol=0.15)  # within half a gate
+    assert np.isnan(dbz[2])
+
+
+def fake_scans(monkeypatch, radar_tree, broken=()):
+    """Scans a, b and c at 1, 3.16 and 10 mm/h; those in ``broken`` cannot be read."""
+    scans = pd.DataFrame({'path': ['a', 'b', 'c'],
+                          'scan_time': pd.to_datetime(['2022-08-09 00:00', '2022-08-09 00:30', '2022-08-09 01:10'])})
+    monkeypatch.setattr(ideam_radar, 'list_radar_scans', lambda radar, start, end: scans)
+    monkeypatch.setattr(ideam_radar, 'fetch_volume', lambda path: path)
+
+    def read(path, **kwargs):
+        if path in broken:
+            raise OSError(f"corrupt volume {path}")
+        i = 'abc'.index(path)
+        tree = radar_tree(lat=SITE['lat'], lon=SITE['lon'], time=scans['scan_time'][i])
+        sweep = tree['sweep_0'].to_dataset()
+        tree['sweep_0'] = sweep.assign(DBZH=sweep['DBZH'] * 0 + 10 * np.log10(200.0) + 8 * i)
+        return tree
+
+    monkeypatch.setattr(ideam_radar, 'read_radar', read)
+
+
+def north_precip(df):
+    return df[df['station_id'] == 'north_50km (IDEAM Radar)'].set_index('timestamp')['precip_mm'].to_numpy()
+
+
+def test_scans_become_hourly_canonical_rows(monkeypatch, radar_tree):
+    fake_scans(monkeypatch, radar_tree)
+    df = radar_rain.fetch_radar_rain(points(), '2022-08-09', '2022-08-09', max_workers=0)
+    assert list(df.columns) == ["timestamp", "lat", "lon", "temp_c", "precip_mm", "wind_m_s", "source", "station_id"]
+    assert (df['source'] == 'ideam_radar').all()
+    np.testing.assert_allclose(north_precip(df), [(1 + 10 ** 0.5) / 2, 10.0], rtol=1e-3)
+
+
+def test_unreadable_scans_are_skipped(monkeypatch, radar_tree):
+    fake_scans(monkeypatch, radar_tree, broken={'b'})
+    df = radar_rain.fetch_radar_rain(points(), '2022-08-09', '2022-08-09', max_workers=0)
+    np.testing.assert_allclose(north_precip(df), [1.0, 10.0], rtol=1e-3)
+
+    fake_scans(monkeypatch, radar_tree, broken={'a', 'b', 'c'})
+    assert radar_rain.fetch_radar_rain(points(), '2022-08-09', '2022-08-09', max_workers=0).empty
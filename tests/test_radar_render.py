@@ -0,0 +1,42 @@
+import numpy as np
+from PIL import Image
+
+from processing import radar_render
+from processing.disk_cache import DiskCache
+from processing.radar_grid import GridSpec
+
+GRID = GridSpec(4.0, 4.5, -72.0, -71.4, 0.01)
+
+
+def test_colorize_puts_north_up_and_leaves_nan_transparent():
+    values = np.full(GRID.shape, np.nan, dtype=np.float32)
+    values[-1, :] = radar_render.VMAX  # northernmost row
+    rgba = radar_render.colorize(values, 'viridis')
+    assert rgba.shape == GRID.shape + (4,)
+    assert (rgba[0, :, 3] == 255).all()
+    assert (rgba[1:, :, 3] == 0).all()
+
+
+def test_frame_layout():
+    values = np.zeros(GRID.shape, dtype=np.float32)
+    frame = radar_render.compose(values, GRID, title="t", cmap='viridis', scale=2, with_basemap=False)
+    ny, nx = GRID.shape
+    assert frame.size == (nx * 2 + radar_render.COLORBAR_WIDTH, ny * 2 + radar_render.TITLE_HEIGHT)
+
+
+def test_frames_are_rendered_once(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    calls = []
+
+    def frame():
+        calls.append(1)
+        return radar_render.compose(np.zeros(GRID.shape), GRID, cmap='viridis', with_basemap=False)
+
+    key = radar_render.render_key('CAR220809000004.RAW7ABC', cmap='viridis')
+    assert radar_render.cached_render(key, cache) is None
+    path = radar_render.render(key, frame, cache)
+    assert radar_render.render(key, frame, cache) == path
+    assert radar_render.cached_render(key, cache) == path
+    assert len(calls) == 1
+    assert Image.open(path).format == 'PNG'
+    assert radar_render.render_key('x', cmap='viridis') != radar_render.render_key('x', cmap='jet')
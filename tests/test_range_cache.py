@@ -0,0 +1,69 @@
+import pandas as pd
+from processing.range_cache import RangeCache
+
+
+def hourly_source(calls):
+    def fetch(start, end):
+        calls.append((start, end))
+        ts = pd.date_range(start, end, freq='h', inclusive='left')
+        return pd.DataFrame({'timestamp': ts, 'temp_c': range(len(ts))})
+    return fetch
+
+
+def test_sub_range_is_served_from_cache():
+    cache = RangeCache()
+    calls = []
+    fetch = hourly_source(calls)
+    full = cache.get(('siata', None), '2023-01-01', '2023-01-05', fetch)
+    sub = cache.get(('siata', None), '2023-01-02', '2023-01-03', fetch)
+    assert len(full) == 96
+    assert len(sub) == 24
+    assert sub['timestamp'].min() == pd.Timestamp('2023-01-02')
+    assert len(calls) == 1
+
+
+def test_overlapping_range_fetches_only_missing_edges():
+    cache = RangeCache()
+    calls = []
+    fetch = hourly_source(calls)
+    cache.get('k', '2023-01-02', '2023-01-03', fetch)
+    result = cache.get('k', '2023-01-01', '2023-01-04', fetch)
+    assert calls[1:] == [
+        (pd.Timestamp('2023-01-01'), pd.Timestamp('2023-01-02')),
+        (pd.Timestamp('2023-01-03'), pd.Timestamp('2023-01-04')),
+    ]
+    assert len(result) == 72
+    assert result['timestamp'].is_monotonic_increasing
+
+
+def test_lru_eviction_respects_memory_budget():
+    calls = []
+    fetch = hourly_source(calls)
+    probe = RangeCache()
+    probe.get('a', '2023-01-01', '2023-01-02', fetch)
+    cache = RangeCache(max_bytes=int(probe.nbytes * 2.5))
+    for key in ['a', 'b', 'c']:
+        cache.get(key, '2023-01-01', '2023-01-02', fetch)
+    cache.get('a', '2023-01-01', '2023-01-02', fetch)  # 'a' was evicted, refetch
+    assert cache.nbytes <= cache.max_bytes
+    assert len(calls) == 1 + 4
+
+
+def test_snapshot_is_cached_whole_until_it_expires():
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        # A forecast horizon: rows well past any requested range
+        ts = pd.date_range(pd.Timestamp.now().floor('h'), periods=72, freq='h')
+        return pd.DataFrame({'timestamp': ts, 'temp_c': range(len(ts))})
+
+    cache = RangeCache()
+    assert len(cache.snapshot(('meteoblue', 'Bello'), fetch)) == 72
+    assert len(cache.snapshot(('meteoblue', 'Bello'), fetch)) == 72
+    assert len(calls) == 1
+
+    expired = RangeCache(live_ttl_s=0)
+    expired.snapshot('k', fetch)
+    expired.snapshot('k', fetch)
+    assert len(calls) == 3
@@ -0,0 +1,47 @@
+import pytest
+
+mlflow = pytest.importorskip("mlflow")
+from mlflow.tracking import MlflowClient
+from ml_models.serving import ModelCache
+
+
+@pytest.fixture
+def tracking(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    previous = mlflow.get_tracking_uri()
+    mlflow.set_tracking_uri(f"file://{tmp_path}")
+    client = MlflowClient()
+    experiment_id = client.create_experiment("Hourly_Weather_Forecast")
+    yield client, experiment_id
+    mlflow.set_tracking_uri(previous)
+
+
+def finished_run(client, experiment_id):
+    run = client.create_run(experiment_id)
+    client.set_terminated(run.info.run_id)
+    return run.info.run_id
+
+
+def test_model_is_loaded_once_and_hot_swapped(tracking):
+    client, experiment_id = tracking
+    loads = []
+    cache = ModelCache(check_interval_s=0, loader=lambda run_id: loads.append(run_id) or f"model-{run_id}")
+
+    assert cache.get("Hourly_Weather_Forecast") is None
+
+    first = finished_run(client, experiment_id)
+    assert cache.get("Hourly_Weather_Forecast").model == f"model-{first}"
+    assert cache.get("Hourly_Weather_Forecast").run_id == first
+    assert loads == [first]
+
+    second = finished_run(client, experiment_id)
+    assert cache.get("Hourly_Weather_Forecast").run_id == second
+    assert loads == [first, second]
+
+
+def test_unfinished_runs_are_not_served(tracking):
+    client, experiment_id = tracking
+    cache = ModelCache(check_interval_s=0, loader=lambda run_id: run_id)
+    first = finished_run(client, experiment_id)
+    client.create_run(experiment_id)  # still training
+    assert cache.get("Hourly_Weather_Forecast").run_id == first
@@ -0,0 +1,70 @@
+import io
+import pandas as pd
+import pyarrow.parquet as pq
+from processing import storage
+
+
+def make_store(tmp_path, n=250):
+    df = pd.DataFrame({
+        'timestamp': pd.date_range('2023-01-01', periods=n, freq='h'),
+        'temp_c': [float(i) for i in range(n)],
+        'source': ['siata' if i % 2 else 'meteoblue' for i in range(n)],
+        'station_id': [f"S{i % 5}" for i in range(n)],
+    })
+    path = tmp_path / 'canonical.parquet'
+    storage.save_parquet(df, str(path))
+    return str(path)
+
+
+def test_query_page_filters_sorts_and_projects(tmp_path):
+    path = make_store(tmp_path)
+    page, total = storage.query_page(path, columns=['station_id', 'temp_c'], filters={'source': ['siata']},
+                                     sort_by='temp_c', ascending=False, page=1, page_size=10)
+    assert total == 125
+    assert list(page.columns) == ['station_id', 'temp_c']
+    assert len(page) == 10
+    assert page['temp_c'].tolist() == [float(v) for v in range(229, 209, -2)]
+
+
+def test_query_page_time_range(tmp_path):
+    path = make_store(tmp_path)
+    page, total = storage.query_page(path, start='2023-01-02', end='2023-01-03', page_size=5)
+    assert total == 24
+    assert page['timestamp'].min() == pd.Timestamp('2023-01-02')
+
+
+def test_export_stream_writes_in_batches(tmp_path):
+    path = make_store(tmp_path)
+    sink = io.BytesIO()
+    rows = storage.export_stream(path, sink, fmt='csv', filters={'station_id': ['S1']}, batch_size=7)
+    assert rows == 50
+    assert len(pd.read_csv(io.BytesIO(sink.getvalue()))) == 50
+
+    out = tmp_path / 'export.parquet'
+    assert storage.export_stream(path, str(out), fmt='parquet', columns=['temp_c']) == 250
+    assert pq.read_table(out).column_names == ['temp_c']
+
+
+def test_export_bytes_is_a_valid_download(tmp_path):
+    from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+    path = make_store(tmp_path)
+    data = storage.export_bytes(path, fmt='csv', filters={'station_id': ['S1']})
+    body, mime = convert_data_to_bytes_and_infer_mime(data, RuntimeError("unsupported"))
+    assert mime == 'application/octet-stream'
+    assert len(pd.read_csv(io.BytesIO(body))) == 50
+    body, _ = convert_data_to_bytes_and_infer_mime(storage.export_bytes(path, fmt='parquet'), RuntimeError("unsupported"))
+    assert pq.read_table(io.BytesIO(body)).num_rows == 250
+
+
+def test_canonical_stores_are_kept_per_version(tmp_path):
+    import os
+
+    df = pd.DataFrame({'station_id': ['S1'], 'temp_c': [20.0]})
+    paths = [storage.canonical_store_path(f"v{i}", root=str(tmp_path)) for i in range(4)]
+    assert len(set(paths)) == 4
+    for i, path in enumerate(paths):
+        storage.save_parquet(df, path)
+        os.utime(path, (i, i))
+    storage.prune_canonical_stores(root=str(tmp_path), keep=2)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['canonical-v2.parquet', 'canonical-v3.parquet']
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("pyarrow")
+
+from ml_models import features, streaming
+from ml_models.windows import MultiSeriesWindowDataset
+from processing import storage
+
+
+@pytest.fixture
+def store(tmp_path):
+    rng = np.random.default_rng(0)
+    frames = []
+    for station, hours in (('A (x)', 120), ('B', 80)):
+        ts = pd.date_range('2024-01-01', periods=hours, freq='h').delete(30)
+        frames.append(pd.DataFrame({
+            'timestamp': ts, 'station_id': station, 'temp_c': rng.normal(20, 3, len(ts)),
+            'precip_mm': 0.0, 'wind_m_s': 1.0,
+        }))
+    df = pd.concat(frames).sample(frac=1, random_state=0)
+    csv = tmp_path / 'canonical.csv'
+    df.to_csv(csv, index=False)
+    path = str(tmp_path / 'store')
+    assert storage.csv_to_partitioned(str(csv), path) == len(df)
+    return path, df
+
+
+def test_scan_stats_matches_in_memory_stats(store):
+    path, df = store
+    stats = streaming.scan_stats(path, ['temp_c'])
+    expected = features.normalization_stats(df, ['temp_c'])
+    assert list(stats.index) == ['A (x)', 'B']
+    np.testing.assert_allclose(stats[['temp_c_mean', 'temp_c_std']], expected, rtol=1e-6)
+    assert stats['rows'].tolist() == [119, 79]
+
+
+def test_streamed_windows_match_in_memory_windows(store):
+    path, df = store
+    stats = streaming.scan_stats(path, ['temp_c'])
+    in_memory = MultiSeriesWindowDataset(df, 'temp_c', 6, 2, stats=stats)
+    stream = streaming.StreamingWindowDataset(path, 'temp_c', 6, 2, stats, chunk_rows=16, shuffle_buffer=8)
+    samples = list(stream)
+    assert len(samples) == len(in_memory)
+
+    def key(item):
+        return (int(item['static_categorical_features'][0]), tuple(np.round(item['past_values'].numpy(), 5)))
+    assert sorted(map(key, samples)) == sorted(key(in_memory[i]) for i in range(len(in_memory)))
+
+
+def test_streamed_batches_cover_every_window(store):
+    from torch.utils.data import DataLoader
+    from ml_models.windows import collate_batch
+
+    path, df = store
+    stats = streaming.scan_stats(path, ['temp_c'])
+    in_memory = MultiSeriesWindowDataset(df, 'temp_c', 6, 2, stats=stats)
+    stream = streaming.StreamingWindowDataset(path, 'temp_c', 6, 2, stats, chunk_rows=16, shuffle_buffer=8,
+                                              batch_size=4)
+    batches = list(DataLoader(stream, batch_size=1, collate_fn=collate_batch))
+    assert all(b['past_values'].shape[1:] == (6,) and len(b['past_values']) <= 4 for b in batches)
+
+    def keys(batch):
+        codes = batch['static_categorical_features'][:, 0].tolist()
+        return [(c, tuple(np.round(v, 5))) for c, v in zip(codes, batch['past_values'].numpy())]
+    streamed = [k for b in batches for k in keys(b)]
+    assert sorted(streamed) == sorted(keys(in_memory.__getitems__(range(len(in_memory)))))
+
+
+def test_feature_batches_yield_each_row_once(store):
+    path, df = store
+    stats = streaming.scan_stats(path, ['temp_c'])
+
+    def build(chunk):
+        out = features.build_features(chunk, cache=False)
+        out['target'] = features.add_target(out, 'temp_c')
+        return out.dropna(subset=features.REGRESSION_FEATURES + ['target'])
+
+    streamed = pd.concat(streaming.feature_batches(
+        path, stats, build, features.MAX_LOOKBACK_HOURS, batch_size=7, chunk_rows=20,
+        buffer_rows=30, columns=['temp_c', 'precip_mm', 'wind_m_s'],
+    ))
+    full = build(df.assign(station_id=df['station_id'].astype(str)))
+    assert len(streamed) == len(full)
+    assert not streamed.duplicated(['station_id', 'timestamp']).any()
+
+
+def test_ensure_store_rebuilds_when_the_csv_changes(store, tmp_path):
+    import os
+
+    _, df = store
+    csv, path = tmp_path / 'canonical.csv', str(tmp_path / 'training')
+    assert streaming.ensure_store(path, str(csv)) == path
+    assert set(streaming.scan_stats(path, ['temp_c']).index) == {'A (x)', 'B'}
+
+    df[df['station_id'] == 'B'].assign(station_id='C').to_csv(csv, index=False)
+    stamp = os.path.getmtime(path) + 10
+    os.utime(csv, (stamp, stamp))
+    streaming.ensure_store(path, str(csv))
+    assert list(streaming.scan_stats(path, ['temp_c']).index) == ['C']
+    assert os.path.getmtime(path) == stamp
+    assert sorted(os.listdir(tmp_path)) == ['canonical.csv', 'store', 'training']
@@ -0,0 +1,45 @@
+import pytest
+
+from ml_models import sweep
+
+
+def test_sample_space_is_seeded_and_in_range():
+    space = {'lr': ('log', 1e-4, 1e-2), 'layers': [1, 2, 3], 'dropout': ('uniform', 0.0, 0.3), 'heads': ('int', 1, 4)}
+    trials = sweep.sample_space(space, 20, seed=1)
+    assert trials == sweep.sample_space(space, 20, seed=1)
+    for t in trials:
+        assert 1e-4 <= t['lr'] <= 1e-2
+        assert t['layers'] in (1, 2, 3) and type(t['layers']) is int
+        assert 0.0 <= t['dropout'] <= 0.3
+        assert 1 <= t['heads'] <= 4
+
+
+def test_median_pruner_compares_trials_at_the_same_step():
+    pruner = sweep.MedianPruner(n_startup_trials=2)
+    assert not pruner.report(0, 0, 1.0)
+    assert not pruner.report(1, 0, 3.0)
+    # Median of the others at step 0 is 2.0
+    assert pruner.report(2, 0, 2.5)
+    assert not pruner.report(3, 0, 1.5)
+    # A single other trial at step 1 is not enough to judge
+    assert not pruner.report(0, 1, 0.5)
+    assert not pruner.report(1, 1, 5.0)
+    # Median of the others at step 1 is 2.75
+    assert pruner.report(3, 1, 4.0)
+
+
+def test_trials_train_on_the_store_built_by_the_sweep(monkeypatch):
+    import sys
+    import types
+    from ml_models import streaming
+
+    seen = []
+    trainer = types.ModuleType('fake_trainer')
+    trainer.train = lambda params, report, run_tags, experiment, path: seen.append(path) or 1.0
+    monkeypatch.setitem(sys.modules, 'fake_trainer', trainer)
+    monkeypatch.setitem(sweep.TRAINERS, 'fake', ('fake_trainer', 'train'))
+    monkeypatch.setattr(streaming, 'ensure_store', lambda *a, **k: pytest.fail("trials must not rebuild the store"))
+
+    row = sweep.run_trial('fake', 0, {'lr': 0.1}, sweep.MedianPruner(), None, 'exp', 1, store='/tmp/store')
+    assert seen == ['/tmp/store']
+    assert row['value'] == 1.0 and row['state'] == 'complete'
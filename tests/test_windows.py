@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+torch = pytest.importorskip("torch")
+from torch.utils.data import DataLoader
+
+from ml_models.windows import MultiSeriesWindowDataset, SlidingWindowDataset, collate_batch, strided_windows
+
+
+def test_strided_windows_share_memory():
+    buf = np.arange(10, dtype=np.float32)
+    win = strided_windows(buf, 4)
+    assert win.shape == (7, 4)
+    assert np.shares_memory(win, buf)
+    np.testing.assert_array_equal(win[3], [3, 4, 5, 6])
+
+
+def test_items_are_views_with_mask_and_time_features():
+    values = np.arange(20, dtype=np.float32)
+    values[5] = np.nan
+    time_features = np.stack([values, values], axis=1)
+    ds = SlidingWindowDataset(values, 6, 2, time_features=time_features, with_mask=True)
+    assert len(ds) == 13
+
+    item = ds[2]
+    assert item['past_values'].shape == (6,)
+    assert item['future_values'].tolist() == [8.0, 9.0]
+    assert item['past_time_features'].shape == (6, 2)
+    assert item['past_observed_mask'].tolist() == [1, 1, 1, 0, 1, 1]
+    assert item['past_values'][3] == 0
+    # Same storage as the dataset buffer
+    assert item['past_values'].data_ptr() == ds._windows['values'].data_ptr() + 2 * 4
+
+
+def test_loader_batches_multivariate_windows():
+    values = np.random.default_rng(0).normal(size=(50, 3)).astype(np.float32)
+    ds = SlidingWindowDataset(values, 8, 4)
+    batch = next(iter(DataLoader(ds, batch_size=5, collate_fn=collate_batch)))
+    assert batch['past_values'].shape == (5, 8, 3)
+    assert batch['future_values'].shape == (5, 4, 3)
+    np.testing.assert_allclose(batch['future_values'][1].numpy(), values[9:13])
+
+
+def make_stations():
+    # Station A: 10 hours with a gap at hour 5; station B: 6 contiguous hours
+    ts_a = pd.date_range('2023-01-01', periods=10, freq='h').delete(5)
+    ts_b = pd.date_range('2023-01-01', periods=6, freq='h')
+    return pd.DataFrame({
+        'station_id': ['A'] * len(ts_a) + ['B'] * len(ts_b),
+        'timestamp': list(ts_a) + list(ts_b),
+        'temp_c': list(np.arange(len(ts_a), dtype=float)) + [100.0] * 3 + [102.0] * 3,
+    })
+
+
+def test_multi_series_windows_stay_inside_contiguous_runs():
+    ds = MultiSeriesWindowDataset(make_stations(), 'temp_c', 3, 1, time_features=True)
+    assert ds.stations == ['A', 'B']
+    assert ds.offsets.tolist() == [0, 9, 15]
+    # A runs of 5 and 4 hours give 2 + 1 windows, B gives 3
+    assert ds.starts.tolist() == [0, 1, 5, 9, 10, 11]
+    codes = [int(ds[i]['static_categorical_features'][0]) for i in range(len(ds))]
+    assert codes == [0, 0, 0, 1, 1, 1]
+
+    batch = next(iter(DataLoader(ds, batch_size=6, collate_fn=collate_batch)))
+    assert batch['past_values'].shape == (6, 3)
+    assert batch['future_time_features'].shape == (6, 1, 4)
+    assert batch['static_categorical_features'].shape == (6, 1)
+
+
+def test_multi_series_normalizes_per_station_with_given_stats():
+    train = MultiSeriesWindowDataset(make_stations(), 'temp_c', 2, 1)
+    b = train.values[train.offsets[1]:]
+    np.testing.assert_allclose(b, [-1, -1, -1, 1, 1, 1], atol=1e-5)
+
+    # Evaluation data keeps the training vocabulary and scaling
+    test = MultiSeriesWindowDataset(make_stations().query("station_id == 'B'"), 'temp_c', 2, 1,
+                                    stations=train.stations, stats=train.stats)
+    assert int(test[0]['static_categorical_features'][0]) == 1
+    np.testing.assert_allclose(test.denormalize(test.values, test.codes), [100] * 3 + [102] * 3, rtol=1e-5)
+
+
+def test_ending_after_keeps_only_fresh_windows():
+    ds = MultiSeriesWindowDataset(make_stations(), 'temp_c', 3, 1)
+    # A's windows end at hours 3, 4 and 9; B has no cutoff and keeps all
+    ds.ending_after({'A': '2023-01-01 04:00'})
+    assert ds.starts.tolist() == [5, 9, 10, 11]